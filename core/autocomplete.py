@@ -0,0 +1,173 @@
+"""
+Module Autocomplete Index
+
+Ranked "Disease (Module)" suggestions for the recommendation wizard, served
+from memory instead of loading every module per keystroke.
+
+Matches are ranked in tiers (higher score first, then display name):
+1. disease name starts with the query      1000 + len(disease name)
+2. module name starts with the query        500 + len(module name)
+3. display name starts with the query       300 + len(display name)
+4. disease name contains the query          100 + len(disease name)
+5. module name contains the query            50 + len(module name)
+6. display name contains the query           10 + len(display name)
+The module name is the module's 'developed by' attribution ('N/A' if unset).
+
+The index keeps a sorted array per field for the prefix tiers (a bisect
+finds the matching range) and an n-gram map over display names for the
+contains tiers. Tiers are collected best first and collection stops as soon
+as the k-th best score beats anything a later tier can score; the top k are
+taken with a heap instead of sorting every match.
+
+One index is built per knowledge-graph snapshot (see
+KnowledgeGraphSnapshot.module_autocomplete), so it is rebuilt whenever
+modules or diseases change.
+"""
+
+import heapq
+from bisect import bisect_left
+from collections import namedtuple, defaultdict
+
+
+ModuleSuggestion = namedtuple('ModuleSuggestion', [
+    'module_id', 'disease_id', 'disease_name', 'module_name', 'display_name'
+])
+
+# Upper end of every prefix range: sorts after any string starting with the prefix
+_PREFIX_END = '\U0010ffff'
+
+# Longest n-gram kept in the substring map; longer queries intersect trigram postings
+_GRAM = 3
+
+# (base score, field) per tier, best first; fields index ModuleAutocompleteIndex._lowered
+_TIERS = (
+    (1000, 0),  # disease starts
+    (500, 1),   # module starts
+    (300, 2),   # display starts
+    (100, 0),   # disease contains
+    (50, 1),    # module contains
+    (10, 2),    # display contains
+)
+
+
+class ModuleAutocompleteIndex:
+    """
+    Immutable autocomplete index over modules and their diseases.
+
+    Usage:
+        index = ModuleAutocompleteIndex(snapshot.modules.values(), snapshot.diseases)
+        index.search('diab', limit=20)   # [ModuleSuggestion, ...]
+    """
+
+    def __init__(self, modules, diseases):
+        """
+        Args:
+            modules: module records with id, disease_id, developed_by
+            diseases: {disease_id: record with name}; modules without a disease are skipped
+        """
+        entries = []
+        for module in sorted(modules, key=lambda m: m.id):
+            disease = diseases.get(module.disease_id)
+            if disease is None:
+                continue
+            disease_name = disease.name
+            module_name = module.developed_by or 'N/A'
+            entries.append(ModuleSuggestion(
+                module.id, module.disease_id, disease_name, module_name, f"{disease_name} ({module_name})"
+            ))
+        self.entries = tuple(entries)
+        # (disease, module, display) lowercased, per entry
+        self._lowered = tuple(
+            (e.disease_name.lower(), e.module_name.lower(), e.display_name.lower()) for e in entries
+        )
+
+        # Sorted (lowercased value, entry) arrays for the prefix tiers
+        self._prefix_keys = []
+        self._prefix_rows = []
+        for field in range(3):
+            pairs = sorted((lowered[field], i) for i, lowered in enumerate(self._lowered))
+            self._prefix_keys.append([value for value, _ in pairs])
+            self._prefix_rows.append([i for _, i in pairs])
+
+        # Best score each tier can reach, for stopping early
+        longest = [max((len(lowered[field]) for lowered in self._lowered), default=0) for field in range(3)]
+        self._tier_bounds = tuple(base + longest[field] for base, field in _TIERS)
+
+        # n-gram (1.._GRAM characters) -> entries whose display name contains it.
+        # The display name contains both other fields, so this covers every contains tier.
+        grams = defaultdict(set)
+        for i, (_, _, display) in enumerate(self._lowered):
+            for n in range(1, _GRAM + 1):
+                for start in range(len(display) - n + 1):
+                    grams[display[start:start + n]].add(i)
+        self._grams = {gram: frozenset(rows) for gram, rows in grams.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def score(self, i, query):
+        """Tier score of entry i for a lowercased query (0 if it does not match)."""
+        disease, module, display = self._lowered[i]
+        if disease.startswith(query):
+            return 1000 + len(disease)
+        if module.startswith(query):
+            return 500 + len(module)
+        if display.startswith(query):
+            return 300 + len(display)
+        if query in disease:
+            return 100 + len(disease)
+        if query in module:
+            return 50 + len(module)
+        if query in display:
+            return 10 + len(display)
+        return 0
+
+    def _starting_with(self, field, query):
+        keys = self._prefix_keys[field]
+        lo = bisect_left(keys, query)
+        hi = bisect_left(keys, query + _PREFIX_END, lo)
+        return self._prefix_rows[field][lo:hi]
+
+    def _containing(self, query):
+        if len(query) <= _GRAM:
+            return self._grams.get(query, ())
+        postings = []
+        for start in range(len(query) - _GRAM + 1):
+            rows = self._grams.get(query[start:start + _GRAM])
+            if not rows:
+                return ()
+            postings.append(rows)
+        postings.sort(key=len)
+        rows = postings[0].intersection(*postings[1:])
+        return [i for i in rows if query in self._lowered[i][2]]
+
+    def search(self, query, limit=20):
+        """Best matches for a query (case-insensitive), best first."""
+        query = (query or '').strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        scores = {}
+        top = []  # min-heap of the best `limit` scores seen so far
+        for tier, (_, field) in enumerate(_TIERS):
+            if tier < 3:
+                candidates = self._starting_with(field, query)
+            elif tier == 3:
+                candidates = self._containing(query)
+            else:
+                candidates = ()  # tier 3 already collected every contains match
+            for i in candidates:
+                if i in scores:
+                    continue
+                score = self.score(i, query)
+                scores[i] = score
+                if len(top) < limit:
+                    heapq.heappush(top, score)
+                elif score > top[0]:
+                    heapq.heapreplace(top, score)
+            # Entries not seen yet match only later tiers; stop if none of them can make the top
+            if len(top) == limit and tier + 1 < len(_TIERS) and top[0] > max(self._tier_bounds[tier + 1:]):
+                break
+
+        best = heapq.nsmallest(limit, scores, key=lambda i: (-scores[i], self.entries[i].display_name, i))
+        return [self.entries[i] for i in best]
@@ -0,0 +1,157 @@
+"""
+RCT Evidence Index
+
+Maps practices to the RCTs that support them, so result pages look up
+citations by key instead of scanning every (practice, RCT) pair and parsing
+intervention JSON per pair.
+
+An RCT supports a practice when they share a disease and one of the RCT's
+interventions names the practice (Sanskrit or English, case-insensitive) or
+its category. The index is compiled from the normalized rct_interventions
+rows into
+    (disease_id, lowercased practice name) -> RCT ids
+    (disease_id, category)                 -> RCT ids
+plus the citation of each RCT. Only RCTs with a parenthetical citation are
+indexed, since only those can be shown.
+
+Like the knowledge-graph snapshot, one index is shared per database URL for
+the whole process and rebuilt when a commit changes the RCT tables (see
+database.models.get_table_versions); core.snapshot_refresh.SnapshotRefresher
+also rebuilds it in the background right after such commits.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import select
+from database.models import (
+    RCT, RCTIntervention, rct_disease_association, get_session, get_database_url, get_table_versions
+)
+from core.knowledge_graph import SNAPSHOT_MAX_AGE
+
+
+# Tables the index is compiled from; a change to any of them triggers a rebuild
+EVIDENCE_TABLES = ('rcts', 'rct_disease_association', 'rct_interventions')
+
+
+class RCTEvidenceIndex:
+    """
+    Immutable practice -> RCT citation index.
+
+    Usage:
+        index = get_evidence_index(db_path)
+        index.citations_for({1, 4}, 'Tadasana', 'Mountain Pose', 'Asanas')
+    """
+
+    def __init__(self, citations, interventions, rct_disease_ids, versions=()):
+        """
+        Args:
+            citations: {rct_id: parenthetical_citation}
+            interventions: iterable of (rct_id, lowercased practice name or None, category or None)
+            rct_disease_ids: {rct_id: [disease_id, ...]}
+        """
+        self.versions = versions
+        self.built_at = time.monotonic()
+        self.citations = {}
+        by_name = defaultdict(set)
+        by_category = defaultdict(set)
+        for rct_id, name, category in interventions:
+            if not citations.get(rct_id):
+                continue
+            self.citations[rct_id] = citations[rct_id]
+            for disease_id in rct_disease_ids.get(rct_id, ()):
+                if name:
+                    by_name[(disease_id, name)].add(rct_id)
+                if category:
+                    by_category[(disease_id, category)].add(rct_id)
+        self.by_name = {key: frozenset(ids) for key, ids in by_name.items()}
+        self.by_category = {key: frozenset(ids) for key, ids in by_category.items()}
+
+    def __len__(self):
+        return len(self.citations)
+
+    def is_current(self, versions):
+        """True if the index matches the given table versions and is not too old."""
+        if versions != self.versions:
+            return False
+        return (time.monotonic() - self.built_at) < SNAPSHOT_MAX_AGE
+
+    def rct_ids_for(self, disease_ids, practice_sanskrit, practice_english, practice_segment):
+        """Ids of the RCTs supporting a practice linked to the given diseases, ascending."""
+        names = {(name or '').lower() for name in (practice_sanskrit, practice_english)}
+        names.discard('')
+        rct_ids = set()
+        for disease_id in disease_ids:
+            for name in names:
+                rct_ids.update(self.by_name.get((disease_id, name), ()))
+            if practice_segment:
+                rct_ids.update(self.by_category.get((disease_id, practice_segment), ()))
+        return sorted(rct_ids)
+
+    def citations_for(self, disease_ids, practice_sanskrit, practice_english, practice_segment):
+        """Parenthetical citations of the RCTs supporting a practice, in RCT id order."""
+        return [
+            self.citations[rct_id]
+            for rct_id in self.rct_ids_for(disease_ids, practice_sanskrit, practice_english, practice_segment)
+        ]
+
+
+def build_evidence_index(session, versions=()):
+    """Compile an RCTEvidenceIndex from the database in three queries."""
+    citations = dict(session.execute(
+        select(RCT.id, RCT.parenthetical_citation)
+        .where(RCT.parenthetical_citation.isnot(None), RCT.parenthetical_citation != '')
+    ).all())
+    interventions = session.execute(
+        select(RCTIntervention.rct_id, RCTIntervention.practice_name_lower, RCTIntervention.category)
+    ).all()
+    rct_disease_ids = defaultdict(list)
+    for rct_id, disease_id in session.execute(
+        select(rct_disease_association.c.rct_id, rct_disease_association.c.disease_id)
+    ):
+        rct_disease_ids[rct_id].append(disease_id)
+    return RCTEvidenceIndex(citations, interventions, rct_disease_ids, versions)
+
+
+# Process-wide registry: database URL -> current index
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_evidence_index(db_path=None):
+    """
+    Return the current evidence index for a database, rebuilding it if the
+    RCT tables changed since it was built.
+    """
+    db_path = db_path or get_database_url()
+    versions = get_table_versions(EVIDENCE_TABLES)
+    index = _indexes.get(db_path)
+    if index is not None and index.is_current(versions):
+        return index
+
+    with _index_lock:
+        # Another thread may have rebuilt it while we waited for the lock
+        index = _indexes.get(db_path)
+        if index is None or not index.is_current(versions):
+            session = get_session(db_path)
+            try:
+                index = build_evidence_index(session, versions)
+            finally:
+                session.close()
+            _indexes[db_path] = index
+    return index
+
+
+def invalidate_evidence_index(db_path=None):
+    """Drop cached indexes (all databases if db_path is None)."""
+    with _index_lock:
+        if db_path is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(db_path, None)
@@ -0,0 +1,637 @@
+"""
+In-memory Knowledge Graph for the Recommendation Engine
+
+The recommendation engine only needs a read-only view of diseases, practices,
+contraindications, modules and citations. This module compiles those tables
+into an immutable snapshot of plain records keyed by id, plus adjacency
+tuples (disease -> practices, disease -> contraindications, disease -> modules),
+so that generating a recommendation is a pure in-memory computation.
+Contraindications are additionally compiled to per-disease bitmasks over
+practices (see ContraindicationIndex), and each practice's output fragment
+(pre-parsed variations/steps plus its citation block) is cached on the
+snapshot (see KnowledgeGraphSnapshot.practice_fragment).
+
+One snapshot is shared per database URL for the whole process. It is rebuilt
+atomically (built aside, then swapped in) when one of the underlying tables
+changes, as reported by database.models.get_table_versions().
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple, defaultdict
+from functools import cached_property
+from types import MappingProxyType
+from sqlalchemy import select
+from core.ranking import PracticeRanker
+from core.autocomplete import ModuleAutocompleteIndex
+from database.models import (
+    Disease, Practice, Contraindication, Module, Citation, DiseaseCombination,
+    disease_practice_association, disease_contraindication_association,
+    get_session, get_database_url, get_table_versions
+)
+
+
+DiseaseRecord = namedtuple('DiseaseRecord', [
+    'id', 'name', 'code', 'description', 'icd_dsm_code'
+])
+
+PracticeRecord = namedtuple('PracticeRecord', [
+    'id', 'practice_sanskrit', 'practice_english', 'code',
+    'practice_segment', 'sub_category', 'kosha',
+    'rounds', 'time_minutes', 'strokes_per_min', 'strokes_per_cycle', 'rest_between_cycles_sec',
+    'variations', 'steps', 'description', 'how_to_do',
+    'cvr_score', 'rct_count', 'citation_id', 'module_id'
+])
+
+ContraindicationRecord = namedtuple('ContraindicationRecord', [
+    'id', 'contraindication_type', 'practice_sanskrit', 'practice_english',
+    'practice_segment', 'sub_category', 'kosha', 'reason'
+])
+
+ModuleRecord = namedtuple('ModuleRecord', [
+    'id', 'disease_id', 'code', 'developed_by', 'paper_link', 'module_description'
+])
+
+CitationRecord = namedtuple('CitationRecord', [
+    'id', 'citation_text', 'citation_type', 'full_reference', 'url'
+])
+
+CombinationRecord = namedtuple('CombinationRecord', [
+    'id', 'combination_name', 'diseases_json'
+])
+
+# Tables the snapshot is compiled from; a change to any of them triggers a rebuild
+SNAPSHOT_TABLES = (
+    'diseases',
+    'practices',
+    'contraindications',
+    'modules',
+    'citations',
+    'disease_practice_association',
+    'disease_contraindication_association',
+    'disease_combinations',
+)
+
+# Upper bound on snapshot age in seconds. Change counters are per process, so this
+# bounds how long a worker can serve data edited through another worker.
+SNAPSHOT_MAX_AGE = float(os.getenv('RECOMMENDATION_SNAPSHOT_MAX_AGE', '300'))
+
+
+# Map legacy/variant category labels to canonical labels so the engine matches the UI
+SEGMENT_ALIASES = {
+    'Preparatory Practice': 'Preparatory practices',
+    'Breathing Practice': 'Breathing practices',
+    'Sequential Yogic Practice': 'Sequential yogic practices',
+    'Suryanamaskara': 'Sequential yogic practices',
+    'Additional Practices': 'Additional practices',
+    'Kriya (Cleansing Techniques)': 'Kriya (cleansing)',
+    'Yogic Counselling': 'Yogic counselling'
+}
+
+
+def normalize_segment(segment):
+    """Normalize a practice segment (category) label to its canonical name."""
+    if not segment:
+        return segment
+    segment = segment.strip()
+    return SEGMENT_ALIASES.get(segment, segment)
+
+
+def _fold(text):
+    return (text or '').strip().casefold()
+
+
+def _mask_from_bits(bits):
+    """Build an integer bitmask from bit positions in linear time."""
+    if not bits:
+        return 0
+    buffer = bytearray(max(bits) // 8 + 1)
+    for bit in bits:
+        buffer[bit >> 3] |= 1 << (bit & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class ContraindicationIndex:
+    """
+    Contraindications compiled to bitmasks over practices.
+
+    Every practice gets a bit position (in id order). Each contraindication
+    blocks a set of practices, depending on its type:
+
+    - 'practice' (default): practices with the same English name
+      (case-insensitive), category and sub-category
+    - 'category': every practice in the category (restricted to the
+      sub-category when one is given)
+    - 'kosha': every practice in the kosha
+
+    Each disease maps to the OR of the masks of its contraindications, so
+    filtering a multi-disease request is one OR per disease and a bit test
+    per candidate practice, independent of catalogue size.
+    """
+
+    def __init__(self, practices, contraindications, disease_contraindication_ids):
+        self.bit_of = {}
+        practice_bits = defaultdict(list)
+        category_bits = defaultdict(list)
+        kosha_bits = defaultdict(list)
+        for bit, practice_id in enumerate(sorted(practices)):
+            practice = practices[practice_id]
+            self.bit_of[practice_id] = bit
+            segment = normalize_segment(practice.practice_segment)
+            sub_category = practice.sub_category or ''
+            practice_bits[self.practice_key(practice)].append(bit)
+            category_bits[(_fold(segment), None)].append(bit)
+            category_bits[(_fold(segment), _fold(sub_category))].append(bit)
+            kosha_bits[_fold(practice.kosha)].append(bit)
+
+        # Distinct rule per contraindication (duplicates across diseases count once)
+        self.rule_keys = {contra.id: self.rule_key(contra) for contra in contraindications.values()}
+
+        def bits_for(rule_key):
+            kind = rule_key[0]
+            if kind == 'category':
+                return category_bits.get(rule_key[1:], ())
+            if kind == 'kosha':
+                return kosha_bits.get(rule_key[1], ())
+            return practice_bits.get(rule_key[1:], ())
+
+        # Category/kosha rules are few and broad: compile each mask once and OR them in.
+        # Practice rules are many and narrow: collect their bits and build one mask per disease.
+        broad_masks = {}
+        self.disease_masks = {}
+        for disease_id, contra_ids in disease_contraindication_ids.items():
+            mask = 0
+            bits = []
+            for contra_id in contra_ids:
+                rule_key = self.rule_keys.get(contra_id)
+                if rule_key is None:
+                    continue
+                if rule_key[0] == 'practice':
+                    bits.extend(bits_for(rule_key))
+                else:
+                    if rule_key not in broad_masks:
+                        broad_masks[rule_key] = _mask_from_bits(bits_for(rule_key))
+                    mask |= broad_masks[rule_key]
+            self.disease_masks[disease_id] = mask | _mask_from_bits(bits)
+
+    @staticmethod
+    def practice_key(record):
+        """(English name, canonical category, sub-category) identity shared by practices and 'practice' rules."""
+        return (
+            (record.practice_english or '').lower().strip(),
+            normalize_segment(record.practice_segment),
+            record.sub_category or ''
+        )
+
+    @classmethod
+    def rule_key(cls, contra):
+        """Hashable description of what a contraindication blocks."""
+        if contra.contraindication_type == 'category':
+            segment = normalize_segment(contra.practice_segment or contra.practice_english)
+            return ('category', _fold(segment), _fold(contra.sub_category) if contra.sub_category else None)
+        if contra.contraindication_type == 'kosha':
+            return ('kosha', _fold(contra.kosha or contra.practice_english))
+        return ('practice',) + cls.practice_key(contra)
+
+    @classmethod
+    def blocks(cls, contra, practice):
+        """True if the contraindication applies to the practice (used for reporting)."""
+        rule_key = cls.rule_key(contra)
+        if rule_key[0] == 'category':
+            segment = _fold(normalize_segment(practice.practice_segment))
+            return segment == rule_key[1] and (rule_key[2] is None or _fold(practice.sub_category) == rule_key[2])
+        if rule_key[0] == 'kosha':
+            return _fold(practice.kosha) == rule_key[1]
+        return cls.practice_key(practice) == rule_key[1:]
+
+    def mask_for(self, disease_ids):
+        """OR of the blocked-practice masks of the given diseases."""
+        mask = 0
+        for disease_id in disease_ids:
+            mask |= self.disease_masks.get(disease_id, 0)
+        return mask
+
+    def is_blocked(self, mask, practice_id):
+        bit = self.bit_of.get(practice_id)
+        return bit is not None and (mask >> bit) & 1 == 1
+
+
+class DiseaseCombinationIndex:
+    """
+    Inverted index over DiseaseCombination rows.
+
+    Each combination's diseases_json is parsed once into a frozenset of
+    disease names. Postings map a disease name to the combinations that
+    contain it, so the combinations applicable to a user (every member is
+    one of the user's diseases) are found by counting posting hits per
+    combination: a combination applies when all of its members were hit.
+    Cost is proportional to the user's diseases' postings, not the table size.
+    """
+
+    def __init__(self, combinations):
+        self.combinations = {}
+        self.members = {}
+        self._postings = defaultdict(list)
+        self._always = []  # combinations with no members apply to everyone
+        for combo in sorted(combinations, key=lambda c: c.id):
+            try:
+                members = frozenset(json.loads(combo.diseases_json))
+            except (ValueError, TypeError):
+                # Skip malformed combinations
+                continue
+            self.combinations[combo.id] = combo
+            self.members[combo.id] = members
+            if not members:
+                self._always.append(combo.id)
+            for name in members:
+                self._postings[name].append(combo.id)
+
+    def applicable(self, disease_names):
+        """Combinations whose diseases are all among disease_names (exact names), ordered by id."""
+        hits = defaultdict(int)
+        for name in set(disease_names):
+            for combo_id in self._postings.get(name, ()):
+                hits[combo_id] += 1
+        combo_ids = [combo_id for combo_id, count in hits.items() if count == len(self.members[combo_id])]
+        combo_ids.extend(self._always)
+        return [self.combinations[combo_id] for combo_id in sorted(combo_ids)]
+
+
+class DiseaseNameIndex:
+    """
+    Case-folded name index for resolving user-supplied disease names.
+
+    - exact: folded name -> disease (lowest id wins on duplicates)
+    - prefix: sorted array of folded names, searched with bisect
+    - substring: n-gram (1-3 chars) -> disease ids, intersected per query
+
+    Resolution order matches the engine's historical behaviour: exact match,
+    then partial match. Among partial matches, names starting with the query
+    win over names merely containing it; ties go to the lowest id.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, diseases):
+        self._by_id = {}
+        self._exact = {}
+        grams = defaultdict(set)
+        for disease in sorted(diseases, key=lambda d: d.id):
+            folded = self.fold(disease.name)
+            self._by_id[disease.id] = (folded, disease)
+            self._exact.setdefault(folded, disease)
+            for gram in self._grams(folded):
+                grams[gram].add(disease.id)
+        self._sorted_names = sorted((folded, disease_id) for disease_id, (folded, _) in self._by_id.items())
+        self._sorted_keys = [folded for folded, _ in self._sorted_names]
+        self._grams_index = {gram: frozenset(ids) for gram, ids in grams.items()}
+
+    @staticmethod
+    def fold(name):
+        return (name or '').strip().casefold()
+
+    @classmethod
+    def _grams(cls, text):
+        """All substrings of length 1..GRAM_SIZE."""
+        grams = set()
+        for size in range(1, cls.GRAM_SIZE + 1):
+            for start in range(len(text) - size + 1):
+                grams.add(text[start:start + size])
+        return grams
+
+    def exact(self, name):
+        return self._exact.get(self.fold(name))
+
+    def prefix_matches(self, name):
+        """Disease ids whose folded name starts with the query."""
+        folded = self.fold(name)
+        ids = []
+        pos = bisect_left(self._sorted_keys, folded)
+        while pos < len(self._sorted_keys) and self._sorted_keys[pos].startswith(folded):
+            ids.append(self._sorted_names[pos][1])
+            pos += 1
+        return ids
+
+    def substring_matches(self, name):
+        """Disease ids whose folded name contains the query."""
+        folded = self.fold(name)
+        size = min(self.GRAM_SIZE, len(folded))
+        candidates = None
+        # Intersect the posting lists of the query's n-grams, rarest first
+        postings = sorted(
+            (self._grams_index.get(folded[i:i + size], frozenset()) for i in range(len(folded) - size + 1)),
+            key=len
+        )
+        for posting in postings:
+            candidates = posting if candidates is None else candidates & posting
+            if not candidates:
+                return []
+        if candidates is None:
+            return []
+        return [disease_id for disease_id in candidates if folded in self._by_id[disease_id][0]]
+
+    def resolve(self, name):
+        """Resolve one name to a disease record, or None."""
+        folded = self.fold(name)
+        if not folded:
+            return None
+        disease = self._exact.get(folded)
+        if disease is not None:
+            return disease
+        ids = self.prefix_matches(folded) or self.substring_matches(folded)
+        if not ids:
+            return None
+        return self._by_id[min(ids)][1]
+
+    def resolve_many(self, names):
+        """Resolve a list of names at once; unmatched names map to None."""
+        cache = {}
+        resolved = []
+        for name in names:
+            folded = self.fold(name)
+            if folded not in cache:
+                cache[folded] = self.resolve(folded)
+            resolved.append(cache[folded])
+        return resolved
+
+
+def _parse_json_field(value):
+    """Parse a JSON text column, falling back to the raw text when it is not valid JSON."""
+    try:
+        return json.loads(value)
+    except (ValueError, TypeError):
+        return value
+
+
+def build_practice_fragment(practice, citation):
+    """
+    Serialized output fragment for one practice, as returned by the engine.
+    
+    Fragments are shared between responses and must be treated as read-only.
+    """
+    fragment = {
+        'practice_sanskrit': practice.practice_sanskrit,
+        'practice_english': practice.practice_english,
+        'rounds': practice.rounds,
+        'time_minutes': practice.time_minutes
+    }
+
+    # Add optional fields if they exist
+    if practice.strokes_per_min:
+        fragment['strokes_per_min'] = practice.strokes_per_min
+
+    if practice.strokes_per_cycle:
+        fragment['strokes_per_cycle'] = practice.strokes_per_cycle
+
+    if practice.rest_between_cycles_sec:
+        fragment['rest_between_cycles_sec'] = practice.rest_between_cycles_sec
+
+    if practice.variations:
+        fragment['variations'] = _parse_json_field(practice.variations)
+
+    if practice.steps:
+        fragment['steps'] = _parse_json_field(practice.steps)
+
+    if practice.description:
+        fragment['description'] = practice.description
+
+    if citation:
+        fragment['citation'] = {
+            'text': citation.citation_text,
+            'type': citation.citation_type,
+            'reference': citation.full_reference
+        }
+
+    return fragment
+
+
+class KnowledgeGraphSnapshot:
+    """
+    Immutable, compiled view of the recommendation data.
+
+    All lookups are dictionary/tuple accesses; nothing here touches the database.
+
+    Staleness is tracked per process (database.models.get_table_versions
+    counts commits made in this process). Edits committed by another worker
+    process are picked up only when the snapshot reaches SNAPSHOT_MAX_AGE
+    (default 300 s) or is refreshed explicitly.
+    """
+
+    def __init__(self, diseases, practices, contraindications, modules, citations,
+                 disease_practice_ids, disease_contraindication_ids, versions, combinations=()):
+        self.diseases = MappingProxyType(diseases)
+        self.practices = MappingProxyType(practices)
+        self.contraindications = MappingProxyType(contraindications)
+        self.modules = MappingProxyType(modules)
+        self.citations = MappingProxyType(citations)
+        self.versions = versions
+        self.built_at = time.monotonic()
+
+        # Adjacency arrays, resolved to records once so callers never chase ids
+        self.disease_practices = MappingProxyType({
+            disease_id: tuple(practices[pid] for pid in ids if pid in practices)
+            for disease_id, ids in disease_practice_ids.items()
+        })
+        self.disease_contraindications = MappingProxyType({
+            disease_id: tuple(contraindications[cid] for cid in ids if cid in contraindications)
+            for disease_id, ids in disease_contraindication_ids.items()
+        })
+        # Modules per disease, best first (see _module_rank)
+        practice_counts = defaultdict(int)
+        for practice in practices.values():
+            if practice.module_id is not None:
+                practice_counts[practice.module_id] += 1
+        self.module_practice_counts = MappingProxyType(dict(practice_counts))
+        modules_by_disease = defaultdict(list)
+        for module in modules.values():
+            modules_by_disease[module.disease_id].append(module)
+        self.disease_modules = MappingProxyType({
+            disease_id: tuple(sorted(items, key=self._module_rank))
+            for disease_id, items in modules_by_disease.items()
+        })
+
+        self.disease_name_index = DiseaseNameIndex(diseases.values())
+        self.combination_index = DiseaseCombinationIndex(combinations)
+
+        # Interned integer ids per practice, so the engine dedups and groups with int lookups:
+        # - dedup key: (English name, canonical category, sub-category), see ContraindicationIndex.practice_key
+        # - group: (canonical category, sub-category or 'general'), labels in group_labels
+        key_ids = {}
+        group_ids = {}
+        practice_key_ids = {}
+        practice_group_ids = {}
+        for practice_id in sorted(practices):
+            practice = practices[practice_id]
+            practice_key_ids[practice_id] = key_ids.setdefault(
+                ContraindicationIndex.practice_key(practice), len(key_ids)
+            )
+            group = (normalize_segment(practice.practice_segment), practice.sub_category or 'general')
+            practice_group_ids[practice_id] = group_ids.setdefault(group, len(group_ids))
+        self.practice_key_ids = MappingProxyType(practice_key_ids)
+        self.practice_group_ids = MappingProxyType(practice_group_ids)
+        self.group_labels = tuple(group_ids)
+        self.contraindication_index = ContraindicationIndex(
+            practices, contraindications, disease_contraindication_ids
+        )
+
+        # practice id -> (version stamp, output fragment), filled lazily
+        self._practice_fragments = {}
+
+    @cached_property
+    def practice_ranker(self):
+        """Ranking arrays for the practice catalogue, built on first use (see core.ranking)."""
+        return PracticeRanker(self.practices, self.disease_practices)
+
+    @cached_property
+    def module_autocomplete(self):
+        """Autocomplete index of 'Disease (Module)' names, built on first use (see core.autocomplete)."""
+        return ModuleAutocompleteIndex(self.modules.values(), self.diseases)
+
+    def _module_rank(self, module):
+        """
+        Deterministic module preference for a disease:
+        1. modules with a 'developed by' attribution
+        2. modules with more practices
+        3. lowest id (oldest module)
+        """
+        return (
+            0 if (module.developed_by or '').strip() else 1,
+            -self.module_practice_counts.get(module.id, 0),
+            module.id
+        )
+
+    def is_current(self, versions):
+        """True if the snapshot matches the given table versions and is not too old."""
+        if versions != self.versions:
+            return False
+        return (time.monotonic() - self.built_at) < SNAPSHOT_MAX_AGE
+
+    def find_disease(self, name):
+        """Resolve a disease name (exact case-insensitive match, then partial match)."""
+        return self.disease_name_index.resolve(name)
+
+    def find_diseases(self, names):
+        """Resolve a list of names at once, preserving positions (None when unmatched)."""
+        return self.disease_name_index.resolve_many(names)
+
+    def practices_for(self, disease_id):
+        return self.disease_practices.get(disease_id, ())
+
+    def contraindications_for(self, disease_id):
+        return self.disease_contraindications.get(disease_id, ())
+
+    def modules_for(self, disease_id):
+        """Modules of a disease, preferred module first."""
+        return self.disease_modules.get(disease_id, ())
+
+    def modules_for_diseases(self, disease_ids):
+        """{disease_id: (module, ...)} for the given diseases, preferred module first."""
+        return {disease_id: self.modules_for(disease_id) for disease_id in disease_ids}
+
+    def citation_for(self, practice):
+        if practice.citation_id is None:
+            return None
+        return self.citations.get(practice.citation_id)
+
+    def _fragment_stamp(self, practice):
+        """Version stamp of a practice fragment: the records it is rendered from."""
+        return (practice, self.citation_for(practice))
+
+    def practice_fragment(self, practice):
+        """Cached output fragment for a practice (see build_practice_fragment)."""
+        entry = self._practice_fragments.get(practice.id)
+        if entry is None:
+            stamp = self._fragment_stamp(practice)
+            entry = (stamp, build_practice_fragment(*stamp))
+            self._practice_fragments[practice.id] = entry
+        return entry[1]
+
+    def adopt_fragments(self, previous):
+        """Reuse fragments from an older snapshot whose practice and citation are unchanged."""
+        for practice_id, (stamp, fragment) in list(previous._practice_fragments.items()):
+            practice = self.practices.get(practice_id)
+            if practice is not None and self._fragment_stamp(practice) == stamp:
+                self._practice_fragments.setdefault(practice_id, (stamp, fragment))
+
+
+def _load_records(session, model, record_cls):
+    """Load a table as {id: record} using a column query (no ORM hydration)."""
+    columns = [getattr(model, field) for field in record_cls._fields]
+    return {row[0]: record_cls(*row) for row in session.query(*columns)}
+
+
+def _load_adjacency(session, table, left, right):
+    """Load an association table as {left_id: [right_id, ...]} in stable order."""
+    adjacency = defaultdict(list)
+    stmt = select(table.c[left], table.c[right]).order_by(table.c[left], table.c[right])
+    for left_id, right_id in session.execute(stmt):
+        adjacency[left_id].append(right_id)
+    return adjacency
+
+
+def build_snapshot(session, versions=()):
+    """Compile a KnowledgeGraphSnapshot from the database in a fixed number of queries."""
+    return KnowledgeGraphSnapshot(
+        diseases=_load_records(session, Disease, DiseaseRecord),
+        practices=_load_records(session, Practice, PracticeRecord),
+        contraindications=_load_records(session, Contraindication, ContraindicationRecord),
+        modules=_load_records(session, Module, ModuleRecord),
+        citations=_load_records(session, Citation, CitationRecord),
+        disease_practice_ids=_load_adjacency(
+            session, disease_practice_association, 'disease_id', 'practice_id'
+        ),
+        disease_contraindication_ids=_load_adjacency(
+            session, disease_contraindication_association, 'disease_id', 'contraindication_id'
+        ),
+        versions=versions,
+        combinations=_load_records(session, DiseaseCombination, CombinationRecord).values(),
+    )
+
+
+# Process-wide registry: database URL -> current snapshot
+_snapshots = {}
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(db_path=None):
+    """
+    Return the current snapshot for a database, rebuilding it if the
+    underlying tables changed since it was built.
+    """
+    db_path = db_path or get_database_url()
+    versions = get_table_versions(SNAPSHOT_TABLES)
+    snapshot = _snapshots.get(db_path)
+    if snapshot is not None and snapshot.is_current(versions):
+        return snapshot
+
+    with _snapshot_lock:
+        # Another thread may have rebuilt it while we waited for the lock
+        snapshot = _snapshots.get(db_path)
+        if snapshot is None or not snapshot.is_current(versions):
+            previous = snapshot
+            session = get_session(db_path)
+            try:
+                snapshot = build_snapshot(session, versions)
+            finally:
+                session.close()
+            if previous is not None:
+                snapshot.adopt_fragments(previous)
+            _snapshots[db_path] = snapshot
+    return snapshot
+
+
+def invalidate_snapshot(db_path=None):
+    """Drop cached snapshots (all databases if db_path is None)."""
+    with _snapshot_lock:
+        if db_path is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(db_path, None)
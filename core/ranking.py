@@ -0,0 +1,139 @@
+"""
+Practice Ranking Kernel
+
+Practices are ranked, within a category, by:
+1. RCT count (descending)
+2. Repeat count: how many of the selected diseases the practice is linked to (descending)
+3. CVR score (descending)
+4. English name (ascending)
+
+PracticeRanker loads rct_count, cvr_score, name order and the
+disease -> practice incidence lists into arrays once (per knowledge-graph
+snapshot). For a selected disease set, repeat counts for every practice are
+one sparse matrix-vector product (a bincount over the incidence lists of the
+selected diseases), and a category is ordered with one stable lexsort.
+
+NumPy is optional: when it is not installed the same computations run on
+plain lists with identical results.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to pure Python
+    np = None
+
+
+class PracticeRanker:
+    """
+    Column arrays for ranking practices, built once per snapshot.
+
+    Usage:
+        ranking = ranker.for_diseases({1, 4})
+        ordered_ids = ranking.order([12, 7, 31])
+        rank_key = ranking.key(12)   # (-rct_count, -repeat, -cvr_score, name)
+    """
+
+    def __init__(self, practices, disease_practices):
+        """
+        Args:
+            practices: {practice_id: record} with rct_count, cvr_score, practice_english
+            disease_practices: {disease_id: (practice record, ...)}
+        """
+        practice_ids = sorted(practices)
+        self.index = {practice_id: i for i, practice_id in enumerate(practice_ids)}
+        self.names = [practices[pid].practice_english or '' for pid in practice_ids]
+
+        # Rank of each name in plain string order, so names can take part in a numeric lexsort
+        name_order = {name: rank for rank, name in enumerate(sorted(set(self.names)))}
+        rct = [practices[pid].rct_count if practices[pid].rct_count is not None else 0 for pid in practice_ids]
+        cvr = [practices[pid].cvr_score if practices[pid].cvr_score is not None else 0 for pid in practice_ids]
+        name_rank = [name_order[name] for name in self.names]
+        # Original Python values, so rank keys compare and serialize exactly as before
+        self.rct_values = rct
+        self.cvr_values = cvr
+
+        incidence = {
+            disease_id: [self.index[p.id] for p in linked if p.id in self.index]
+            for disease_id, linked in disease_practices.items()
+        }
+
+        if np is not None:
+            self.rct = np.asarray(rct, dtype=np.int64)
+            self.cvr = np.asarray(cvr, dtype=np.float64)
+            self.name_rank = np.asarray(name_rank, dtype=np.int64)
+            self.incidence = {d: np.asarray(rows, dtype=np.int64) for d, rows in incidence.items()}
+        else:
+            self.rct = rct
+            self.cvr = cvr
+            self.name_rank = name_rank
+            self.incidence = incidence
+
+    def __len__(self):
+        return len(self.names)
+
+    def repeat_counts(self, disease_ids):
+        """Number of selected diseases linked to each practice (array indexed like self.names)."""
+        columns = [self.incidence[d] for d in set(disease_ids) if d in self.incidence]
+        if np is not None:
+            if not columns:
+                return np.zeros(len(self), dtype=np.int64)
+            return np.bincount(np.concatenate(columns), minlength=len(self))
+        counts = [0] * len(self)
+        for rows in columns:
+            for row in rows:
+                counts[row] += 1
+        return counts
+
+    def for_diseases(self, disease_ids):
+        """Ranking context for one selected disease set."""
+        disease_ids = frozenset(disease_ids)
+        return PracticeRanking(self, disease_ids, self.repeat_counts(disease_ids))
+
+
+class PracticeRanking:
+    """
+    Ranking of practices for one selected disease set.
+    """
+
+    def __init__(self, ranker, disease_ids, repeat):
+        self.ranker = ranker
+        self.disease_ids = disease_ids
+        self._repeat = repeat
+
+    def __contains__(self, practice_id):
+        return practice_id in self.ranker.index
+
+    def repeat(self, practice_id):
+        """How many of the selected diseases the practice is linked to."""
+        return int(self._repeat[self.ranker.index[practice_id]])
+
+    def key(self, practice_id):
+        """Sort key (-rct_count, -repeat, -cvr_score, name); ties share the same key."""
+        ranker = self.ranker
+        i = ranker.index[practice_id]
+        return (-ranker.rct_values[i], -int(self._repeat[i]), -ranker.cvr_values[i], ranker.names[i])
+
+    def order(self, practice_ids):
+        """Practice ids sorted best first; equal keys keep their input order (stable)."""
+        practice_ids = list(practice_ids)
+        if len(practice_ids) < 2:
+            return practice_ids
+        ranker = self.ranker
+        rows = [ranker.index[pid] for pid in practice_ids]
+        if np is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            # lexsort: last key is primary
+            order = np.lexsort((
+                ranker.name_rank[rows],
+                -ranker.cvr[rows],
+                -self._repeat[rows],
+                -ranker.rct[rows],
+            ))
+            return [practice_ids[i] for i in order]
+        positions = sorted(
+            range(len(practice_ids)),
+            key=lambda i: (
+                -ranker.rct[rows[i]], -self._repeat[rows[i]], -ranker.cvr[rows[i]], ranker.name_rank[rows[i]]
+            )
+        )
+        return [practice_ids[i] for i in positions]
@@ -0,0 +1,140 @@
+"""
+RCT Count Maintenance
+
+Practice.rct_count is the number of RCTs that support a practice: RCTs linked
+to one of the practice's diseases whose interventions name the practice
+(Sanskrit or English, exact match) or name only its category.
+
+Counts are recomputed for the practices an RCT change can affect, with one
+grouped aggregate over rct_interventions, and only changed counts are
+written. The caller commits once, so saving an RCT costs the same no matter
+how large the RCT table is.
+
+Usage (RCT add/edit/delete):
+    before = rct_footprint(rct)          # edit/delete: before changing it
+    ... modify / add / delete the RCT ...
+    update_rct_counts(session, before, rct_footprint(rct))
+    session.commit()
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collections import namedtuple
+from sqlalchemy import select, func, or_, and_
+from database.models import (
+    Practice, RCTIntervention, disease_practice_association, rct_disease_association,
+    parse_intervention_practices
+)
+
+
+# What an RCT contributes to practice counts: its diseases, named practices and category-only entries
+RCTFootprint = namedtuple('RCTFootprint', ['disease_ids', 'names', 'categories'])
+
+# Upper bound on ids per IN (...) list
+_ID_CHUNK = 500
+
+
+def rct_footprint(rct):
+    """Diseases, practice names and category-only categories of an RCT (from its current state)."""
+    names = set()
+    categories = set()
+    for name, category in parse_intervention_practices(rct.intervention_practices):
+        if name:
+            names.add(name)
+        elif category:
+            categories.add(category)
+    return RCTFootprint(frozenset(d.id for d in rct.diseases if d.id is not None), frozenset(names), frozenset(categories))
+
+
+def affected_practice_ids(session, *footprints):
+    """Ids of the practices whose rct_count the given RCT footprints can change (one query)."""
+    disease_ids = set()
+    names = set()
+    categories = set()
+    for footprint in footprints:
+        if footprint is None:
+            continue
+        disease_ids.update(footprint.disease_ids)
+        names.update(footprint.names)
+        categories.update(footprint.categories)
+    if not disease_ids or not (names or categories):
+        return set()
+
+    mentions = []
+    if names:
+        mentions.append(Practice.practice_sanskrit.in_(names))
+        mentions.append(Practice.practice_english.in_(names))
+    if categories:
+        mentions.append(Practice.practice_segment.in_(categories))
+    return set(session.execute(
+        select(Practice.id).distinct()
+        .join(disease_practice_association, disease_practice_association.c.practice_id == Practice.id)
+        .where(disease_practice_association.c.disease_id.in_(disease_ids), or_(*mentions))
+    ).scalars())
+
+
+def count_rcts(session, practice_ids=None):
+    """
+    Current RCT counts as {practice_id: count} from one grouped aggregate.
+
+    Practices without supporting RCTs are omitted. All practices if practice_ids is None.
+    """
+    stmt = (
+        select(Practice.id, func.count(func.distinct(RCTIntervention.rct_id)))
+        .join(disease_practice_association, disease_practice_association.c.practice_id == Practice.id)
+        .join(rct_disease_association, rct_disease_association.c.disease_id == disease_practice_association.c.disease_id)
+        .join(RCTIntervention, RCTIntervention.rct_id == rct_disease_association.c.rct_id)
+        .where(or_(
+            RCTIntervention.practice_name == Practice.practice_sanskrit,
+            RCTIntervention.practice_name == Practice.practice_english,
+            and_(RCTIntervention.practice_name.is_(None), RCTIntervention.category == Practice.practice_segment)
+        ))
+        .group_by(Practice.id)
+    )
+    if practice_ids is None:
+        return dict(session.execute(stmt).all())
+    practice_ids = list(practice_ids)
+    counts = {}
+    for start in range(0, len(practice_ids), _ID_CHUNK):
+        chunk = practice_ids[start:start + _ID_CHUNK]
+        counts.update(session.execute(stmt.where(Practice.id.in_(chunk))).all())
+    return counts
+
+
+def recount_practices(session, practice_ids):
+    """
+    Recompute rct_count for the given practices and stage the changed values (no commit).
+
+    Returns:
+        {practice_id: (old_count, new_count)} for the practices whose count changed
+    """
+    practice_ids = set(practice_ids)
+    if not practice_ids:
+        return {}
+    counts = count_rcts(session, practice_ids)
+    practices = []
+    ids = list(practice_ids)
+    for start in range(0, len(ids), _ID_CHUNK):
+        practices.extend(session.query(Practice).filter(Practice.id.in_(ids[start:start + _ID_CHUNK])))
+    drift = {}
+    for practice in practices:
+        new_count = counts.get(practice.id, 0)
+        if practice.rct_count != new_count:
+            drift[practice.id] = (practice.rct_count, new_count)
+            practice.rct_count = new_count
+    return drift
+
+
+def update_rct_counts(session, *footprints):
+    """
+    Bring rct_count up to date after RCTs with the given footprints were added,
+    edited (pass the footprints before and after) or deleted (no commit).
+
+    Returns:
+        {practice_id: (old_count, new_count)} for the practices whose count changed
+    """
+    return recount_practices(session, affected_practice_ids(session, *footprints))
@@ -9,6 +9,10 @@ This module contains the logic to:
 5. Organize output by koshas
 6. Include citations
 
+Data is read from a compiled, process-wide knowledge-graph snapshot
+(see core/knowledge_graph.py), so a recommendation makes no database round trips.
+Results are memoized per case-folded disease list (see RecommendationCache).
+
 Future: CVR logic will be added within each kosa's practice selection
 """
 
@@ -18,13 +22,115 @@ import os
 # Add parent directory to path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from collections import defaultdict
-from database.models import Disease, Practice, Contraindication, DiseaseCombination, Module, get_session, get_database_url
-from sqlalchemy.orm import joinedload, selectinload
-from sqlalchemy import func
+import threading
+import time
+from collections import defaultdict, OrderedDict
+from database.models import (
+    get_database_url,
+    get_change_sequence, diseases_changed_since
+)
+from core.knowledge_graph import get_snapshot, DiseaseNameIndex, SEGMENT_ALIASES, normalize_segment
 import json
 
 
+class RecommendationCache:
+    """
+    LRU/TTL cache of recommendation results keyed by canonical disease list.
+    
+    The key is the case-folded list of requested names in request order, so
+    ['GAD', 'depression'] and ['gad', 'Depression'] share one entry. Order is
+    part of the key because the output lists diseases, modules and practices
+    in request order.
+    
+    Each entry remembers the ids of the diseases it was computed for and the
+    change sequence at computation time (database.models.get_change_sequence).
+    An entry is dropped as soon as any of those diseases is stamped as changed,
+    which the ORM session hooks do on every commit that touches the disease,
+    its practices, contraindications or modules. Edits to other diseases leave
+    the entry alone.
+    
+    Invalidation is per process: change stamps live in memory, so an edit
+    committed by another worker process (or outside the app) is not seen here,
+    and this process serves the old result until the entry's TTL expires
+    (RECOMMENDATION_CACHE_TTL, default 600 s). Run a single worker, lower the
+    TTL, or call invalidate_recommendation_cache() / POST /api/engine/refresh
+    in each worker when that matters.
+    
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_size=1024, ttl=600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(kind, disease_names, db_path=None):
+        """Canonical cache key for a request: (db, kind, folded names in request order)."""
+        folded = (DiseaseNameIndex.fold(name) for name in disease_names)
+        return (db_path, kind, tuple(name for name in folded if name))
+    
+    def get(self, key):
+        """Return the cached value, or None on a miss (expired/invalidated entries count as misses)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                sequence, disease_ids, expires_at, value = entry
+                if time.monotonic() < expires_at and not diseases_changed_since(disease_ids, sequence):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, value, disease_ids, sequence):
+        """
+        Store a value computed from data no newer than `sequence`
+        (read the sequence BEFORE loading the data, so a concurrent edit invalidates it)
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (sequence, frozenset(disease_ids), time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, disease_ids=None):
+        """Drop entries for the given disease ids (all entries if None)."""
+        with self._lock:
+            if disease_ids is None:
+                self._entries.clear()
+                return
+            disease_ids = set(disease_ids)
+            for key in [k for k, entry in self._entries.items() if entry[1] & disease_ids]:
+                del self._entries[key]
+    
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+            }
+
+
+# Process-wide result cache shared by all engine instances
+_recommendation_cache = RecommendationCache(
+    max_size=int(os.getenv('RECOMMENDATION_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('RECOMMENDATION_CACHE_TTL', '600')),
+)
+
+
 class YogaTherapyRecommendationEngine:
     """
     The main engine that generates practice recommendations for multiple diseases
@@ -32,7 +138,6 @@ class YogaTherapyRecommendationEngine:
     
     def __init__(self, db_path=None):
         self.db_path = db_path or get_database_url()
-        self.session = get_session(self.db_path)
         self.practice_segment_order = [
             # Canonical categories (match web UI)
             'Preparatory practices',
@@ -58,15 +163,7 @@ class YogaTherapyRecommendationEngine:
             'Yogic Counselling'
         ]
         # Map legacy/variant labels to canonical labels so the engine matches the UI
-        self.segment_aliases = {
-            'Preparatory Practice': 'Preparatory practices',
-            'Breathing Practice': 'Breathing practices',
-            'Sequential Yogic Practice': 'Sequential yogic practices',
-            'Suryanamaskara': 'Sequential yogic practices',
-            'Additional Practices': 'Additional practices',
-            'Kriya (Cleansing Techniques)': 'Kriya (cleansing)',
-            'Yogic Counselling': 'Yogic counselling'
-        }
+        self.segment_aliases = dict(SEGMENT_ALIASES)
     
     def get_recommendations(self, disease_names):
         """
@@ -77,157 +174,190 @@ class YogaTherapyRecommendationEngine:
             
         Returns:
             Dictionary organized by practice segments with combined practices and citations
+            (shared with the result cache: treat as read-only)
         """
+        key = RecommendationCache.make_key('recommendations', disease_names, self.db_path)
+        cached = _recommendation_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Read the change sequence before the data so a concurrent edit invalidates this entry
+        sequence = get_change_sequence()
+        snapshot = get_snapshot(self.db_path)
         
-        # Step 1: Fetch all diseases from database
-        diseases = self._fetch_diseases(disease_names)
+        # Step 1: Resolve diseases from the snapshot, in request order
+        diseases = self._fetch_diseases(list(disease_names), snapshot)
         
+        output = self._recommend(diseases, snapshot)
+        _recommendation_cache.put(key, output, [d.id for d in diseases], sequence)
+        return output
+    
+    def get_recommendations_batch(self, list_of_disease_lists):
+        """
+        Get recommendations for many disease sets in one call
+        
+        All names across the batch are resolved once against a single snapshot,
+        and every result is computed from that shared data.
+        
+        Args:
+            list_of_disease_lists: List of disease name lists
+                (e.g., [['Depression', 'GAD'], ['Insomnia']])
+            
+        Returns:
+            List of recommendation dictionaries, in the same order as the input
+        """
+        keys = [
+            RecommendationCache.make_key('recommendations', disease_names, self.db_path)
+            for disease_names in list_of_disease_lists
+        ]
+        results = [_recommendation_cache.get(key) for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        sequence = get_change_sequence()
+        snapshot = get_snapshot(self.db_path)
+        
+        # Resolve every distinct name once for the whole batch
+        unique_names = sorted({name for i in pending for name in keys[i][2]})
+        resolved = dict(zip(unique_names, self._resolve_names(unique_names, snapshot)))
+        
+        computed = {}
+        for i in pending:
+            key = keys[i]
+            if key not in computed:
+                diseases = [resolved[name] for name in key[2] if resolved.get(name)]
+                computed[key] = self._recommend(diseases, snapshot)
+                _recommendation_cache.put(key, computed[key], [d.id for d in diseases], sequence)
+            results[i] = computed[key]
+        return results
+    
+    def _recommend(self, diseases, snapshot):
+        """
+        Build the recommendation output for already-resolved diseases
+        """
         if not diseases:
             return {"error": "No diseases found in database"}
         
         # Step 2: Collect all practices for these diseases
-        all_practices = self._collect_practices(diseases)
+        all_practices = self._collect_practices(diseases, snapshot)
         
         # Step 3: Organize by practice segment and remove duplicates
-        organized_practices = self._organize_by_segment(all_practices)
+        organized_practices = self._organize_by_segment(all_practices, snapshot)
         
         # Step 4: Apply contraindications
-        final_practices = self._apply_contraindications(organized_practices, diseases)
+        final_practices, contraindication_report = self._apply_contraindications(
+            organized_practices, diseases, snapshot
+        )
         
         # Step 5: Add module information and format output
-        output = self._format_output(final_practices, diseases)
+        output = self._format_output(final_practices, diseases, snapshot)
         
-        # Add contraindication information if available
-        if hasattr(self, '_contraindication_report'):
-            output['contraindication_report'] = self._contraindication_report
+        # Add contraindication information
+        output['contraindication_report'] = contraindication_report
         
         return output
     
-    def _fetch_diseases(self, disease_names):
+    def _fetch_diseases(self, disease_names, snapshot):
         """
-        Fetch disease objects from database with eager loading
+        Resolve disease names to disease records from the snapshot
         """
-        # Use eager loading to prevent N+1 queries
-        diseases = []
-        for name in disease_names:
-            search_name = (name or '').strip()
-            if not search_name:
-                continue
-            base_query = self.session.query(Disease).options(
-                selectinload(Disease.practices),
-                selectinload(Disease.contraindications)
-            )
-            # Prefer exact (case-insensitive) match to avoid ambiguous partials
-            disease = base_query.filter(func.lower(Disease.name) == search_name.lower()).first()
-            # Fallback to partial match for backward compatibility
-            if not disease:
-                disease = base_query.filter(Disease.name.ilike(f'%{search_name}%')).first()
-            
-            if disease:
-                diseases.append(disease)
-            else:
+        return [disease for disease in self._resolve_names(disease_names, snapshot) if disease]
+    
+    def _resolve_names(self, disease_names, snapshot):
+        """
+        Resolve each name to a disease record (or None), preserving input positions
+        """
+        # Exact (case-insensitive) match first, then partial match for backward compatibility
+        resolved = snapshot.find_diseases(disease_names)
+        
+        for name, disease in zip(disease_names, resolved):
+            if disease is None and (name or '').strip():
                 print(f"Warning: Disease '{name}' not found in database")
         
-        return diseases
+        return resolved
     
-    def _collect_practices(self, diseases):
+    def _collect_practices(self, diseases, snapshot):
         """
         Collect all practices associated with the given diseases
         """
         all_practices = []
         
         for disease in diseases:
-            all_practices.extend(disease.practices)
+            all_practices.extend(snapshot.practices_for(disease.id))
         
         return all_practices
     
-    def _organize_by_segment(self, practices):
+    def _organize_by_segment(self, practices, snapshot):
         """
         Organize practices by practice segment and remove duplicates
         
         Duplicate detection is based on:
         - Matching practice_english (case-insensitive)
         - Same practice_segment and sub_category
+        
+        Dedup keys and segment/sub-category groups are interned integer ids
+        precomputed on the snapshot, so this is integer set/dict work only.
         """
-        # Dictionary structure: practice_segment -> sub_category -> list of unique practices
-        organized = defaultdict(lambda: defaultdict(list))
+        key_ids = snapshot.practice_key_ids
+        group_ids = snapshot.practice_group_ids
         
         # Track what we've already added to avoid duplicates
-        seen_practices = set()
+        seen_keys = set()
+        groups = {}  # group id -> unique practices, in first-seen order
         
         for practice in practices:
-            # Create a unique identifier for this practice
-            # We use practice_english (lowercased) + practice_segment + sub_category as the key
-            normalized_segment = self._normalize_segment(practice.practice_segment)
-            practice_key = (
-                practice.practice_english.lower().strip(),
-                normalized_segment,
-                practice.sub_category or ''
-            )
-            
+            key_id = key_ids[practice.id]
             # Only add if we haven't seen this exact practice before
-            if practice_key not in seen_practices:
-                organized[normalized_segment][practice.sub_category or 'general'].append(practice)
-                seen_practices.add(practice_key)
+            if key_id not in seen_keys:
+                seen_keys.add(key_id)
+                groups.setdefault(group_ids[practice.id], []).append(practice)
+        
+        # Build the practice_segment -> sub_category -> practices structure once
+        organized = {}
+        for group_id, group_practices in groups.items():
+            segment, sub_category = snapshot.group_labels[group_id]
+            organized.setdefault(segment, {})[sub_category] = group_practices
         
         return organized
     
-    def _find_applicable_combinations(self, user_disease_names):
+    def _find_applicable_combinations(self, user_disease_names, snapshot=None):
         """
         Find all disease combinations that are subsets of the user's diseases.
         
+        Uses the snapshot's pre-parsed inverted index (disease name -> combinations),
+        so the cost depends on the user's diseases, not on the number of combinations.
+        
         Args:
             user_disease_names: Set of disease names the user has
+            snapshot: Knowledge-graph snapshot (current one if omitted)
             
         Returns:
-            List of DiseaseCombination objects that apply to the user
+            List of combination records (id, combination_name, diseases_json) that apply to the user
         """
-        # Get all disease combinations from database
-        all_combinations = self.session.query(DiseaseCombination).all()
-        applicable_combinations = []
-        
-        for combo in all_combinations:
-            # Parse the diseases from JSON
-            try:
-                combo_diseases = set(json.loads(combo.diseases_json))
-                
-                # Check if this combination is a subset of user's diseases
-                if combo_diseases.issubset(user_disease_names):
-                    applicable_combinations.append(combo)
-            except (json.JSONDecodeError, TypeError):
-                # Skip malformed combinations
-                continue
-        
-        return applicable_combinations
+        snapshot = snapshot or get_snapshot(self.db_path)
+        return snapshot.combination_index.applicable(user_disease_names)
     
-    def _apply_contraindications(self, organized_practices, diseases):
+    def _apply_contraindications(self, organized_practices, diseases, snapshot):
         """
         Remove practices that are contraindicated for the user's disease combination
         
-        This now works with disease COMBINATIONS rather than individual diseases.
-        A practice is removed if it's contraindicated for any subset of the user's diseases.
+        A practice is removed if any of the user's diseases contraindicates it,
+        either directly ('practice'), through its category ('category') or
+        through its kosha ('kosha'). Uses the snapshot's precompiled bitmasks.
+        
+        Returns:
+            (filtered practices, contraindication report)
         """
-        # Collect contraindications directly from diseases (authoritative source)
-        contraindicated = set()
-        contraindication_details = {}
-
-        for disease in diseases:
-            for contra in disease.contraindications:
-                contra_key = (
-                    contra.practice_english.lower().strip(),
-                    self._normalize_segment(contra.practice_segment),
-                    contra.sub_category or ''
-                )
-                contraindicated.add(contra_key)
-
-                if contra_key not in contraindication_details:
-                    contraindication_details[contra_key] = []
-                contraindication_details[contra_key].append({
-                    'practice': contra.practice_english,
-                    'practice_segment': self._normalize_segment(contra.practice_segment),
-                    'disease': disease.name,
-                    'reason': contra.reason
-                })
+        index = snapshot.contraindication_index
+        blocked = index.mask_for(d.id for d in diseases)
+        
+        # (disease, contraindication) pairs, only needed to explain removals
+        disease_contras = [
+            (disease, contra)
+            for disease in diseases
+            for contra in snapshot.contraindications_for(disease.id)
+        ]
         
         # Filter out contraindicated practices
         filtered_practices = defaultdict(lambda: defaultdict(list))
@@ -236,14 +366,8 @@ class YogaTherapyRecommendationEngine:
         for segment, sub_categories in organized_practices.items():
             for sub_cat, practices in sub_categories.items():
                 for practice in practices:
-                    practice_key = (
-                        practice.practice_english.lower().strip(),
-                        segment,
-                        practice.sub_category or ''
-                    )
-                    
                     # Only include if not contraindicated
-                    if practice_key not in contraindicated:
+                    if not blocked or not index.is_blocked(blocked, practice.id):
                         filtered_practices[segment][sub_cat].append(practice)
                     else:
                         # Track what was removed
@@ -251,19 +375,29 @@ class YogaTherapyRecommendationEngine:
                             'practice': practice.practice_english,
                             'practice_segment': segment,
                             'sub_category': sub_cat,
-                            'contraindication_details': contraindication_details[practice_key]
+                            'contraindication_details': [
+                                {
+                                    'practice': contra.practice_english or contra.practice_segment or contra.kosha,
+                                    'contraindication_type': contra.contraindication_type or 'practice',
+                                    'practice_segment': self._normalize_segment(contra.practice_segment),
+                                    'disease': disease.name,
+                                    'reason': contra.reason
+                                }
+                                for disease, contra in disease_contras
+                                if index.blocks(contra, practice)
+                            ]
                         })
         
-        # Store contraindication info for reporting
-        self._contraindication_report = {
+        # Contraindication info for reporting (returned, not stored, so one engine can serve many threads)
+        contraindication_report = {
             'removed_practices': removed_practices,
-            'total_contraindications': len(contraindicated),
+            'total_contraindications': len({index.rule_keys[contra.id] for _, contra in disease_contras}),
             'diseases_checked': [d.name for d in diseases]
         }
         
-        return filtered_practices
+        return filtered_practices, contraindication_report
     
-    def _format_output(self, practices_by_segment, diseases):
+    def _format_output(self, practices_by_segment, diseases, snapshot):
         """
         Format the final output with proper structure and citations
         """
@@ -273,10 +407,12 @@ class YogaTherapyRecommendationEngine:
             'practices_by_segment': {}
         }
         
-        # Add module information for each disease
+        # Add module information for each disease (one bulk map, preferred module per disease)
+        modules_by_disease = snapshot.modules_for_diseases(d.id for d in diseases)
         for disease in diseases:
-            module = self.session.query(Module).filter_by(disease_id=disease.id).first()
-            if module:
+            modules = modules_by_disease[disease.id]
+            if modules:
+                module = modules[0]
                 output['modules'].append({
                     'disease': disease.name,
                     'developed_by': module.developed_by,
@@ -301,120 +437,133 @@ class YogaTherapyRecommendationEngine:
                 output['practices_by_segment'][segment] = {}
 
                 for sub_cat, practices in practices_by_segment[segment].items():
-                    formatted_practices = []
-
-                    for practice in practices:
-                        practice_dict = {
-                            'practice_sanskrit': practice.practice_sanskrit,
-                            'practice_english': practice.practice_english,
-                            'rounds': practice.rounds,
-                            'time_minutes': practice.time_minutes
-                        }
-
-                        # Add optional fields if they exist
-                        if practice.strokes_per_min:
-                            practice_dict['strokes_per_min'] = practice.strokes_per_min
-
-                        if practice.strokes_per_cycle:
-                            practice_dict['strokes_per_cycle'] = practice.strokes_per_cycle
-
-                        if practice.rest_between_cycles_sec:
-                            practice_dict['rest_between_cycles_sec'] = practice.rest_between_cycles_sec
-
-                        if practice.variations:
-                            try:
-                                practice_dict['variations'] = json.loads(practice.variations)
-                            except:
-                                practice_dict['variations'] = practice.variations
-
-                        if practice.steps:
-                            try:
-                                practice_dict['steps'] = json.loads(practice.steps)
-                            except:
-                                practice_dict['steps'] = practice.steps
-
-                        if practice.description:
-                            practice_dict['description'] = practice.description
-
-                        # Add citation if available
-                        if practice.citation:
-                            practice_dict['citation'] = {
-                                'text': practice.citation.citation_text,
-                                'type': practice.citation.citation_type,
-                                'reference': practice.citation.full_reference
-                            }
-
-                        formatted_practices.append(practice_dict)
+                    # Pre-rendered per-practice fragments: no JSON parsing here
+                    formatted_practices = [snapshot.practice_fragment(practice) for practice in practices]
 
                     output['practices_by_segment'][segment][sub_cat] = formatted_practices
         
         return output
     
+    def get_modules_for_diseases(self, disease_ids):
+        """
+        Get the modules of several diseases at once, served from the snapshot
+        
+        Args:
+            disease_ids: Iterable of disease ids
+            
+        Returns:
+            Dictionary disease_id -> list of module dicts, preferred module first
+            (attributed modules, then modules with more practices, then oldest)
+        """
+        snapshot = get_snapshot(self.db_path)
+        return {
+            disease_id: [
+                {
+                    'id': module.id,
+                    'code': module.code,
+                    'developed_by': module.developed_by,
+                    'paper_link': module.paper_link,
+                    'description': module.module_description,
+                    'practice_count': snapshot.module_practice_counts.get(module.id, 0)
+                }
+                for module in modules
+            ]
+            for disease_id, modules in snapshot.modules_for_diseases(disease_ids).items()
+        }
+    
     def get_summary(self, disease_names):
         """
         Get a text summary of recommendations (useful for RAG output)
         """
+        key = RecommendationCache.make_key('summary', disease_names, self.db_path)
+        cached = _recommendation_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        sequence = get_change_sequence()
+        summary = ''.join(self.iter_summary(disease_names))
+        
+        disease_ids = [d.id for d in get_snapshot(self.db_path).find_diseases(list(disease_names)) if d]
+        if disease_ids:
+            _recommendation_cache.put(key, summary, disease_ids, sequence)
+        return summary
+    
+    def iter_summary(self, disease_names):
+        """
+        Generate the text summary chunk by chunk: header, modules, then one chunk per segment
+        
+        ''.join(iter_summary(names)) == get_summary(names). Use this to stream
+        large summaries without building the whole string first.
+        
+        Usage:
+            for chunk in engine.iter_summary(['Depression', 'GAD']):
+                prompt_file.write(chunk)
+        """
         recommendations = self.get_recommendations(disease_names)
         
         if 'error' in recommendations:
-            return recommendations['error']
+            yield recommendations['error']
+            return
         
-        summary = f"Yoga Therapy Recommendations for: {', '.join(recommendations['diseases'])}\n\n"
+        yield f"Yoga Therapy Recommendations for: {', '.join(recommendations['diseases'])}\n\n"
         
         # Add module information
         if recommendations['modules']:
-            summary += "MODULES:\n"
+            lines = ["MODULES:\n"]
             for module in recommendations['modules']:
-                summary += f"- {module['disease']}: Developed by {module['developed_by']}\n"
-            summary += "\n"
+                lines.append(f"- {module['disease']}: Developed by {module['developed_by']}\n")
+            lines.append("\n")
+            yield ''.join(lines)
         
         # Add practices by segment
-        summary += "RECOMMENDED PRACTICES:\n\n"
+        yield "RECOMMENDED PRACTICES:\n\n"
         
         for segment, sub_categories in recommendations['practices_by_segment'].items():
-            summary += f"{segment.upper()}:\n"
+            yield self._summarize_segment(segment, sub_categories)
+    
+    def _summarize_segment(self, segment, sub_categories):
+        """
+        Text block for one practice segment of the summary
+        """
+        lines = [f"{segment.upper()}:\n"]
+        
+        for sub_cat, practices in sub_categories.items():
+            if sub_cat != 'general':
+                lines.append(f"  {sub_cat.replace('_', ' ').title()}:\n")
             
-            for sub_cat, practices in sub_categories.items():
-                if sub_cat != 'general':
-                    summary += f"  {sub_cat.replace('_', ' ').title()}:\n"
+            for practice in practices:
+                practice_name = practice['practice_english']
+                if practice.get('practice_sanskrit'):
+                    practice_name = f"{practice['practice_sanskrit']} ({practice_name})"
                 
-                for practice in practices:
-                    practice_name = practice['practice_english']
-                    if practice.get('practice_sanskrit'):
-                        practice_name = f"{practice['practice_sanskrit']} ({practice_name})"
-                    
-                    summary += f"    • {practice_name}"
-                    
-                    # Add details
-                    details = []
-                    if practice.get('rounds'):
-                        details.append(f"{practice['rounds']} rounds")
-                    if practice.get('time_minutes'):
-                        details.append(f"{practice['time_minutes']} min")
-                    
-                    if details:
-                        summary += f" - {', '.join(details)}"
-                    
-                    # Add citation
-                    if practice.get('citation'):
-                        summary += f" [Cited: {practice['citation']['text']}]"
-                    
-                    summary += "\n"
+                line = f"    • {practice_name}"
+                
+                # Add details
+                details = []
+                if practice.get('rounds'):
+                    details.append(f"{practice['rounds']} rounds")
+                if practice.get('time_minutes'):
+                    details.append(f"{practice['time_minutes']} min")
+                
+                if details:
+                    line += f" - {', '.join(details)}"
+                
+                # Add citation
+                if practice.get('citation'):
+                    line += f" [Cited: {practice['citation']['text']}]"
                 
-                summary += "\n"
+                lines.append(line + "\n")
+            
+            lines.append("\n")
         
-        return summary
+        return ''.join(lines)
     
     def close(self):
-        """Close database session"""
-        self.session.close()
+        """Release the engine (nothing to release: reads go through the snapshot, not a held session)"""
 
     def _normalize_segment(self, segment):
         """Normalize practice segment labels to canonical names."""
-        if not segment:
-            return segment
-        segment = segment.strip()
-        return self.segment_aliases.get(segment, segment)
+        return normalize_segment(segment)
 
 
 # Convenience function for quick usage
@@ -432,6 +581,35 @@ def get_recommendations_for_diseases(disease_names, db_path=None):
         engine.close()
 
 
+def get_batch_recommendations_for_diseases(list_of_disease_lists, db_path=None):
+    """
+    Quick function to get recommendations for many disease sets at once
+    
+    Usage:
+        results = get_batch_recommendations_for_diseases([['Depression', 'GAD'], ['Insomnia']])
+    """
+    engine = YogaTherapyRecommendationEngine(db_path)
+    try:
+        return engine.get_recommendations_batch(list_of_disease_lists)
+    finally:
+        engine.close()
+
+
+def get_recommendation_cache_stats():
+    """Hit/miss counters and size of the process-wide recommendation cache"""
+    return _recommendation_cache.stats()
+
+
+def invalidate_recommendation_cache(disease_ids=None):
+    """
+    Drop cached recommendations for the given disease ids (everything if None)
+    
+    Edits made through the ORM invalidate automatically; use this after
+    changing the database by other means (raw SQL, another process).
+    """
+    _recommendation_cache.invalidate(disease_ids)
+
+
 def get_summary_for_diseases(disease_names, db_path=None):
     """
     Quick function to get text summary
@@ -0,0 +1,105 @@
+"""
+Recommendation Plan Pipeline
+
+Final stage of the recommendation wizard, shared by the category selection
+step and the tie resolution step:
+1. Attach RCT evidence (parenthetical citations) to the selected practices
+2. Organize practices by Kosha, then Category, then Subcategory
+3. Sort each subcategory by rank key
+
+RCT citations are looked up in the practice -> RCT evidence index
+(see core/evidence_index.py) instead of scanning RCTs per request.
+
+Citations already computed are kept on the pipeline (export_citations /
+citations=...), so a later wizard step can reuse them instead of looking
+them up again.
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.evidence_index import get_evidence_index
+
+
+KOSHA_ORDER = {
+    'Annamaya Kosha': 1,
+    'Pranamaya Kosha': 2,
+    'Manomaya Kosha': 3,
+    'Anandamaya Kosha': 4,
+    'Vijnanamaya Kosha': 5
+}
+
+
+class RecommendationPipeline:
+    """
+    RCT evidence, kosha organization and ordering for a recommendation plan.
+
+    Usage:
+        pipeline = RecommendationPipeline(db_path)
+        organized, sorted_koshas = pipeline.build_plan(practices, rank_key)
+    """
+
+    def __init__(self, db_path=None, citations=None):
+        """
+        Args:
+            db_path: database URL of the evidence index
+            citations: {practice_id: [citation, ...]} from an earlier step (see export_citations)
+        """
+        self.db_path = db_path
+        self.citations = {int(pid): list(values) for pid, values in (citations or {}).items()}
+
+    def evidence_for(self, practices):
+        """
+        RCT citations for each practice: {practice_id: [citation, ...]}.
+
+        An RCT supports a practice when they share a disease and one of its
+        interventions names the practice (Sanskrit or English, case-insensitive)
+        or its category. Citations are in RCT id order.
+        """
+        missing = [p for p in practices if p.id not in self.citations]
+        if missing:
+            index = get_evidence_index(self.db_path)
+            for practice in missing:
+                self.citations[practice.id] = index.citations_for(
+                    {d.id for d in practice.diseases},
+                    practice.practice_sanskrit, practice.practice_english, practice.practice_segment
+                )
+        return {p.id: self.citations[p.id] for p in practices}
+
+    def export_citations(self):
+        """Computed citations in a JSON-serializable form (for the wizard state store)."""
+        return {str(pid): values for pid, values in self.citations.items()}
+
+    def build_plan(self, practices, rank_key):
+        """
+        Organize practices as {kosha: {category: {subcategory: [{'practice', 'rcts'}]}}}.
+
+        Args:
+            practices: Practice objects of the plan
+            rank_key: callable(practice) -> sort key, best first
+
+        Returns:
+            (organized_practices, koshas sorted by KOSHA_ORDER)
+        """
+        evidence = self.evidence_for(practices)
+
+        organized_practices = {}
+        for practice in practices:
+            kosha = practice.kosha or 'Unknown'
+            category = practice.practice_segment or 'Unknown'
+            subcategory = practice.sub_category or 'None'
+            organized_practices.setdefault(kosha, {}).setdefault(category, {}).setdefault(subcategory, []).append({
+                'practice': practice,
+                'rcts': evidence.get(practice.id, [])
+            })
+
+        for categories in organized_practices.values():
+            for subcategories in categories.values():
+                for entries in subcategories.values():
+                    entries.sort(key=lambda entry: rank_key(entry['practice']))
+
+        sorted_koshas = sorted(organized_practices.keys(), key=lambda kosha: KOSHA_ORDER.get(kosha, 999))
+        return organized_practices, sorted_koshas
@@ -0,0 +1,118 @@
+"""
+Recommendation Snapshot Refresh
+
+Keeps the knowledge-graph snapshot and RCT evidence index that the
+recommendation engine reads warm for the web API. The engine itself holds no
+per-request state (every recommendation is computed from the snapshot), so
+the app shares one engine across requests and threads.
+
+Lifecycle:
+- warm_up(): build the snapshot and evidence index (app startup)
+- health(): snapshot and result-cache status (health checks)
+- refresh(): drop the snapshot, RCT evidence index and cached results and
+  rebuild them; also scheduled in the background whenever a commit changes
+  snapshot or RCT tables, so the first request after an edit does not pay
+  for the rebuild (not on SQLite, whose sessions share one connection; the
+  snapshot is then rebuilt on first use)
+- close(): stop listening for changes (process exit)
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from database.models import get_database_url, add_change_listener, remove_change_listener, uses_shared_connection
+from core.knowledge_graph import SNAPSHOT_TABLES, get_snapshot, invalidate_snapshot
+from core.evidence_index import EVIDENCE_TABLES, get_evidence_index, invalidate_evidence_index
+from core.recommendation_engine import get_recommendation_cache_stats, invalidate_recommendation_cache
+
+
+class SnapshotRefresher:
+    """
+    Builds and refreshes the recommendation snapshot for one database.
+
+    Usage:
+        refresher = SnapshotRefresher(db_path)
+        refresher.warm_up()
+        engine = YogaTherapyRecommendationEngine(db_path)   # shared, stateless
+        engine.get_recommendations(['Depression', 'GAD'])
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_database_url()
+        self._lock = threading.Lock()
+        self._refresh_pending = threading.Event()
+        self._refresh_thread = None
+        self.last_refresh_error = None
+        self.warmed_at = None
+        add_change_listener(self._on_tables_changed)
+
+    def warm_up(self):
+        """Build the snapshot and evidence index before the first request."""
+        get_snapshot(self.db_path)
+        get_evidence_index(self.db_path)
+        self.warmed_at = time.time()
+
+    def refresh(self):
+        """Drop the snapshot, evidence index and cached results, then rebuild them."""
+        invalidate_snapshot(self.db_path)
+        invalidate_evidence_index(self.db_path)
+        invalidate_recommendation_cache()
+        get_snapshot(self.db_path)
+        get_evidence_index(self.db_path)
+
+    def _on_tables_changed(self, table_names):
+        """Change listener: rebuild the snapshot in the background after relevant commits."""
+        if not table_names.intersection(SNAPSHOT_TABLES + EVIDENCE_TABLES):
+            return
+        if uses_shared_connection(self.db_path):
+            # A background session would share the request's connection; rebuild lazily instead
+            return
+        self._refresh_pending.set()
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._rebuild_pending, name='snapshot-refresh', daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _rebuild_pending(self):
+        # Coalesce bursts of commits (e.g. imports) into as few rebuilds as possible
+        while self._refresh_pending.is_set():
+            self._refresh_pending.clear()
+            try:
+                get_snapshot(self.db_path)
+                get_evidence_index(self.db_path)
+                self.last_refresh_error = None
+            except Exception as exc:
+                self.last_refresh_error = str(exc)
+                print(f"Warning: background snapshot rebuild failed: {exc}")
+
+    def health(self):
+        """Status for health checks."""
+        snapshot_status = {'ok': True}
+        try:
+            snapshot = get_snapshot(self.db_path)
+            snapshot_status.update({
+                'age_seconds': round(time.monotonic() - snapshot.built_at, 3),
+                'diseases': len(snapshot.diseases),
+                'practices': len(snapshot.practices),
+            })
+        except Exception as exc:
+            snapshot_status = {'ok': False, 'error': str(exc)}
+        return {
+            'status': 'ok' if snapshot_status['ok'] else 'error',
+            'warmed_at': self.warmed_at,
+            'snapshot': snapshot_status,
+            'cache': get_recommendation_cache_stats(),
+            'last_refresh_error': self.last_refresh_error,
+        }
+
+    def close(self):
+        """Stop listening for changes."""
+        remove_change_listener(self._on_tables_changed)
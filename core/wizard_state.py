@@ -0,0 +1,210 @@
+"""
+Recommendation Wizard State Store
+
+The category -> tie resolution -> result wizard spans several requests. Its
+intermediate state (tied candidates with their rank keys, practices already
+picked, category selections) used to travel in the signed Flask cookie,
+which grows with the tie set and can exceed browser cookie limits. Here it
+is kept on the server instead and the cookie only carries an opaque token.
+
+Backends:
+- MemoryWizardStateStore: in-process LRU/TTL (default; single worker)
+- SQLiteWizardStateStore: one SQLite table shared by all workers on a host
+
+States are JSON-serializable dicts. Select the backend with
+create_wizard_state_store() (environment variables documented there).
+"""
+
+import sys
+import os
+
+# Add parent directory to path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def new_wizard_token():
+    """Random, URL-safe token identifying one wizard run."""
+    return secrets.token_urlsafe(16)
+
+
+class MemoryWizardStateStore:
+    """
+    LRU/TTL wizard state store kept in process memory.
+
+    Stored states are shared with callers and must be treated as read-only;
+    use put() to replace a state.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Return the state for a token, or None if it is unknown or expired."""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return state
+
+    def put(self, token, state):
+        """Store (or replace) the state for a token."""
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, token):
+        """Forget a token (no-op if unknown)."""
+        if not token:
+            return
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def stats(self):
+        """Backend name and current size."""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+            }
+
+
+class SQLiteWizardStateStore:
+    """
+    Wizard state store backed by a SQLite table, for multi-worker deployments.
+
+    Table: wizard_state(token TEXT PRIMARY KEY, state TEXT, expires_at REAL)
+    Expired rows are purged on write.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_file, ttl=3600):
+        self.db_file = db_file
+        self.ttl = ttl
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS wizard_state (
+                        token TEXT PRIMARY KEY,
+                        state TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_wizard_state_expires_at ON wizard_state (expires_at)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=20)
+
+    def get(self, token):
+        """Return the state for a token, or None if it is unknown or expired."""
+        if not token:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT state FROM wizard_state WHERE token = ? AND expires_at > ?",
+                (token, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def put(self, token, state):
+        """Store (or replace) the state for a token."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM wizard_state WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO wizard_state (token, state, expires_at) VALUES (?, ?, ?)",
+                    (token, json.dumps(state), now + self.ttl)
+                )
+        finally:
+            conn.close()
+
+    def delete(self, token):
+        """Forget a token (no-op if unknown)."""
+        if not token:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM wizard_state WHERE token = ?", (token,))
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Backend name and current size."""
+        conn = self._connect()
+        try:
+            size = conn.execute(
+                "SELECT COUNT(*) FROM wizard_state WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            'backend': self.backend,
+            'size': size,
+            'db_file': self.db_file,
+            'ttl_seconds': self.ttl,
+        }
+
+
+def _sqlite_file_from_url(db_url):
+    """File path of a sqlite:/// database URL, or None for other databases."""
+    if db_url and db_url.startswith('sqlite:///'):
+        path = db_url[len('sqlite:///'):]
+        if path and path != ':memory:':
+            return path
+    return None
+
+
+def create_wizard_state_store(db_url=None):
+    """
+    Build the wizard state store selected by the environment.
+
+    Environment variables:
+    - WIZARD_STATE_STORE: 'memory' (default) or 'sqlite'
+    - WIZARD_STATE_DB: SQLite file for the 'sqlite' backend (default: the
+      application database when it is SQLite, else wizard_state.db)
+    - WIZARD_STATE_MAX_ENTRIES: LRU size of the 'memory' backend (default 1024)
+    - WIZARD_STATE_TTL: seconds a wizard run stays resumable (default 3600)
+    """
+    backend = os.getenv('WIZARD_STATE_STORE', 'memory').lower()
+    ttl = float(os.getenv('WIZARD_STATE_TTL', '3600'))
+    if backend == 'sqlite':
+        db_file = os.getenv('WIZARD_STATE_DB') or _sqlite_file_from_url(db_url) or 'wizard_state.db'
+        return SQLiteWizardStateStore(db_file, ttl=ttl)
+    if backend != 'memory':
+        print(f"Warning: unknown WIZARD_STATE_STORE '{backend}', using in-memory store")
+    return MemoryWizardStateStore(
+        max_entries=int(os.getenv('WIZARD_STATE_MAX_ENTRIES', '1024')),
+        ttl=ttl,
+    )
@@ -0,0 +1,325 @@
+"""
+Full-Text Search
+
+Word-prefix full-text search over practices, RCTs, contraindications and
+modules, replacing '%term%' scans of several text columns.
+
+SQLite: one FTS5 table per document type (<table>_fts), external-content
+over the base table, kept in sync by AFTER INSERT/UPDATE/DELETE triggers so
+ORM writes, bulk statements and raw SQL edits are all indexed.
+
+PostgreSQL: a stored generated tsvector column (search_vector) per table with
+a GIN index; PostgreSQL keeps it current on every write.
+
+Both tokenize without stemming (FTS5 unicode61 with diacritics removed,
+PostgreSQL 'simple'), so 'breath' matches 'Breathing' and 'tadasana' matches
+'Tāḍāsana'. A query matches documents containing every word of it as a word
+prefix. Title columns rank above body columns and can be searched alone.
+RCTs are indexed by their normalized intervention names (rcts.intervention_names,
+kept in step with rct_interventions), not by the intervention JSON.
+
+Each document type is created in its own transaction, so one failing type
+does not disable the others. An index built over a different column list
+(an older version of FULLTEXT_DOCUMENTS) is dropped and rebuilt.
+
+Usage:
+    ensure_fulltext_index(engine)                       # startup / migration
+    ids = fulltext_match(session, 'rcts', 'pranayama anxiety')
+    if ids is not None:
+        query = query.filter(RCT.id.in_(ids))
+    hits = search_fulltext(session, 'kapal', kinds=['practices'], limit=10)
+"""
+
+import html
+import re
+from collections import namedtuple
+from sqlalchemy import Integer, inspect, text
+
+
+# A searchable document type: base table, title columns and body columns
+FullTextDocument = namedtuple('FullTextDocument', ['table', 'title_columns', 'body_columns'])
+
+FULLTEXT_DOCUMENTS = {
+    'practices': FullTextDocument(
+        'practices',
+        ('practice_english', 'practice_sanskrit', 'code'),
+        ('practice_segment', 'sub_category', 'kosha', 'description', 'how_to_do')
+    ),
+    'rcts': FullTextDocument(
+        'rcts',
+        ('title', 'parenthetical_citation'),
+        ('keywords', 'intervention_names', 'results', 'conclusion')
+    ),
+    'contraindications': FullTextDocument(
+        'contraindications',
+        ('practice_english', 'practice_sanskrit'),
+        ('practice_segment', 'sub_category', 'kosha', 'reason', 'source_name', 'apa_citation')
+    ),
+    'modules': FullTextDocument(
+        'modules',
+        ('developed_by', 'code'),
+        ('module_description',)
+    ),
+}
+
+# bm25 weight of a title column relative to a body column (SQLite)
+TITLE_WEIGHT = 10.0
+
+# Highlight markers; the snippet is HTML-escaped before they become <mark> tags
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_STOP = '\x03'
+
+_WORD = re.compile(r'[^\W_]+')
+
+# Document types installed per database URL (see fulltext_kinds)
+_installed = {}
+
+
+def _columns(document):
+    return document.title_columns + document.body_columns
+
+
+def _fts_table(document):
+    return f"{document.table}_fts"
+
+
+def _sqlite_statements(document):
+    fts = _fts_table(document)
+    columns = _columns(document)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, content='{document.table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {document.table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {document.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {document.table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sqlite_drop_statements(document):
+    fts = _fts_table(document)
+    return [f"DROP TRIGGER IF EXISTS {fts}_{suffix}" for suffix in ('ai', 'ad', 'au')] + [f"DROP TABLE IF EXISTS {fts}"]
+
+
+def _postgres_statements(document):
+    weighted = ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{'A' if column in document.title_columns else 'D'}')"
+        for column in _columns(document)
+    )
+    return [
+        f"ALTER TABLE {document.table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({weighted}) STORED",
+        # Records the indexed columns, so a changed column list is detected (see _index_state)
+        f"COMMENT ON COLUMN {document.table}.search_vector IS '{','.join(_columns(document))}'",
+        f"CREATE INDEX IF NOT EXISTS idx_{document.table}_search_vector "
+        f"ON {document.table} USING GIN (search_vector)",
+    ]
+
+
+def _index_state(connection, document):
+    """'current', 'stale' (built over other columns) or None (missing) for a document type's index."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        columns = tuple(row[1] for row in connection.execute(text(f"PRAGMA table_info({_fts_table(document)})")))
+        if not columns:
+            return None
+        return 'current' if columns == _columns(document) else 'stale'
+    if dialect.startswith('postgres'):
+        row = connection.execute(text(
+            "SELECT col_description(attrelid, attnum) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:table) AND attname = 'search_vector' AND NOT attisdropped"
+        ), {'table': document.table}).first()
+        if row is None:
+            return None
+        return 'current' if row[0] == ','.join(_columns(document)) else 'stale'
+    return None
+
+
+def _installed_kinds(connection):
+    """Document types whose full-text index exists, over the current columns, on this connection's database."""
+    return frozenset(
+        kind for kind, document in FULLTEXT_DOCUMENTS.items()
+        if _index_state(connection, document) == 'current'
+    )
+
+
+def ensure_fulltext_index(engine, rebuild=False):
+    """
+    Create the full-text indexes (and their sync triggers) that are missing.
+
+    New indexes are filled from the existing rows; rebuild=True also refills
+    existing SQLite indexes. Stale indexes are dropped and rebuilt. Each type
+    is created in its own transaction; a type that fails is reported and left
+    out. Safe to call on every startup.
+
+    Returns:
+        frozenset of the document types that can be searched
+    """
+    dialect = engine.dialect.name
+    for kind, document in FULLTEXT_DOCUMENTS.items():
+        state = None
+        try:
+            with engine.begin() as conn:
+                existing = {column['name'] for column in inspect(conn).get_columns(document.table)}
+                missing = [column for column in _columns(document) if column not in existing]
+                if missing:
+                    print(f"Warning: full-text index for {kind} skipped, missing columns: {', '.join(missing)}")
+                    continue
+                state = _index_state(conn, document)
+                if dialect == 'sqlite':
+                    statements = _sqlite_statements(document)
+                    if state == 'current':
+                        # Keep the triggers; refill only on request
+                        statements = statements[1:4] + (statements[4:] if rebuild else [])
+                    elif state == 'stale':
+                        statements = _sqlite_drop_statements(document) + statements
+                elif dialect.startswith('postgres'):
+                    statements = _postgres_statements(document)
+                    if state == 'stale':
+                        statements = [f"ALTER TABLE {document.table} DROP COLUMN search_vector"] + statements
+                else:
+                    continue
+                for statement in statements:
+                    conn.execute(text(statement))
+        except Exception as exc:
+            print(f"Warning: full-text index for {kind} unavailable: {exc}")
+            if dialect == 'sqlite' and state != 'current':
+                # pysqlite commits DDL as it runs: drop a half-built index so writes keep working
+                with engine.begin() as conn:
+                    for statement in _sqlite_drop_statements(document):
+                        conn.execute(text(statement))
+    with engine.connect() as conn:
+        installed = _installed_kinds(conn)
+    _installed[str(engine.url)] = installed
+    return installed
+
+
+def fulltext_kinds(session):
+    """Document types with a full-text index in the session's database (checked once per URL)."""
+    bind = session.get_bind()
+    key = str(bind.engine.url)
+    kinds = _installed.get(key)
+    if kinds is None:
+        # Query through the session: on SQLite's shared connection a separate
+        # connection would roll back the session's transaction when closed
+        kinds = _installed[key] = _installed_kinds(session.connection())
+    return kinds
+
+
+def _query_words(query):
+    return _WORD.findall((query or '').lower())
+
+
+def _sqlite_match(document, words, titles_only):
+    expression = ' '.join(f'"{word}"*' for word in words)
+    if titles_only:
+        return f"{{{' '.join(document.title_columns)}}} : ({expression})"
+    return expression
+
+
+def _postgres_tsquery(words, titles_only):
+    weight = 'A' if titles_only else ''
+    return ' & '.join(f"{word}:*{weight}" for word in words)
+
+
+def fulltext_match(session, kind, query, titles_only=False):
+    """
+    Ids of the documents of a type matching a query, as a subquery for .in_().
+
+    Returns None when the query has no searchable words or the type has no
+    full-text index, so callers can fall back to a LIKE filter.
+    """
+    words = _query_words(query)
+    if not words or kind not in fulltext_kinds(session):
+        return None
+    document = FULLTEXT_DOCUMENTS[kind]
+    if session.get_bind().dialect.name == 'sqlite':
+        fts = _fts_table(document)
+        statement = text(f"SELECT rowid AS id FROM {fts} WHERE {fts} MATCH :fts_{kind}").bindparams(
+            **{f'fts_{kind}': _sqlite_match(document, words, titles_only)}
+        )
+    else:
+        statement = text(
+            f"SELECT id FROM {document.table} WHERE search_vector @@ to_tsquery('simple', :fts_{kind})"
+        ).bindparams(**{f'fts_{kind}': _postgres_tsquery(words, titles_only)})
+    return statement.columns(id=Integer)
+
+
+def render_snippet(raw):
+    """HTML-escape a raw snippet and turn its highlight markers into <mark> tags."""
+    return html.escape(raw or '').replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_STOP, '</mark>')
+
+
+FullTextHit = namedtuple('FullTextHit', ['kind', 'id', 'score', 'snippet'])
+
+
+def search_fulltext(session, query, kinds=None, limit=20):
+    """
+    Relevance-ranked hits across document types, best first.
+
+    bm25 / ts_rank_cd scores depend on each table's size and text lengths, so
+    they are not comparable across document types. Each type's scores are
+    divided by its best score before merging: the top hit of every type scores
+    1.0, and hits of different types are ranked by their relevance within
+    their own type.
+
+    Args:
+        query: user search text; every word must match a word prefix
+        kinds: document types to search (default: all installed)
+        limit: maximum number of hits in total
+
+    Returns:
+        [FullTextHit(kind, id, score, snippet)], score in [0, 1] (see above),
+        snippet is HTML with <mark> highlights
+    """
+    words = _query_words(query)
+    installed = fulltext_kinds(session)
+    kinds = [kind for kind in (kinds or FULLTEXT_DOCUMENTS) if kind in installed]
+    if not words or not kinds or limit <= 0:
+        return []
+
+    sqlite = session.get_bind().dialect.name == 'sqlite'
+    hits = []
+    for kind in kinds:
+        document = FULLTEXT_DOCUMENTS[kind]
+        if sqlite:
+            fts = _fts_table(document)
+            weights = ', '.join(
+                str(TITLE_WEIGHT if column in document.title_columns else 1.0) for column in _columns(document)
+            )
+            rows = session.execute(text(
+                f"SELECT rowid, -bm25({fts}, {weights}) AS score, "
+                f"snippet({fts}, -1, :start, :stop, '…', 16) AS snippet "
+                f"FROM {fts} WHERE {fts} MATCH :match ORDER BY bm25({fts}, {weights}) LIMIT :limit"
+            ), {
+                'match': _sqlite_match(document, words, False), 'limit': limit,
+                'start': _HIGHLIGHT_START, 'stop': _HIGHLIGHT_STOP,
+            })
+        else:
+            body = ', '.join(_columns(document))
+            rows = session.execute(text(
+                f"SELECT id, ts_rank_cd(search_vector, q) AS score, "
+                f"ts_headline('simple', concat_ws(' ', {body}), q, :options) AS snippet "
+                f"FROM {document.table}, to_tsquery('simple', :match) AS q "
+                f"WHERE search_vector @@ q ORDER BY score DESC LIMIT :limit"
+            ), {
+                'match': _postgres_tsquery(words, False), 'limit': limit,
+                'options': f'StartSel="{_HIGHLIGHT_START}", StopSel="{_HIGHLIGHT_STOP}", '
+                           'MaxFragments=1, MaxWords=16, MinWords=6',
+            })
+        rows = [(row[0], float(row[1] or 0), row[2]) for row in rows]
+        best = max((score for _, score, _ in rows), default=0)
+        hits.extend(
+            FullTextHit(kind, row_id, score / best if best > 0 else 0.0, render_snippet(snippet))
+            for row_id, score, snippet in rows
+        )
+
+    hits.sort(key=lambda hit: (-hit.score, hit.kind, hit.id))
+    return hits[:limit]
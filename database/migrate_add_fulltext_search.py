@@ -0,0 +1,30 @@
+"""
+Create the full-text search indexes: FTS5 tables with sync triggers on
+SQLite, GIN-indexed search_vector columns on PostgreSQL. Pass --rebuild to
+refill existing SQLite indexes from scratch.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # project root
+
+from database.fulltext import FULLTEXT_DOCUMENTS, ensure_fulltext_index  # noqa: E402
+from database.migration_target import open_migration_target  # noqa: E402
+
+
+def main():
+    _, engine = open_migration_target(create_tables=True)
+    if engine is None:
+        return
+
+    rebuild = '--rebuild' in sys.argv[1:]
+    print("Creating full-text indexes" + (" (rebuilding)" if rebuild else "") + "...")
+    installed = ensure_fulltext_index(engine, rebuild=rebuild)
+    for kind in FULLTEXT_DOCUMENTS:
+        print(f"  {kind}: {'ready' if kind in installed else 'not available'}")
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Add the lower(...) expression indexes behind case-insensitive name and code
+lookups. Indexes whose columns are still missing are skipped; re-run after
+the column migrations.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # project root
+
+from database.models import CASE_INSENSITIVE_INDEXES, create_missing_indexes  # noqa: E402
+from database.migration_target import open_migration_target  # noqa: E402
+
+
+def main():
+    _, engine = open_migration_target()
+    if engine is None:
+        return
+
+    skipped = set(create_missing_indexes(engine))
+    for index in CASE_INSENSITIVE_INDEXES:
+        if index.name in skipped:
+            print(f"Skipped index '{index.name}': {index.table.name} lacks a column it needs "
+                  f"(run the column migrations first)")
+        else:
+            print(f"Ensured index '{index.name}' on {index.table.name}")
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Add the indexed practices.practice_sanskrit_key column and compute the key
+for practices that do not have one yet.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # project root
+
+from sqlalchemy import inspect, text  # noqa: E402
+from database.models import get_session, backfill_practice_sanskrit_keys  # noqa: E402
+from database.migration_target import open_migration_target  # noqa: E402
+
+
+def main():
+    db_url, engine = open_migration_target()
+    if engine is None:
+        return
+
+    columns = [col['name'] for col in inspect(engine).get_columns('practices')]
+    with engine.begin() as conn:
+        if 'practice_sanskrit_key' not in columns:
+            print("Adding column 'practice_sanskrit_key' (VARCHAR(200))...")
+            conn.execute(text("ALTER TABLE practices ADD COLUMN practice_sanskrit_key VARCHAR(200)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_practice_sanskrit_key ON practices (practice_sanskrit_key)"
+        ))
+    engine.dispose()
+
+    session = get_session(db_url)
+    try:
+        updated = backfill_practice_sanskrit_keys(session)
+        print(f"Computed Sanskrit keys for {updated} practices.")
+        print("Migration completed successfully.")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
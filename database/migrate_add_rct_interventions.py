@@ -0,0 +1,37 @@
+"""
+Create the rct_interventions table (and rcts.intervention_names) and rebuild
+every RCT's intervention rows from its intervention_practices JSON.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # project root
+
+from database.models import (  # noqa: E402
+    RCTIntervention, get_session, backfill_rct_interventions, add_rct_intervention_names_column
+)
+from database.migration_target import open_migration_target  # noqa: E402
+
+
+def main():
+    print("Creating table 'rct_interventions' (if missing)...")
+    db_url, engine = open_migration_target(create_tables=True)
+    if engine is None:
+        return
+
+    if add_rct_intervention_names_column(engine):
+        print("Added column 'intervention_names' (TEXT).")
+
+    session = get_session(db_url)
+    try:
+        processed = backfill_rct_interventions(session)
+        rows = session.query(RCTIntervention).count()
+        print(f"Backfilled {rows} intervention rows from {processed} RCTs.")
+        print("Migration completed successfully.")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Database selection shared by the SQLAlchemy-based migration scripts
+(migrate_add_rct_interventions, migrate_add_fulltext_search,
+migrate_add_lower_indexes, migrate_add_practice_sanskrit_key).
+
+The older migrate_*.py scripts open yoga_therapy.db with sqlite3 directly.
+These scripts go through SQLAlchemy instead because they must also migrate
+PostgreSQL databases (the indexes and full-text columns differ per dialect)
+and reuse the model-level backfills in database.models.
+
+Scripts migrate the database the application uses: DATABASE_URL (or the
+DB_* variables), defaulting to yoga_therapy.db in the project root whatever
+the working directory.
+"""
+
+from pathlib import Path
+
+from database.models import create_database, create_engine_with_pooling, get_database_url
+
+BASE = Path(__file__).resolve().parent.parent  # project root
+
+
+def open_migration_target(create_tables=False):
+    """
+    Resolve the database to migrate and open an engine on it.
+
+    Args:
+        create_tables: create missing tables first (create_database)
+
+    Returns:
+        (db_url, engine), or (None, None) if the default SQLite file does not exist
+    """
+    db_url = get_database_url()
+    if db_url == 'sqlite:///yoga_therapy.db':
+        db_path = BASE / 'yoga_therapy.db'
+        if not db_path.exists():
+            print(f"Database file not found: {db_path}")
+            return None, None
+        db_url = f'sqlite:///{db_path}'
+    engine = create_database(db_url) if create_tables else create_engine_with_pooling(db_url)
+    return db_url, engine
@@ -5,12 +5,20 @@ This defines the complete database schema using SQLAlchemy ORM
 Updated to support disease combinations for contraindications
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, ForeignKey, Table, Index
+from sqlalchemy import create_engine, Column, Integer, String, Text, Float, ForeignKey, Table, Index, event, select, update, func, or_, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, Session
+from sqlalchemy.orm.attributes import get_history, PASSIVE_NO_INITIALIZE
 from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.visitors import iterate
+from collections import defaultdict
 from datetime import datetime
+import json
 import os
+import threading
+
+from database.transliteration import sanskrit_key
 
 Base = declarative_base()
 
@@ -77,6 +85,7 @@ class Practice(Base):
     practice_sanskrit = Column(String(200))
     practice_english = Column(String(200), nullable=False)
     code = Column(String(50))  # Practice code (e.g., K01 for Kapalabhati) - same code for practices with same Sanskrit name
+    practice_sanskrit_key = Column(String(200))  # Phonetic key of practice_sanskrit (see database/transliteration.py), kept current on flush
     
     # Practice Category classification (formerly practice_segment)
     practice_segment = Column(String(50), nullable=False)  # Preparatory Practice, Breathing Practice, etc. (now called "Category")
@@ -124,6 +133,7 @@ class Practice(Base):
 # Indexes for Practice table - critical for performance
 Index('idx_practice_english', Practice.practice_english)
 Index('idx_practice_sanskrit', Practice.practice_sanskrit)
+Index('idx_practice_sanskrit_key', Practice.practice_sanskrit_key)
 Index('idx_practice_code', Practice.code)
 Index('idx_practice_segment', Practice.practice_segment)
 Index('idx_practice_module_id', Practice.module_id)
@@ -346,6 +356,7 @@ class RCT(Base):
     
     # Intervention
     intervention_practices = Column(Text)  # JSON: list of practices with categories
+    intervention_names = Column(Text)  # Practice names of the rct_interventions rows, space-separated (full-text search)
     intervention_category = Column(String(200))  # DEPRECATED: Now in intervention_practices
     number_of_days = Column(Integer)  # DEPRECATED: Now in duration fields below
     
@@ -376,6 +387,14 @@ class RCT(Base):
         backref='rcts'
     )
     
+    # Normalized rows of intervention_practices, rebuilt whenever it is saved
+    interventions = relationship(
+        'RCTIntervention',
+        back_populates='rct',
+        cascade='all, delete-orphan',
+        order_by='RCTIntervention.position'
+    )
+    
     # RCT count tracking (calculated field stored for performance)
     rct_number = Column(Integer)  # RCT number for this category-disease combo
     
@@ -388,6 +407,431 @@ Index('idx_rct_doi', RCT.doi)
 Index('idx_rct_study_type', RCT.study_type)
 
 
+class RCTIntervention(Base):
+    """
+    One intervention (practice and/or category) of an RCT.
+    
+    Derived from RCT.intervention_practices, which stays the editable source:
+    rows are rebuilt whenever an RCT's intervention_practices is saved, so
+    evidence lookups can use indexed SQL instead of parsing JSON.
+    """
+    __tablename__ = 'rct_interventions'
+    
+    id = Column(Integer, primary_key=True)
+    rct_id = Column(Integer, ForeignKey('rcts.id'), nullable=False)
+    position = Column(Integer, nullable=False)  # Order in the RCT's intervention list
+    practice_name = Column(String(500))  # As entered (trimmed); None for category-only entries
+    practice_name_lower = Column(String(500))  # Lowercased name for case-insensitive lookups
+    practice_id = Column(Integer, ForeignKey('practices.id', ondelete='SET NULL'))  # Practice the name resolved to when saved
+    category = Column(String(200))  # Practice segment (category)
+    
+    rct = relationship('RCT', back_populates='interventions')
+    
+    def __repr__(self):
+        return f"<RCTIntervention(rct_id={self.rct_id}, name='{self.practice_name}', category='{self.category}')>"
+
+
+# Indexes for RCT interventions
+Index('idx_rct_intervention_rct', RCTIntervention.rct_id)
+Index('idx_rct_intervention_name', RCTIntervention.practice_name_lower)
+Index('idx_rct_intervention_category', RCTIntervention.category)
+Index('idx_rct_intervention_practice', RCTIntervention.practice_id)
+
+
+# Expression indexes for case-insensitive lookups (func.lower(column) == value),
+# which the plain column indexes above cannot serve. create_all only adds them to
+# new tables; existing databases get them from create_missing_indexes.
+CASE_INSENSITIVE_INDEXES = (
+    Index('idx_disease_name_lower', func.lower(Disease.name)),
+    Index('idx_disease_code_lower', func.lower(Disease.code)),
+    Index('idx_practice_code_lower', func.lower(Practice.code)),
+    Index('idx_practice_sanskrit_lower', func.lower(Practice.practice_sanskrit)),
+    Index('idx_practice_english_segment_lower', func.lower(Practice.practice_english), func.lower(Practice.practice_segment)),
+    Index('idx_module_code_lower', func.lower(Module.code)),
+    Index('idx_rct_doi_lower', func.lower(RCT.doi)),
+)
+
+
+def parse_intervention_practices(value):
+    """
+    Parse RCT.intervention_practices JSON into [(name, category), ...].
+    
+    Values are trimmed and empty values become None. Legacy plain text,
+    non-dict entries and entries with neither name nor category are skipped.
+    """
+    if not value:
+        return []
+    try:
+        entries = json.loads(value)
+    except (ValueError, TypeError):
+        return []
+    if not isinstance(entries, list):
+        return []
+    parsed = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        name = str(entry.get('name') or '').strip() or None
+        category = str(entry.get('category') or '').strip() or None
+        if name or category:
+            parsed.append((name, category))
+    return parsed
+
+
+def build_rct_interventions(session, rcts):
+    """Replace the RCTIntervention rows of the given RCTs from their intervention_practices."""
+    parsed = [(rct, parse_intervention_practices(rct.intervention_practices)) for rct in rcts]
+    names = {name.lower() for _, entries in parsed for name, _ in entries if name}
+    
+    with session.no_autoflush:
+        # Resolve names to practices in one query (lowest id wins)
+        practice_ids = {}
+        if names:
+            rows = session.execute(
+                select(Practice.id, Practice.practice_english, Practice.practice_sanskrit)
+                .where(or_(
+                    func.lower(Practice.practice_english).in_(names),
+                    func.lower(Practice.practice_sanskrit).in_(names)
+                ))
+                .order_by(Practice.id)
+            )
+            for practice_id, english, sanskrit in rows:
+                for name in (english, sanskrit):
+                    if name and name.lower() in names:
+                        practice_ids.setdefault(name.lower(), practice_id)
+        
+        for rct, entries in parsed:
+            rct.intervention_names = ' '.join(name for name, _ in entries if name) or None
+            rct.interventions = [
+                RCTIntervention(
+                    position=position,
+                    practice_name=name,
+                    practice_name_lower=name.lower() if name else None,
+                    practice_id=practice_ids.get(name.lower()) if name else None,
+                    category=category
+                )
+                for position, (name, category) in enumerate(entries)
+            ]
+
+
+def backfill_rct_interventions(session, batch_size=500):
+    """
+    Rebuild the rct_interventions rows of every RCT, committing per batch.
+    
+    Returns:
+        Number of RCTs processed
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        rcts = session.query(RCT).filter(RCT.id > last_id).order_by(RCT.id).limit(batch_size).all()
+        if not rcts:
+            return processed
+        build_rct_interventions(session, rcts)
+        session.commit()
+        processed += len(rcts)
+        last_id = rcts[-1].id
+
+
+@event.listens_for(Session, 'before_flush')
+def _sync_rct_interventions(session, flush_context, instances):
+    rcts = [obj for obj in session.new if isinstance(obj, RCT)]
+    rcts += [
+        obj for obj in session.dirty
+        if isinstance(obj, RCT)
+        and get_history(obj, 'intervention_practices', passive=PASSIVE_NO_INITIALIZE).has_changes()
+    ]
+    if rcts:
+        build_rct_interventions(session, rcts)
+
+
+def backfill_rct_intervention_names(session, batch_size=500):
+    """
+    Fill intervention_names for RCTs whose rct_interventions rows name practices but that have no names yet.
+    
+    Returns:
+        Number of RCTs updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rct_ids = session.execute(
+            select(RCT.id)
+            .where(RCT.id > last_id, RCT.intervention_names.is_(None), RCT.id.in_(
+                select(RCTIntervention.rct_id).where(RCTIntervention.practice_name.isnot(None))
+            ))
+            .order_by(RCT.id).limit(batch_size)
+        ).scalars().all()
+        if not rct_ids:
+            return updated
+        names = defaultdict(list)
+        for rct_id, name in session.execute(
+            select(RCTIntervention.rct_id, RCTIntervention.practice_name)
+            .where(RCTIntervention.rct_id.in_(rct_ids), RCTIntervention.practice_name.isnot(None))
+            .order_by(RCTIntervention.rct_id, RCTIntervention.position)
+        ):
+            names[rct_id].append(name)
+        session.execute(
+            update(RCT),
+            [{'id': rct_id, 'intervention_names': ' '.join(names[rct_id])} for rct_id in rct_ids]
+        )
+        session.commit()
+        updated += len(rct_ids)
+        last_id = rct_ids[-1]
+
+
+def backfill_practice_sanskrit_keys(session, batch_size=500):
+    """
+    Compute practice_sanskrit_key for practices that have a Sanskrit name but no key yet.
+    
+    Returns:
+        Number of practices updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(Practice.id, Practice.practice_sanskrit)
+            .where(Practice.id > last_id, Practice.practice_sanskrit.isnot(None), Practice.practice_sanskrit_key.is_(None))
+            .order_by(Practice.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        session.execute(
+            update(Practice),
+            [{'id': row.id, 'practice_sanskrit_key': sanskrit_key(row.practice_sanskrit)} for row in rows]
+        )
+        session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+@event.listens_for(Session, 'before_flush')
+def _sync_practice_sanskrit_keys(session, flush_context, instances):
+    practices = [obj for obj in session.new if isinstance(obj, Practice)]
+    practices += [
+        obj for obj in session.dirty
+        if isinstance(obj, Practice)
+        and get_history(obj, 'practice_sanskrit', passive=PASSIVE_NO_INITIALIZE).has_changes()
+    ]
+    for practice in practices:
+        key = sanskrit_key(practice.practice_sanskrit) if practice.practice_sanskrit is not None else None
+        if practice.practice_sanskrit_key != key:
+            practice.practice_sanskrit_key = key
+
+
+# ---------------------------------------------------------------------------
+# Change tracking
+# ---------------------------------------------------------------------------
+# In-process caches (e.g. the recommendation engine's knowledge-graph snapshot)
+# compare these per-table counters to decide whether they are stale.
+# Counters are bumped after every successful commit that touched the table
+# through the ORM. Raw SQL writes must call mark_tables_changed() themselves.
+_table_versions = {}
+_table_versions_lock = threading.Lock()
+_secondary_tables_by_class = {}
+
+# Per-disease change tracking for caches keyed by disease (e.g. recommendation
+# results). Every commit that affects a disease's practices, contraindications,
+# modules or the disease row itself stamps that disease with a new sequence
+# number. Changes that can alter name resolution (disease added/renamed/deleted)
+# or that cannot be attributed to specific diseases stamp all diseases.
+_change_sequence = 0
+_disease_changed_at = {}
+_all_diseases_changed_at = 0
+
+
+_change_listeners = []
+
+
+def add_change_listener(callback):
+    """
+    Register callback(table_names) to run after table changes are recorded.
+    
+    Callbacks run in the committing thread, so they should be quick
+    (e.g. schedule work elsewhere) and must not raise.
+    """
+    _change_listeners.append(callback)
+
+
+def remove_change_listener(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+
+def mark_tables_changed(*table_names):
+    """Bump the change counter for the given table names."""
+    with _table_versions_lock:
+        for name in table_names:
+            _table_versions[name] = _table_versions.get(name, 0) + 1
+    for callback in list(_change_listeners):
+        try:
+            callback(frozenset(table_names))
+        except Exception as exc:
+            print(f"Warning: change listener failed: {exc}")
+
+
+def get_table_versions(table_names):
+    """Return the current change counters for the given table names as a tuple."""
+    with _table_versions_lock:
+        return tuple(_table_versions.get(name, 0) for name in table_names)
+
+
+# Tables whose bulk UPDATE/DELETE statements invalidate every disease
+_DISEASE_SCOPED_TABLES = {'diseases', 'practices', 'contraindications', 'modules', 'citations'}
+
+
+def mark_diseases_changed(disease_ids=None):
+    """Stamp the given diseases (all diseases if None) as changed."""
+    global _change_sequence, _all_diseases_changed_at
+    with _table_versions_lock:
+        _change_sequence += 1
+        if disease_ids is None:
+            _all_diseases_changed_at = _change_sequence
+        else:
+            for disease_id in disease_ids:
+                _disease_changed_at[disease_id] = _change_sequence
+
+
+def get_change_sequence():
+    """Current change sequence number; read it before computing a cacheable result."""
+    with _table_versions_lock:
+        return _change_sequence
+
+
+def diseases_changed_since(disease_ids, sequence):
+    """True if any of the diseases (or all diseases) changed after the given sequence number."""
+    with _table_versions_lock:
+        if _all_diseases_changed_at > sequence:
+            return True
+        return any(_disease_changed_at.get(disease_id, 0) > sequence for disease_id in disease_ids)
+
+
+def _tables_for_instance(obj):
+    """Own table plus the association tables reachable through its relationships."""
+    cls = type(obj)
+    tables = _secondary_tables_by_class.get(cls)
+    if tables is None:
+        mapper = getattr(obj, '__mapper__', None)
+        if mapper is None:
+            tables = ()
+        else:
+            names = [mapper.local_table.name]
+            for rel in mapper.relationships:
+                if rel.secondary is not None:
+                    names.append(rel.secondary.name)
+            tables = tuple(names)
+        _secondary_tables_by_class[cls] = tables
+    return tables
+
+
+def _passive_values(obj, attr):
+    """Current and previous values of an attribute, without triggering a lazy load."""
+    history = get_history(obj, attr, passive=PASSIVE_NO_INITIALIZE)
+    return list(history.added or ()) + list(history.unchanged or ()) + list(history.deleted or ())
+
+
+def _affected_disease_ids(session):
+    """
+    Disease ids whose recommendation data is touched by the pending flush,
+    or None when the change cannot be attributed to specific diseases.
+    """
+    disease_ids = set()
+    practice_ids = set()
+    contraindication_ids = set()
+    module_ids = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Disease):
+            if obj in session.new or obj in session.deleted:
+                return None
+            if get_history(obj, 'name', passive=PASSIVE_NO_INITIALIZE).has_changes():
+                return None
+            disease_ids.add(obj.id)
+        elif isinstance(obj, Citation):
+            if obj not in session.new:
+                return None
+        elif isinstance(obj, (Practice, Contraindication)):
+            disease_ids.update(d.id for d in _passive_values(obj, 'diseases') if d.id is not None)
+            if obj.id is not None:
+                (practice_ids if isinstance(obj, Practice) else contraindication_ids).add(obj.id)
+            if isinstance(obj, Practice):
+                module_ids.update(mid for mid in _passive_values(obj, 'module_id') if mid is not None)
+                module_ids.update(m.id for m in _passive_values(obj, 'module') if m.id is not None)
+        elif isinstance(obj, Module):
+            disease_ids.update(did for did in _passive_values(obj, 'disease_id') if did is not None)
+
+    with session.no_autoflush:
+        if practice_ids:
+            disease_ids.update(session.execute(
+                select(disease_practice_association.c.disease_id)
+                .where(disease_practice_association.c.practice_id.in_(practice_ids))
+            ).scalars())
+        if contraindication_ids:
+            disease_ids.update(session.execute(
+                select(disease_contraindication_association.c.disease_id)
+                .where(disease_contraindication_association.c.contraindication_id.in_(contraindication_ids))
+            ).scalars())
+        if module_ids:
+            disease_ids.update(session.execute(
+                select(Module.disease_id).where(Module.id.in_(module_ids))
+            ).scalars())
+    return disease_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_affected_diseases(session, flush_context, instances):
+    if session.info.get('all_diseases_changed'):
+        return
+    affected = _affected_disease_ids(session)
+    if affected is None:
+        session.info['all_diseases_changed'] = True
+        session.info.pop('changed_disease_ids', None)
+    elif affected:
+        session.info.setdefault('changed_disease_ids', set()).update(affected)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        changed.update(_tables_for_instance(obj))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk_statement_tables(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            changed = orm_execute_state.session.info.setdefault('changed_tables', set())
+            changed.add(mapper.local_table.name)
+            # Bulk statements cannot be attributed to individual diseases
+            if mapper.local_table.name in _DISEASE_SCOPED_TABLES:
+                orm_execute_state.session.info['all_diseases_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_tables(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        # Tables first: readers check the disease sequence before loading table data
+        mark_tables_changed(*changed)
+    if session.info.pop('all_diseases_changed', False):
+        session.info.pop('changed_disease_ids', None)
+        mark_diseases_changed(None)
+    else:
+        changed_disease_ids = session.info.pop('changed_disease_ids', None)
+        if changed_disease_ids:
+            mark_diseases_changed(changed_disease_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('changed_tables', None)
+    session.info.pop('changed_disease_ids', None)
+    session.info.pop('all_diseases_changed', None)
+
+
 # Database configuration
 def get_database_url():
     """
@@ -456,6 +900,16 @@ def create_engine_with_pooling(db_url):
     return engine
 
 
+def uses_shared_connection(db_url=None):
+    """
+    True if all sessions on the database share one connection (SQLite's StaticPool).
+    
+    Such sessions must not run in background or worker threads while a request
+    uses the database: closing one rolls back the others' open transactions.
+    """
+    return (db_url or get_database_url()).startswith('sqlite')
+
+
 # Global engine instance (created on first use)
 _engine = None
 _session_factory = None
@@ -486,6 +940,53 @@ def create_database(db_path=None):
     return engine
 
 
+def create_missing_indexes(engine, indexes=CASE_INSENSITIVE_INDEXES):
+    """
+    Create indexes missing from existing tables (create_all skips tables that exist).
+    
+    Uses CREATE INDEX IF NOT EXISTS, since expression indexes cannot be reflected.
+    Indexes on tables or columns the database does not have yet are skipped, so
+    run this after the column migrations.
+    
+    Returns:
+        Names of the indexes that were skipped
+    """
+    inspector = inspect(engine)
+    table_columns = {}
+    skipped = []
+    with engine.begin() as conn:
+        for index in indexes:
+            table_name = index.table.name
+            if table_name not in table_columns:
+                table_columns[table_name] = (
+                    {col['name'] for col in inspector.get_columns(table_name)}
+                    if inspector.has_table(table_name) else set()
+                )
+            needed = {
+                element.name for expression in index.expressions
+                for element in iterate(expression) if isinstance(element, Column)
+            }
+            if not needed <= table_columns[table_name]:
+                skipped.append(index.name)
+                continue
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    return skipped
+
+
+def add_rct_intervention_names_column(engine):
+    """
+    Add rcts.intervention_names to databases created before it existed (create_all skips existing tables).
+    
+    Returns:
+        True if the column was added
+    """
+    if 'intervention_names' in {col['name'] for col in inspect(engine).get_columns('rcts')}:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE rcts ADD COLUMN intervention_names TEXT"))
+    return True
+
+
 def get_session(db_path=None):
     """
     Returns a database session for performing operations.
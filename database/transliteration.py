@@ -0,0 +1,147 @@
+"""
+Sanskrit Name Matching
+
+Sanskrit practice names are romanized inconsistently across sources
+(Shavasana / Savasana / Śavāsana, Anulom Vilom / Anuloma Viloma,
+Pawanmuktasana / Pavanamuktasana). sanskrit_key folds such variants to one
+phonetic key:
+1. strip diacritics (IAST ā, ś, ṣ, ṭ, ṛ, ṃ ...) and keep only the letters a-z
+2. ee -> i, oo -> u, w -> v
+3. drop the h of aspirated and sibilant digraphs (bh, ch, dh, gh, jh, kh, ph, sh, th)
+4. drop every 'a' after the first letter (inherent vowel, long/short a, schwa deletion)
+5. collapse doubled letters
+
+    sanskrit_key('Shavasana')      == sanskrit_key('Savāsana')       == 'svsn'
+    sanskrit_key('Anulom Vilom')   == sanskrit_key('Anuloma Viloma') == 'anulomvilom'
+
+Practices store the key in the indexed practice_sanskrit_key column (kept
+current on every flush, see database.models). A search reads at most
+MATCH_CANDIDATES rows whose key starts with the query's key and as many whose
+lowercased name starts with the query, each an index range scan. Only when
+those are too few does it read up to TYPO_CANDIDATES rows of similar key
+length for typos, among keys sharing the query key's first TYPO_PREFIX_LENGTH
+letters (again an index range). rank_sanskrit_matches orders the candidates:
+names starting with the query first, then keys starting with the query's key,
+then typos by trigram similarity.
+"""
+
+import math
+import re
+import unicodedata
+
+
+# Most name/key prefix matches read for ranking
+MATCH_CANDIDATES = 200
+
+# Most rows read when looking for typos (keys not starting with the query's key)
+TYPO_CANDIDATES = 500
+
+# Leading key letters a typo candidate must share with the query's key
+TYPO_PREFIX_LENGTH = 2
+
+# Lowest trigram similarity for a match that does not share the query's key prefix
+MIN_SIMILARITY = 0.3
+
+_DIGRAPH_H = re.compile(r'([bcdgjkpst])h')
+_REPEATED = re.compile(r'(.)\1+')
+
+
+def fold(text):
+    """Lowercase and strip diacritics ('Śavāsana' -> 'savasana')."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def sanskrit_key(name):
+    """Phonetic key of a romanized Sanskrit name ('' if it has no letters)."""
+    letters = ''.join(ch for ch in fold(name) if 'a' <= ch <= 'z')
+    letters = letters.replace('ee', 'i').replace('oo', 'u').replace('w', 'v')
+    letters = _DIGRAPH_H.sub(r'\1', letters)
+    key = letters[:1] + letters[1:].replace('a', '')
+    return _REPEATED.sub(r'\1', key)
+
+
+def key_prefix_range(prefix):
+    """
+    (lower, upper) bounds of the keys starting with prefix: lower <= key < upper.
+
+    upper is None when every key from lower on matches (prefix of only 'z's).
+    Keys contain only a-z, so the bounds hold under any collation.
+    """
+    stem = prefix.rstrip('z')
+    if not stem:
+        return prefix, None
+    return prefix, stem[:-1] + chr(ord(stem[-1]) + 1)
+
+
+def name_prefix_range(prefix):
+    """
+    (lower, upper) bounds of the lowercased names starting with prefix: lower <= name < upper.
+
+    Exact under binary collation (SQLite). Extra rows other collations may let
+    in are harmless: rank_sanskrit_matches recomputes every candidate's tier.
+    """
+    lower = prefix.lower()
+    return lower, lower[:-1] + chr(ord(lower[-1]) + 1)
+
+
+def key_length_range(query_key):
+    """
+    (shortest, longest) key length worth comparing with query_key for typos.
+
+    A key of n letters has at most n + 1 trigrams, so keys far shorter or
+    longer than the query's share too few trigrams to reach MIN_SIMILARITY.
+    """
+    trigram_count = len(query_key) + 1
+    return (max(math.ceil(trigram_count * MIN_SIMILARITY) - 1, 0),
+            math.floor(trigram_count / MIN_SIMILARITY) - 1)
+
+
+def trigrams(key):
+    """Padded trigrams of a key, as in pg_trgm."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    """Share of trigrams two keys have in common (0 to 1)."""
+    left, right = trigrams(a), trigrams(b)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def rank_sanskrit_matches(query, practices, limit=10):
+    """
+    Best matches for a Sanskrit name query, best first.
+
+    Args:
+        practices: candidates with practice_sanskrit and practice_sanskrit_key
+            (normally the prefix and typo candidates described above)
+
+    Ranking: name starts with the query (ignoring case and diacritics), then
+    key starts with the query key, then trigram similarity of the keys
+    (at least MIN_SIMILARITY); ties go to the shorter name, then alphabetical.
+    """
+    folded_query = fold(query).strip()
+    query_key = sanskrit_key(query)
+    if not query_key:
+        return []
+
+    ranked = []
+    for practice in practices:
+        name = practice.practice_sanskrit or ''
+        key = practice.practice_sanskrit_key if practice.practice_sanskrit_key is not None else sanskrit_key(name)
+        if fold(name).startswith(folded_query):
+            tier = 0
+        elif key.startswith(query_key):
+            tier = 1
+        else:
+            tier = 2
+        similarity = trigram_similarity(query_key, key)
+        if tier == 2 and similarity < MIN_SIMILARITY:
+            continue
+        ranked.append(((tier, -similarity, len(name), name.lower(), practice.id), practice))
+
+    ranked.sort(key=lambda item: item[0])
+    return [practice for _, practice in ranked[:limit]]
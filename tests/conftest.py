@@ -0,0 +1,45 @@
+"""
+Shared test setup.
+
+Tests run against throwaway SQLite databases; nothing touches yoga_therapy.db.
+"""
+
+import sys
+import os
+
+# Add the project root to the path so tests import the app's packages like its scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database.models import create_database, get_session
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    """URL of a fresh, empty database with every table created."""
+    url = f"sqlite:///{tmp_path / 'yoga_therapy.db'}"
+    create_database(url).dispose()
+    return url
+
+
+@pytest.fixture
+def session(db_url):
+    """Session on the test database."""
+    session = get_session(db_url)
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The web app module (web/app.py), started on its own temporary database."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path_factory.mktemp('app') / 'yoga_therapy.db'}")
+        import web.app as app_module
+        yield app_module
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
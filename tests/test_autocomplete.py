@@ -0,0 +1,101 @@
+"""Tests for ModuleAutocompleteIndex (core/autocomplete.py) against the scoring it replaced."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from core.autocomplete import ModuleAutocompleteIndex
+
+
+def legacy_search(modules, diseases, query, limit=20):
+    """The per-request ranking the index replaced: score every module, sort, take the first `limit`."""
+    query_lower = query.strip().lower()
+    if not query_lower:
+        return []
+    results = []
+    for module in sorted(modules, key=lambda m: m.id):
+        disease = diseases.get(module.disease_id)
+        if disease is None:
+            continue
+        disease_name = disease.name
+        module_name = module.developed_by or 'N/A'
+        display_name = f"{disease_name} ({module_name})"
+        disease_lower, module_lower, display_lower = disease_name.lower(), module_name.lower(), display_name.lower()
+        if disease_lower.startswith(query_lower):
+            score = 1000 + len(disease_lower)
+        elif module_lower.startswith(query_lower):
+            score = 500 + len(module_lower)
+        elif display_lower.startswith(query_lower):
+            score = 300 + len(display_lower)
+        elif query_lower in disease_lower:
+            score = 100 + len(disease_lower)
+        elif query_lower in module_lower:
+            score = 50 + len(module_lower)
+        elif query_lower in display_lower:
+            score = 10 + len(display_lower)
+        else:
+            continue
+        results.append((score, display_name, module.id))
+    results.sort(key=lambda result: (-result[0], result[1]))
+    return [module_id for _, _, module_id in results[:limit]]
+
+
+def build(disease_names, module_rows):
+    diseases = {i: SimpleNamespace(name=name) for i, name in enumerate(disease_names, start=1)}
+    modules = [
+        SimpleNamespace(id=module_id, disease_id=disease_id, developed_by=developed_by)
+        for module_id, disease_id, developed_by in module_rows
+    ]
+    return modules, diseases
+
+
+@pytest.fixture
+def fixture_set():
+    return build(
+        ['Diabetes', 'Diabetes Type 2', 'Hypertension', 'Anxiety', 'Depression', 'Obesity'],
+        [
+            (1, 1, 'Dr. Rao'),
+            (2, 1, 'Dr. Rao'),          # same display name as module 1: tie broken by id
+            (3, 2, 'Diabetes Clinic'),
+            (4, 3, None),               # shown as 'N/A'
+            (5, 4, 'Anand Institute'),
+            (6, 5, 'Dr. Anxiety Study'),
+            (7, 6, 'Obesity Group'),
+            (8, 99, 'Orphan'),          # disease missing: not suggested
+            (9, 5, 'Dr. Rao'),
+        ],
+    )
+
+
+def test_search_matches_legacy_ranking(fixture_set):
+    modules, diseases = fixture_set
+    index = ModuleAutocompleteIndex(modules, diseases)
+    displays = [f"{d.name} ({m.developed_by or 'N/A'})" for m in modules
+                for d in [diseases.get(m.disease_id)] if d is not None]
+    queries = {display[start:start + n] for display in displays for n in (1, 2, 3, 5)
+               for start in range(len(display) - n + 1)}
+    queries |= {'', '   ', 'DIAB', 'dr. rao', 'zzz', 'diabetes (dr. rao)', 'n/a'}
+
+    for query in sorted(queries):
+        for limit in range(1, len(modules) + 2):
+            expected = legacy_search(modules, diseases, query, limit)
+            assert [s.module_id for s in index.search(query, limit)] == expected, (query, limit)
+
+
+def test_search_keeps_collecting_when_a_later_tier_can_tie(fixture_set):
+    # Module 1 starts with the query (500 + 5 = 505). Module 2's display name starts
+    # with it (300 + 205 = 505): the later tier reaches the same score, so the search
+    # must not stop after the module tier; module 2 wins the tie on display name.
+    modules, diseases = build(['x', 'ab'], [(1, 1, 'ab (c'), (2, 2, 'c' + 'n' * 199)])
+    index = ModuleAutocompleteIndex(modules, diseases)
+    assert legacy_search(modules, diseases, 'ab (c', 1) == [2]
+    assert [s.module_id for s in index.search('ab (c', limit=1)] == [2]
+    assert [s.module_id for s in index.search('ab (c', limit=2)] == [2, 1]
+
+
+def test_search_stops_early_once_later_tiers_cannot_compete():
+    modules, diseases = build(['Diabetes', 'Prediabetes'], [(1, 1, 'A'), (2, 2, 'B')])
+    index = ModuleAutocompleteIndex(modules, diseases)
+    assert [s.module_id for s in index.search('diab', limit=1)] == [1]
+    assert [s.module_id for s in index.search('diab', limit=2)] == [1, 2]
+    assert index.search('diab', limit=0) == []
@@ -0,0 +1,135 @@
+"""Tests for contraindication filtering (ContraindicationIndex in core/knowledge_graph.py)."""
+
+import pytest
+
+from core.recommendation_engine import YogaTherapyRecommendationEngine
+from database.models import Contraindication, Disease, Practice
+
+
+@pytest.fixture
+def catalog(session):
+    asthma = Disease(name='Asthma')
+    hypertension = Disease(name='Hypertension')
+    both = [asthma, hypertension]
+    session.add_all([
+        Practice(practice_english='Bee Breath', practice_segment='Breathing practices', sub_category='Slow',
+                 kosha='Pranamaya Kosha', diseases=both),
+        Practice(practice_english='Skull Shining Breath', practice_segment='Breathing practices', sub_category='Fast',
+                 kosha='Pranamaya Kosha', diseases=both),
+        Practice(practice_english='Headstand', practice_segment='Yogasana', sub_category='Inverted',
+                 kosha='Annamaya Kosha', diseases=both),
+        Practice(practice_english='Mountain Pose', practice_segment='Yogasana', sub_category='Standing',
+                 kosha='Annamaya Kosha', diseases=both),
+        Practice(practice_english='Om Chanting', practice_segment='Chanting',
+                 kosha='Manomaya Kosha', diseases=both),
+    ])
+    session.commit()
+    return session
+
+
+ALL_PRACTICES = {'Bee Breath', 'Skull Shining Breath', 'Headstand', 'Mountain Pose', 'Om Chanting'}
+
+
+def contraindicate(session, disease_name, **fields):
+    disease = session.query(Disease).filter_by(name=disease_name).one()
+    contra = Contraindication(**fields)
+    contra.diseases.append(disease)
+    session.add(contra)
+    session.commit()
+    return contra
+
+
+def recommend(db_url, *diseases):
+    engine = YogaTherapyRecommendationEngine(db_url)
+    try:
+        return engine.get_recommendations(list(diseases))
+    finally:
+        engine.close()
+
+
+def practice_names(result):
+    return {
+        practice['practice_english']
+        for sub_categories in result['practices_by_segment'].values()
+        for practices in sub_categories.values()
+        for practice in practices
+    }
+
+
+def removed_names(result):
+    return {removed['practice'] for removed in result['contraindication_report']['removed_practices']}
+
+
+def test_without_contraindications_nothing_is_removed(catalog, db_url):
+    result = recommend(db_url, 'Asthma')
+    assert practice_names(result) == ALL_PRACTICES
+    assert result['contraindication_report']['removed_practices'] == []
+    assert result['contraindication_report']['total_contraindications'] == 0
+
+
+def test_practice_rule_matches_name_category_and_sub_category(catalog, db_url):
+    contraindicate(catalog, 'Asthma', practice_english='headstand ', practice_segment='Yogasana',
+                   sub_category='Inverted', reason='Raises pressure in the head')
+    # Same name in another sub-category is a different practice
+    contraindicate(catalog, 'Asthma', practice_english='Mountain Pose', practice_segment='Yogasana',
+                   sub_category='Inverted')
+
+    result = recommend(db_url, 'Asthma')
+    assert practice_names(result) == ALL_PRACTICES - {'Headstand'}
+    report = result['contraindication_report']
+    assert report['removed_practices'] == [{
+        'practice': 'Headstand',
+        'practice_segment': 'Yogasana',
+        'sub_category': 'Inverted',
+        'contraindication_details': [{
+            'practice': 'headstand ',
+            'contraindication_type': 'practice',
+            'practice_segment': 'Yogasana',
+            'disease': 'Asthma',
+            'reason': 'Raises pressure in the head',
+        }],
+    }]
+    assert report['total_contraindications'] == 2
+    assert report['diseases_checked'] == ['Asthma']
+
+
+def test_category_rule_blocks_the_whole_category(catalog, db_url):
+    contraindicate(catalog, 'Asthma', contraindication_type='category', practice_segment='breathing practices')
+    result = recommend(db_url, 'Asthma')
+    assert practice_names(result) == ALL_PRACTICES - {'Bee Breath', 'Skull Shining Breath'}
+    assert removed_names(result) == {'Bee Breath', 'Skull Shining Breath'}
+
+
+def test_sub_category_rule_blocks_only_the_sub_category(catalog, db_url):
+    contraindicate(catalog, 'Asthma', contraindication_type='category', practice_segment='Breathing practices',
+                   sub_category='Fast')
+    result = recommend(db_url, 'Asthma')
+    assert practice_names(result) == ALL_PRACTICES - {'Skull Shining Breath'}
+    [removed] = result['contraindication_report']['removed_practices']
+    assert removed['sub_category'] == 'Fast'
+    assert removed['contraindication_details'][0]['contraindication_type'] == 'category'
+
+
+def test_kosha_rule_blocks_every_practice_in_the_kosha(catalog, db_url):
+    contraindicate(catalog, 'Asthma', contraindication_type='kosha', kosha='annamaya kosha')
+    result = recommend(db_url, 'Asthma')
+    assert practice_names(result) == ALL_PRACTICES - {'Headstand', 'Mountain Pose'}
+    assert removed_names(result) == {'Headstand', 'Mountain Pose'}
+
+
+def test_rules_of_every_requested_disease_apply(catalog, db_url):
+    contraindicate(catalog, 'Asthma', contraindication_type='kosha', kosha='Manomaya Kosha')
+    contraindicate(catalog, 'Hypertension', practice_english='Headstand', practice_segment='Yogasana',
+                   sub_category='Inverted')
+    # The same rule under a second disease counts once
+    contraindicate(catalog, 'Asthma', practice_english='Headstand', practice_segment='Yogasana',
+                   sub_category='Inverted')
+
+    assert practice_names(recommend(db_url, 'Hypertension')) == ALL_PRACTICES - {'Headstand'}
+
+    result = recommend(db_url, 'Asthma', 'Hypertension')
+    assert practice_names(result) == ALL_PRACTICES - {'Headstand', 'Om Chanting'}
+    report = result['contraindication_report']
+    assert report['total_contraindications'] == 2
+    headstand = next(removed for removed in report['removed_practices'] if removed['practice'] == 'Headstand')
+    assert sorted(detail['disease'] for detail in headstand['contraindication_details']) == ['Asthma', 'Hypertension']
@@ -0,0 +1,50 @@
+"""Tests for DiseaseNameIndex (core/knowledge_graph.py)."""
+
+from collections import namedtuple
+
+from core.knowledge_graph import DiseaseNameIndex
+
+DiseaseRecord = namedtuple('DiseaseRecord', ['id', 'name'])
+
+
+def make_index():
+    return DiseaseNameIndex([
+        DiseaseRecord(1, 'Generalized Anxiety Disorder'),
+        DiseaseRecord(2, 'Depression'),
+        DiseaseRecord(3, 'Anxiety'),
+        DiseaseRecord(4, 'Chronic Lower Back Pain'),
+        DiseaseRecord(5, 'Postpartum Depression'),
+    ])
+
+
+def test_exact_match_ignores_case_and_whitespace():
+    index = make_index()
+    assert index.resolve('  depression ').id == 2
+    assert index.resolve('ANXIETY').id == 3
+
+
+def test_exact_match_wins_over_partial_matches():
+    # 'anxiety' is also contained in 'Generalized Anxiety Disorder' (lower id)
+    assert make_index().resolve('anxiety').id == 3
+
+
+def test_prefix_match_wins_over_substring_match():
+    # 'depress' starts 'Depression' and is contained in 'Postpartum Depression'
+    assert make_index().resolve('depress').id == 2
+
+
+def test_substring_match():
+    index = make_index()
+    assert index.resolve('back pain').id == 4
+    assert index.resolve('anxiety dis').id == 1
+
+
+def test_unmatched_and_blank_names():
+    index = make_index()
+    assert index.resolve('migraine') is None
+    assert index.resolve('   ') is None
+
+
+def test_resolve_many_keeps_order():
+    resolved = make_index().resolve_many(['Depression', 'unknown', 'chronic', 'DEPRESSION'])
+    assert [d.id if d else None for d in resolved] == [2, None, 4, 2]
@@ -0,0 +1,190 @@
+"""Tests for full-text search (database/fulltext.py) and its LIKE fallback in the web app."""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from database.fulltext import FULLTEXT_DOCUMENTS, ensure_fulltext_index, fulltext_match, search_fulltext
+from database.models import RCT, Disease, Practice, create_engine_with_pooling
+
+
+@pytest.fixture
+def catalog(session):
+    session.add_all([
+        Practice(practice_english='Mountain Pose', practice_sanskrit='Tāḍāsana',
+                 practice_segment='Standing asana', description='Stand tall <and> breathe'),
+        Practice(practice_english='Bee Breath', practice_sanskrit='Bhramari',
+                 practice_segment='Breathing practices'),
+        Practice(practice_english='Corpse Pose', practice_sanskrit='Shavasana',
+                 practice_segment='Relaxation practices', description='Breathing slowly'),
+        RCT(title='Yoga for anxiety', intervention_practices=json.dumps(
+            [{'name': 'Bhramari', 'category': 'Breathing practices'}])),
+        RCT(title='Sleep quality trial', intervention_practices=json.dumps(
+            [{'name': 'Shavasana', 'category': 'Relaxation practices'}])),
+    ])
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def indexed(catalog, db_url):
+    engine = create_engine_with_pooling(db_url)
+    installed = ensure_fulltext_index(engine)
+    engine.dispose()
+    return installed
+
+
+def match_ids(session, kind, query, **kwargs):
+    return set(session.execute(fulltext_match(session, kind, query, **kwargs)).scalars())
+
+
+def practice_id(session, sanskrit):
+    return session.query(Practice.id).filter_by(practice_sanskrit=sanskrit).scalar()
+
+
+def rct_id(session, title):
+    return session.query(RCT.id).filter_by(title=title).scalar()
+
+
+def test_every_document_type_is_indexed(indexed):
+    assert indexed == frozenset(FULLTEXT_DOCUMENTS)
+
+
+def test_word_prefix_match_ignores_case_and_diacritics(catalog, indexed):
+    assert match_ids(catalog, 'practices', 'tadasana') == {practice_id(catalog, 'Tāḍāsana')}
+    assert match_ids(catalog, 'practices', 'BREATH') == {
+        practice_id(catalog, 'Tāḍāsana'), practice_id(catalog, 'Bhramari'), practice_id(catalog, 'Shavasana')
+    }
+    # Every word must match
+    assert match_ids(catalog, 'practices', 'bee breath') == {practice_id(catalog, 'Bhramari')}
+
+
+def test_titles_only(catalog, indexed):
+    assert match_ids(catalog, 'practices', 'breath', titles_only=True) == {practice_id(catalog, 'Bhramari')}
+
+
+def test_rcts_are_indexed_by_intervention_names(catalog, indexed):
+    assert match_ids(catalog, 'rcts', 'bhramari') == {rct_id(catalog, 'Yoga for anxiety')}
+    # The keys of the intervention JSON are not indexed
+    assert match_ids(catalog, 'rcts', 'name') == set()
+    assert match_ids(catalog, 'rcts', 'category') == set()
+
+
+def test_index_follows_edits(catalog, indexed):
+    practice = catalog.query(Practice).filter_by(practice_sanskrit='Bhramari').one()
+    practice.practice_english = 'Humming Breath'
+    catalog.commit()
+    assert match_ids(catalog, 'practices', 'humming') == {practice.id}
+    assert match_ids(catalog, 'practices', 'bee') == set()
+
+    rct = catalog.query(RCT).filter_by(title='Sleep quality trial').one()
+    rct.intervention_practices = json.dumps([{'name': 'Bhramari', 'category': 'Breathing practices'}])
+    catalog.commit()
+    assert match_ids(catalog, 'rcts', 'bhramari') == {rct_id(catalog, 'Yoga for anxiety'), rct.id}
+    assert match_ids(catalog, 'rcts', 'shavasana') == set()
+
+    catalog.delete(practice)
+    catalog.commit()
+    assert match_ids(catalog, 'practices', 'humming') == set()
+
+
+def test_search_fulltext_ranks_titles_first_and_escapes_snippets(catalog, indexed):
+    hits = search_fulltext(catalog, 'breath', kinds=['practices'])
+    assert hits[0].id == practice_id(catalog, 'Bhramari')
+    assert {hit.kind for hit in hits} == {'practices'}
+
+    snippet = next(hit.snippet for hit in hits if hit.id == practice_id(catalog, 'Tāḍāsana'))
+    assert '&lt;and&gt;' in snippet
+    assert '<mark>breathe</mark>' in snippet
+
+
+def test_search_fulltext_scores_are_relative_to_each_type(catalog, indexed):
+    hits = search_fulltext(catalog, 'bhramari')
+    assert {(hit.kind, hit.score) for hit in hits} == {('practices', 1.0), ('rcts', 1.0)}
+
+    hits = search_fulltext(catalog, 'breath')
+    assert len(hits) == 3
+    assert hits[0].score == 1.0
+    assert all(0 < hit.score < 1 for hit in hits[1:])
+
+
+def test_without_an_index_callers_fall_back_to_like(catalog):
+    assert fulltext_match(catalog, 'practices', 'breath') is None
+    assert search_fulltext(catalog, 'breath') == []
+
+
+def test_query_without_words_falls_back(catalog, indexed):
+    assert fulltext_match(catalog, 'practices', '"*') is None
+
+
+def test_stale_index_is_rebuilt(catalog, db_url):
+    catalog.execute(text("CREATE VIRTUAL TABLE rcts_fts USING fts5(title, content='rcts', content_rowid='id')"))
+    catalog.commit()
+
+    engine = create_engine_with_pooling(db_url)
+    assert 'rcts' in ensure_fulltext_index(engine)
+    engine.dispose()
+    assert match_ids(catalog, 'rcts', 'shavasana') == {rct_id(catalog, 'Sleep quality trial')}
+
+
+def test_type_with_missing_column_is_skipped(catalog, db_url):
+    catalog.execute(text("ALTER TABLE rcts DROP COLUMN intervention_names"))
+    catalog.commit()
+
+    engine = create_engine_with_pooling(db_url)
+    assert ensure_fulltext_index(engine) == frozenset(FULLTEXT_DOCUMENTS) - {'rcts'}
+    engine.dispose()
+    assert catalog.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'rcts_fts%'")).all() == []
+
+
+@pytest.fixture
+def app_catalog(app_module):
+    session = app_module.get_db_session()
+    disease = Disease(name='Fulltext Test Disease')
+    rows = [
+        Practice(practice_english='Mountain Pose', practice_sanskrit='Tadasana',
+                 practice_segment='Standing asana', code='FTT1'),
+        RCT(title='Fulltext test trial', diseases=[disease], intervention_practices=json.dumps(
+            [{'name': 'Tadasana', 'category': 'Standing asana'}])),
+        RCT(title='Category only trial', diseases=[disease], intervention_practices=json.dumps(
+            [{'name': '', 'category': 'Restorative sequence'}])),
+    ]
+    session.add_all([disease] + rows)
+    session.commit()
+    yield session
+    for row in rows + [disease]:
+        session.delete(row)
+    session.commit()
+    session.close()
+
+
+def test_practice_list_keeps_substring_matches(client, app_catalog):
+    # 'asana' is inside 'Tadasana', not at the start of a word
+    assert b'Tadasana' in client.get('/practices', query_string={'search': 'asana'}).data
+    assert b'Tadasana' in client.get('/practices', query_string={'search': 'mount'}).data
+    assert b'Tadasana' not in client.get('/practices', query_string={'search': 'zzz'}).data
+
+
+def test_rct_list_matches_intervention_categories_and_substrings(client, app_catalog):
+    # The full-text index covers intervention names, not categories or word middles
+    assert b'Category only trial' in client.get('/rcts', query_string={'practice': 'restorative'}).data
+    assert b'Category only trial' in client.get('/rcts', query_string={'practice': 'storative seq'}).data
+    assert b'Fulltext test trial' in client.get('/rcts', query_string={'practice': 'dasan'}).data
+    assert b'Fulltext test trial' in client.get('/rcts', query_string={'practice': 'fulltext'}).data
+    assert b'Category only trial' not in client.get('/rcts', query_string={'practice': 'zzz'}).data
+
+
+def test_lists_fall_back_to_like_without_an_index(client, app_catalog, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'fulltext_match', lambda *args, **kwargs: None)
+    assert b'Tadasana' in client.get('/practices', query_string={'search': 'dasa'}).data
+    assert b'Fulltext test trial' in client.get('/rcts', query_string={'practice': 'tadas'}).data
+    assert b'Fulltext test trial' not in client.get('/rcts', query_string={'practice': 'zzz'}).data
+
+
+def test_search_endpoint(client, app_catalog):
+    response = client.get('/api/search', query_string={'q': 'tadasana', 'types': 'practices,rcts'})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert {result['type'] for result in results} == {'practices', 'rcts'}
+    assert client.get('/api/search', query_string={'q': 'x', 'types': 'unknown'}).status_code == 400
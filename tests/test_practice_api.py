@@ -0,0 +1,90 @@
+"""Tests for field projection and cursor pagination of /api/practices."""
+
+import base64
+import json
+
+import pytest
+
+from database.models import Practice
+
+
+@pytest.fixture
+def practices(app_module):
+    session = app_module.get_db_session()
+    # Duplicate English names check the id tie-break of the (name, id) keyset
+    rows = [
+        Practice(practice_english=english, practice_sanskrit=sanskrit, practice_segment='Standing asana',
+                 code=f'PAT{i}')
+        for i, (english, sanskrit) in enumerate([
+            ('Tree Pose', 'Vrikshasana'), ('Mountain Pose', 'Tadasana'), ('Chair Pose', 'Utkatasana'),
+            ('Mountain Pose', 'Samasthiti'), ('Warrior Pose', 'Virabhadrasana'), ('Mountain Pose', 'Urdhva Hastasana'),
+            ('Triangle Pose', 'Trikonasana'),
+        ])
+    ]
+    session.add_all(rows)
+    session.commit()
+    yield rows
+    for row in rows:
+        session.delete(row)
+    session.commit()
+    session.close()
+
+
+def get_json(client, status=200, **params):
+    response = client.get('/api/practices', query_string=params)
+    assert response.status_code == status
+    return response.get_json()
+
+
+def walk_pages(client, **params):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = get_json(client, **params, **({'cursor': cursor} if cursor else {}))
+        items.extend(page['items'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return items, pages
+
+
+def test_unpaginated_list_is_ordered_by_name_then_id(client, practices):
+    items = get_json(client)
+    assert [(item['practice_english'], item['id']) for item in items] == sorted(
+        (practice.practice_english, practice.id) for practice in practices
+    )
+
+
+def test_pages_cover_the_list_once(client, practices):
+    everything = get_json(client, fields='id,practice_english')
+    items, pages = walk_pages(client, fields='id,practice_english', limit=2)
+    assert items == everything
+    assert pages == 4
+
+
+def test_last_page_has_no_cursor(client, practices):
+    page = get_json(client, limit=len(practices))
+    assert len(page['items']) == len(practices)
+    assert page['next_cursor'] is None
+
+
+def test_fields_and_compact_format(client, practices):
+    page = get_json(client, fields='code,practice_sanskrit', format='compact', limit=3)
+    assert page['fields'] == ['code', 'practice_sanskrit']
+    assert page['items'][0] == ['PAT2', 'Utkatasana']  # Chair Pose sorts first
+    assert get_json(client, 400, fields='code,password')['error']
+
+
+def token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!',
+    base64.urlsafe_b64encode(b'not json').decode('ascii'),
+    token({'name': 'Mountain Pose'}),
+    token(['Mountain Pose']),
+    token(['Mountain Pose', 'three']),
+    token([3, 'Mountain Pose']),
+])
+def test_invalid_cursor_is_rejected(client, practices, cursor):
+    assert get_json(client, 400, cursor=cursor) == {'error': 'Invalid cursor'}
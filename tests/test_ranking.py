@@ -0,0 +1,73 @@
+"""Tests for the practice ranking kernel (core/ranking.py) with and without NumPy."""
+
+from itertools import combinations
+from types import SimpleNamespace
+
+import pytest
+
+import core.ranking as ranking
+from core.ranking import PracticeRanker
+
+
+def practice(practice_id, name, rct_count, cvr_score):
+    return SimpleNamespace(id=practice_id, practice_english=name, rct_count=rct_count, cvr_score=cvr_score)
+
+
+PRACTICES = {p.id: p for p in [
+    practice(1, 'Shavasana', 5, 2.0),
+    practice(2, 'Bhramari', 5, 2.0),      # ties Shavasana until the name
+    practice(3, 'Nadi Shodhana', 5, 3.5),
+    practice(4, 'Tadasana', 0, None),
+    practice(5, 'Tadasana', 0, None),     # identical key to practice 4
+    practice(6, None, None, 1.0),
+    practice(7, 'Kapalabhati', 12, 0.5),
+    practice(8, 'Ujjayi', 5, 2.0),
+]}
+
+DISEASE_PRACTICES = {
+    10: [PRACTICES[i] for i in (1, 2, 3, 4)],
+    11: [PRACTICES[i] for i in (2, 5, 7)],
+    12: [PRACTICES[i] for i in (1, 2, 6, 8)],
+    13: [],
+}
+
+DISEASE_SETS = [set(c) for n in range(4) for c in combinations(sorted(DISEASE_PRACTICES) + [99], n)]
+
+
+def rankings(ranker):
+    """(order, keys, repeats) of every practice for every disease set."""
+    ids = sorted(PRACTICES, reverse=True)
+    results = []
+    for disease_ids in DISEASE_SETS:
+        ranked = ranker.for_diseases(disease_ids)
+        results.append((
+            ranked.order(ids),
+            [ranked.key(pid) for pid in ids],
+            [ranked.repeat(pid) for pid in ids],
+        ))
+    return results
+
+
+def pure_python_ranker(monkeypatch):
+    monkeypatch.setattr(ranking, 'np', None)
+    return PracticeRanker(PRACTICES, DISEASE_PRACTICES)
+
+
+def test_order_follows_rank_keys_and_is_stable(monkeypatch):
+    ranker = pure_python_ranker(monkeypatch)
+    for disease_ids in DISEASE_SETS:
+        ranked = ranker.for_diseases(disease_ids)
+        ids = sorted(PRACTICES, reverse=True)
+        assert ranked.order(ids) == sorted(ids, key=ranked.key)
+
+    ranked = ranker.for_diseases({10, 11, 12})
+    assert ranked.order([5, 4]) == [5, 4]
+    assert ranked.order([4, 5]) == [4, 5]
+    assert ranked.order([1, 2, 8, 7]) == [7, 2, 1, 8]
+    assert [ranked.repeat(pid) for pid in (1, 2, 6)] == [2, 3, 1]
+
+
+def test_numpy_and_pure_python_rank_identically(monkeypatch):
+    pytest.importorskip('numpy')
+    with_numpy = rankings(PracticeRanker(PRACTICES, DISEASE_PRACTICES))
+    assert rankings(pure_python_ranker(monkeypatch)) == with_numpy
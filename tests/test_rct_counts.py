@@ -0,0 +1,140 @@
+"""Tests for incremental rct_count maintenance (core/rct_counts.py) against a full rebuild."""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from core.rct_counts import count_rcts, rct_footprint, update_rct_counts
+from database.models import RCT, RCTIntervention, Disease, Practice
+from utils.rebuild_rct_counts import rebuild_rct_counts
+
+
+@pytest.fixture
+def catalog(session):
+    anxiety = Disease(name='Anxiety')
+    insomnia = Disease(name='Insomnia')
+    session.add_all([
+        Practice(practice_english='Corpse Pose', practice_sanskrit='Shavasana',
+                 practice_segment='Relaxation practices', diseases=[anxiety, insomnia]),
+        Practice(practice_english='Bee Breath', practice_sanskrit='Bhramari',
+                 practice_segment='Breathing practices', diseases=[anxiety]),
+        Practice(practice_english='Cooling Breath', practice_sanskrit='Shitali',
+                 practice_segment='Breathing practices', diseases=[insomnia]),
+    ])
+    session.commit()
+    return session
+
+
+def interventions(*entries):
+    return json.dumps([{'name': name, 'category': category} for name, category in entries])
+
+
+def add_rct(session, title, diseases, *entries):
+    rct = RCT(title=title, intervention_practices=interventions(*entries))
+    session.add(rct)
+    rct.diseases.extend(session.query(Disease).filter(Disease.name.in_(diseases)))
+    session.flush()
+    update_rct_counts(session, rct_footprint(rct))
+    session.commit()
+    return rct
+
+
+def stored_counts(session):
+    return {practice.practice_sanskrit: practice.rct_count or 0 for practice in session.query(Practice)}
+
+
+def rebuilt_counts(session):
+    names = dict(session.query(Practice.id, Practice.practice_sanskrit))
+    counts = count_rcts(session)
+    return {name: counts.get(practice_id, 0) for practice_id, name in names.items()}
+
+
+def assert_matches_full_rebuild(session, db_url):
+    session.expire_all()
+    assert stored_counts(session) == rebuilt_counts(session)
+    assert rebuild_rct_counts(db_url, dry_run=True)['changed'] == 0
+
+
+def test_add_counts_named_and_category_interventions(catalog, db_url):
+    add_rct(catalog, 'Named', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+    add_rct(catalog, 'By English name', ['Anxiety', 'Insomnia'], ('Corpse Pose', 'Relaxation practices'))
+    add_rct(catalog, 'Category only', ['Insomnia'], ('', 'Breathing practices'))
+
+    assert stored_counts(catalog) == {'Shavasana': 2, 'Bhramari': 0, 'Shitali': 1}
+    assert_matches_full_rebuild(catalog, db_url)
+
+
+def test_practice_not_linked_to_the_rct_disease_is_not_counted(catalog, db_url):
+    add_rct(catalog, 'Wrong disease', ['Insomnia'], ('Bhramari', 'Breathing practices'))
+
+    assert stored_counts(catalog)['Bhramari'] == 0
+    assert_matches_full_rebuild(catalog, db_url)
+
+
+def test_edit_moves_counts(catalog, db_url):
+    rct = add_rct(catalog, 'Edited', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+
+    before = rct_footprint(rct)
+    rct.intervention_practices = interventions(('Bhramari', 'Breathing practices'))
+    catalog.flush()
+    update_rct_counts(catalog, before, rct_footprint(rct))
+    catalog.commit()
+
+    assert stored_counts(catalog) == {'Shavasana': 0, 'Bhramari': 1, 'Shitali': 0}
+    assert_matches_full_rebuild(catalog, db_url)
+
+
+def test_delete_removes_counts(catalog, db_url):
+    kept = add_rct(catalog, 'Kept', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+    deleted = add_rct(catalog, 'Deleted', ['Anxiety', 'Insomnia'],
+                      ('Shavasana', 'Relaxation practices'), ('', 'Breathing practices'))
+
+    footprint = rct_footprint(deleted)
+    catalog.delete(deleted)
+    catalog.flush()
+    update_rct_counts(catalog, footprint)
+    catalog.commit()
+
+    assert kept.id is not None
+    assert stored_counts(catalog) == {'Shavasana': 1, 'Bhramari': 0, 'Shitali': 0}
+    assert_matches_full_rebuild(catalog, db_url)
+
+
+def test_full_rebuild_corrects_drift(catalog, db_url):
+    add_rct(catalog, 'Named', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+    practice = catalog.query(Practice).filter_by(practice_sanskrit='Shavasana').one()
+    practice.rct_count = 7
+    catalog.commit()
+
+    report = rebuild_rct_counts(db_url)
+    assert report['drift'] == {practice.id: (7, 1)}
+    catalog.expire_all()
+    assert stored_counts(catalog)['Shavasana'] == 1
+
+def test_full_rebuild_backfills_missing_interventions(catalog, db_url):
+    add_rct(catalog, 'Named', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+    catalog.query(RCTIntervention).delete()
+    catalog.commit()
+
+    report = rebuild_rct_counts(db_url)
+    assert report['backfilled'] == 1
+    assert report['changed'] == 0
+    catalog.expire_all()
+    assert stored_counts(catalog)['Shavasana'] == 1
+
+
+def test_full_rebuild_on_database_without_intervention_tables(catalog, db_url):
+    add_rct(catalog, 'Named', ['Anxiety'], ('Shavasana', 'Relaxation practices'))
+    # Back to the schema of databases created before rct_interventions existed
+    catalog.execute(text("DROP TABLE rct_interventions"))
+    catalog.execute(text("ALTER TABLE rcts DROP COLUMN intervention_names"))
+    catalog.commit()
+    catalog.close()
+
+    report = rebuild_rct_counts(db_url)
+    assert report['backfilled'] == 1
+    assert report['changed'] == 0
+    catalog.expire_all()
+    assert stored_counts(catalog)['Shavasana'] == 1
+    assert catalog.query(RCT.intervention_names).scalar() == 'Shavasana'
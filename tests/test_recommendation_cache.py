@@ -0,0 +1,108 @@
+"""Tests for recommendation result caching (core/recommendation_engine.py)."""
+
+import json
+
+import pytest
+
+from core.recommendation_engine import YogaTherapyRecommendationEngine, get_recommendation_cache_stats
+from database.models import Disease, Module, Practice
+
+
+@pytest.fixture
+def catalog(session):
+    insomnia = Disease(name='Insomnia')
+    depression = Disease(name='Depression')
+    session.add_all([
+        Practice(practice_english='Corpse Pose', practice_sanskrit='Shavasana',
+                 practice_segment='Relaxation practices', diseases=[insomnia]),
+        Practice(practice_english='Bee Breath', practice_sanskrit='Bhramari',
+                 practice_segment='Breathing practices', diseases=[depression]),
+        Module(disease=insomnia, developed_by='Author A'),
+        Module(disease=depression, developed_by='Author B'),
+    ])
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def engine(db_url, catalog):
+    engine = YogaTherapyRecommendationEngine(db_url)
+    yield engine
+    engine.close()
+
+
+def practice_names(result):
+    return {
+        practice['practice_english']
+        for sub_categories in result['practices_by_segment'].values()
+        for practices in sub_categories.values()
+        for practice in practices
+    }
+
+
+def cache_counts():
+    stats = get_recommendation_cache_stats()
+    return stats['hits'], stats['misses']
+
+
+def test_results_follow_request_order(engine):
+    forward = engine.get_recommendations(['Insomnia', 'Depression'])
+    backward = engine.get_recommendations(['Depression', 'Insomnia'])
+    assert forward['diseases'] == ['Insomnia', 'Depression']
+    assert [module['disease'] for module in forward['modules']] == ['Insomnia', 'Depression']
+    assert backward['diseases'] == ['Depression', 'Insomnia']
+    assert [module['disease'] for module in backward['modules']] == ['Depression', 'Insomnia']
+    assert engine.get_summary(['Depression', 'Insomnia']).startswith(
+        'Yoga Therapy Recommendations for: Depression, Insomnia')
+
+
+def test_case_variants_share_a_cache_entry(engine):
+    first = engine.get_recommendations(['Insomnia', 'Depression'])
+    hits, misses = cache_counts()
+    again = engine.get_recommendations(['insomnia', ' DEPRESSION '])
+    assert cache_counts() == (hits + 1, misses)
+    assert json.dumps(again, sort_keys=True) == json.dumps(first, sort_keys=True)
+
+
+def test_practice_edit_invalidates_cached_result(engine, catalog):
+    assert 'Corpse Pose' in practice_names(engine.get_recommendations(['Insomnia']))
+
+    practice = catalog.query(Practice).filter_by(practice_sanskrit='Shavasana').one()
+    practice.practice_english = 'Relaxation Pose'
+    catalog.commit()
+
+    names = practice_names(engine.get_recommendations(['Insomnia']))
+    assert 'Relaxation Pose' in names
+    assert 'Corpse Pose' not in names
+
+
+def test_new_link_invalidates_cached_result(engine, catalog):
+    assert practice_names(engine.get_recommendations(['Insomnia'])) == {'Corpse Pose'}
+
+    insomnia = catalog.query(Disease).filter_by(name='Insomnia').one()
+    practice = catalog.query(Practice).filter_by(practice_sanskrit='Bhramari').one()
+    practice.diseases.append(insomnia)
+    catalog.commit()
+
+    assert practice_names(engine.get_recommendations(['Insomnia'])) == {'Corpse Pose', 'Bee Breath'}
+
+
+def test_edit_to_other_disease_keeps_cached_result(engine, catalog):
+    engine.get_recommendations(['Insomnia'])
+
+    practice = catalog.query(Practice).filter_by(practice_sanskrit='Bhramari').one()
+    practice.practice_english = 'Humming Bee Breath'
+    catalog.commit()
+
+    hits, misses = cache_counts()
+    engine.get_recommendations(['Insomnia'])
+    assert cache_counts() == (hits + 1, misses)
+
+
+def test_app_starts_its_recommendation_services_once(client, app_module):
+    assert client.get('/api/health').status_code == 200
+    refresher = app_module.app.extensions['snapshot_refresher']
+    assert refresher.warmed_at is not None
+    app_module.init_recommendation_services(app_module.app)
+    client.get('/api/health')
+    assert app_module.app.extensions['snapshot_refresher'] is refresher
@@ -0,0 +1,151 @@
+"""Tests for Sanskrit name matching (database/transliteration.py) and the practice search API."""
+
+from collections import namedtuple
+from types import SimpleNamespace
+
+import pytest
+
+from database.models import Disease, Practice
+from database.transliteration import (
+    MIN_SIMILARITY, fold, key_length_range, key_prefix_range, name_prefix_range, rank_sanskrit_matches,
+    sanskrit_key, trigram_similarity
+)
+
+PracticeRecord = namedtuple('PracticeRecord', ['id', 'practice_sanskrit', 'practice_sanskrit_key'])
+
+
+@pytest.mark.parametrize('variants', [
+    ('Shavasana', 'Savasana', 'Śavāsana', 'Shavaasana'),
+    ('Anulom Vilom', 'Anuloma Viloma'),
+    ('Pawanmuktasana', 'Pavanamuktasana'),
+    ('Kapalbhati', 'Kapalabhati'),
+    ('Sheetali', 'Shitali'),
+    ('Bhramari', 'Bramari'),
+    ('Uddiyana', 'Udiyana'),
+    ('Pranayam', 'Pranayama'),
+])
+def test_spelling_variants_share_a_key(variants):
+    assert len({sanskrit_key(name) for name in variants}) == 1
+
+
+def test_different_names_get_different_keys():
+    assert sanskrit_key('Shavasana') != sanskrit_key('Tadasana')
+    assert sanskrit_key('Bhujangasana') != sanskrit_key('Bhramari')
+
+
+def test_key_examples():
+    assert fold('Śavāsana') == 'savasana'
+    assert sanskrit_key('Shavasana') == 'svsn'
+    assert sanskrit_key('Anulom Vilom') == 'anulomvilom'
+    assert sanskrit_key('123 -') == ''
+
+
+def test_key_prefix_range():
+    assert key_prefix_range('sv') == ('sv', 'sw')
+    assert key_prefix_range('az') == ('az', 'b')
+    assert key_prefix_range('zz') == ('zz', None)
+
+
+def test_name_prefix_range():
+    assert name_prefix_range('Sava') == ('sava', 'savb')
+    assert name_prefix_range('Śa') == ('śa', 'śb')
+
+
+def test_key_length_range_bounds_typo_candidates():
+    shortest, longest = key_length_range('svsn')
+    assert shortest <= len('svsn') <= longest
+    # A key just past the range falls below MIN_SIMILARITY even when it starts with the query key
+    assert trigram_similarity('svsn', 'svsn' + 'bcdfghjklmpqrt'[:longest + 1 - len('svsn')]) < MIN_SIMILARITY
+
+
+def make_candidates(*names):
+    return [PracticeRecord(i, name, sanskrit_key(name)) for i, name in enumerate(names, start=1)]
+
+
+def ranked_names(query, candidates, limit=10):
+    return [practice.practice_sanskrit for practice in rank_sanskrit_matches(query, candidates, limit=limit)]
+
+
+def test_ranking_tiers():
+    candidates = make_candidates('Savasana', 'Shavasana', 'Sarvangasana', 'Tadasana', 'Shashankasana')
+    # Name prefix first (shorter name first), then key prefix matches; unrelated names are dropped
+    assert ranked_names('Shav', candidates) == ['Shavasana', 'Savasana']
+    assert ranked_names('sava', candidates)[0] == 'Savasana'
+    assert 'Tadasana' not in ranked_names('shava', candidates)
+
+
+def test_ranking_finds_typos_by_similarity():
+    candidates = make_candidates('Bhujangasana', 'Bhramari', 'Tadasana')
+    assert ranked_names('Bujangsana', candidates)[0] == 'Bhujangasana'
+    assert ranked_names('Vhujangasana', candidates) == ['Bhujangasana']
+
+
+def test_ranking_respects_limit_and_ignores_keyless_queries():
+    candidates = make_candidates('Savasana', 'Shavasana', 'Sarvangasana')
+    assert len(rank_sanskrit_matches('s', candidates, limit=2)) == 2
+    assert rank_sanskrit_matches('--', candidates) == []
+
+
+def test_key_is_kept_current_on_flush(session):
+    practice = Practice(practice_english='Corpse Pose', practice_sanskrit='Shavasana',
+                        practice_segment='Relaxation practices')
+    session.add(practice)
+    session.commit()
+    assert practice.practice_sanskrit_key == 'svsn'
+
+    practice.practice_sanskrit = 'Tadasana'
+    session.commit()
+    assert practice.practice_sanskrit_key == sanskrit_key('Tadasana')
+
+
+@pytest.fixture
+def practices(app_module):
+    session = app_module.get_db_session()
+    disease = Disease(name='Transliteration Test Disease')
+    rows = [
+        Practice(practice_english='Corpse Pose', practice_sanskrit='Śavāsana', practice_segment='Relaxation practices',
+                 code='TLT1', diseases=[disease]),
+        Practice(practice_english='Cobra Pose', practice_sanskrit='Bhujangasana', practice_segment='Prone asana',
+                 code='TLT2'),
+        Practice(practice_english='Alternate Nostril Breathing', practice_sanskrit='Anuloma Viloma',
+                 practice_segment='Breathing practices', code='TLT3', diseases=[disease]),
+    ]
+    session.add_all([disease] + rows)
+    session.commit()
+    yield session
+    for row in rows + [disease]:
+        session.delete(row)
+    session.commit()
+    session.close()
+
+
+def search(client, **params):
+    response = client.get('/api/practice/search', query_string=params)
+    assert response.status_code == 200
+    return [result['practice_sanskrit'] for result in response.get_json()]
+
+
+def test_search_api_matches_spelling_variants_and_typos(client, practices):
+    assert search(client, q='Shavasana') == ['Śavāsana']
+    assert search(client, q='anulom vilom') == ['Anuloma Viloma']
+    # Typo after the first two key letters: found by trigram similarity, not the key prefix
+    assert search(client, q='Bhujamgasana') == ['Bhujangasana']
+    # Typo candidates share the query key's first letters
+    assert search(client, q='Vhujangasana') == []
+    assert search(client, q='xyzzy') == []
+
+
+def test_search_api_disease_filter_and_fields(client, practices):
+    assert search(client, q='Bhujangasana', disease='Transliteration Test Disease') == []
+    assert search(client, q='anul', disease='Transliteration Test Disease') == ['Anuloma Viloma']
+
+    response = client.get('/api/practice/search', query_string={'q': 'savasana', 'fields': 'id,code'})
+    assert [sorted(result) for result in response.get_json()] == [['code', 'id']]
+    assert search(client, q='TLT2', search_by='code') == ['Bhujangasana']
+
+
+def test_search_api_skips_practices_deleted_after_ranking(client, practices, app_module, monkeypatch):
+    rank = app_module.rank_sanskrit_matches
+    monkeypatch.setattr(app_module, 'rank_sanskrit_matches',
+                        lambda *args, **kwargs: rank(*args, **kwargs) + [SimpleNamespace(id=-1)])
+    assert search(client, q='Shavasana') == ['Śavāsana']
@@ -0,0 +1,104 @@
+"""Tests for the recommendation wizard state stores (core/wizard_state.py)."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import core.wizard_state as wizard_state
+from core.wizard_state import MemoryWizardStateStore, SQLiteWizardStateStore, create_wizard_state_store
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time for the stores: advance with clock.now += seconds."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(wizard_state, 'time', SimpleNamespace(monotonic=lambda: clock.now, time=lambda: clock.now))
+    return clock
+
+
+STATE = {'diseases': ['Anxiety', 'Insomnia'], 'ties': [[1, 2.5, 'Bhramari']], 'selected': {'Pranayama': [3]}}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryWizardStateStore(max_entries=2)
+    store.put('a', {'n': 1})
+    store.put('b', {'n': 2})
+    assert store.get('a') == {'n': 1}  # 'a' is now the most recently used
+    store.put('c', {'n': 3})
+    assert store.get('b') is None
+    assert store.get('a') == {'n': 1}
+    assert store.get('c') == {'n': 3}
+    assert store.stats()['size'] == 2
+
+
+def test_memory_store_expires_entries(clock):
+    store = MemoryWizardStateStore(ttl=60)
+    store.put('a', STATE)
+    clock.now += 59
+    assert store.get('a') == STATE
+    clock.now += 1
+    assert store.get('a') is None
+    assert store.stats()['size'] == 0
+
+
+def test_memory_store_delete_and_missing_tokens():
+    store = MemoryWizardStateStore()
+    store.put('a', STATE)
+    store.delete('a')
+    store.delete('unknown')
+    store.delete(None)
+    assert store.get('a') is None
+    assert store.get(None) is None
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    db_file = str(tmp_path / 'wizard.db')
+    SQLiteWizardStateStore(db_file).put('a', STATE)
+    # A second store on the same file (another worker) sees the state
+    other = SQLiteWizardStateStore(db_file)
+    assert other.get('a') == STATE
+    other.put('a', {'step': 2})
+    assert other.get('a') == {'step': 2}
+    other.delete('a')
+    assert other.get('a') is None
+    assert other.get(None) is None
+
+
+def test_sqlite_store_expires_and_purges_entries(tmp_path, clock):
+    store = SQLiteWizardStateStore(str(tmp_path / 'wizard.db'), ttl=60)
+    store.put('a', STATE)
+    clock.now += 59
+    assert store.get('a') == STATE
+    assert store.stats()['size'] == 1
+    clock.now += 1
+    assert store.get('a') is None
+    assert store.stats()['size'] == 0
+
+    store.put('b', STATE)  # writes purge expired rows
+    conn = store._connect()
+    try:
+        assert conn.execute("SELECT token FROM wizard_state").fetchall() == [('b',)]
+    finally:
+        conn.close()
+
+
+def test_create_store_from_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv('WIZARD_STATE_STORE', raising=False)
+    monkeypatch.setenv('WIZARD_STATE_MAX_ENTRIES', '5')
+    monkeypatch.setenv('WIZARD_STATE_TTL', '30')
+    store = create_wizard_state_store()
+    assert isinstance(store, MemoryWizardStateStore)
+    assert (store.max_entries, store.ttl) == (5, 30)
+
+    monkeypatch.setenv('WIZARD_STATE_STORE', 'SQLite')
+    monkeypatch.delenv('WIZARD_STATE_DB', raising=False)
+    db_file = str(tmp_path / 'app.db')
+    store = create_wizard_state_store(f'sqlite:///{db_file}')
+    assert isinstance(store, SQLiteWizardStateStore)
+    assert store.db_file == db_file
+
+    monkeypatch.setenv('WIZARD_STATE_DB', str(tmp_path / 'wizard.db'))
+    assert create_wizard_state_store(f'sqlite:///{db_file}').db_file == str(tmp_path / 'wizard.db')
+
+    monkeypatch.setenv('WIZARD_STATE_STORE', 'redis')
+    assert isinstance(create_wizard_state_store(), MemoryWizardStateStore)
@@ -0,0 +1,251 @@
+"""
+RCT Count Rebuild Utility
+
+Recomputes every practice's rct_count from scratch and reports the drift it
+corrected. Use it after bulk imports, raw SQL edits, or to verify counts.
+
+Counting rule (same as core/rct_counts.py): an RCT counts once for a practice
+when they share a disease and one of the RCT's interventions names the
+practice (Sanskrit or English, exact match) or names only its category.
+
+RCTs are streamed from rct_interventions in chunks of RCT ids, and each
+chunk is matched against in-memory practice lookups built once. With
+--workers N the chunks are counted by a process pool. All changed counts are
+written with one bulk UPDATE and a single commit. Databases that predate
+rct_interventions or rcts.intervention_names get them added, and an unfilled
+rct_interventions table is backfilled first, so counts are not reset to zero.
+
+Usage:
+    python -m utils.rebuild_rct_counts [--db URL] [--chunk-size 1000] [--workers 4] [--dry-run]
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path so we can import database module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, update
+from database.models import (
+    Practice, RCT, RCTIntervention, disease_practice_association, rct_disease_association,
+    add_rct_intervention_names_column, backfill_rct_interventions, create_database, get_session,
+    get_database_url
+)
+
+
+def ensure_rct_interventions(session):
+    """
+    Backfill rct_interventions when RCTs list interventions but the table is empty.
+
+    Returns:
+        Number of RCTs backfilled (0 if the table was already filled)
+    """
+    if session.query(RCTIntervention.id).first() is not None:
+        return 0
+    if session.query(RCT.id).filter(RCT.intervention_practices.isnot(None), RCT.intervention_practices != '').first() is None:
+        return 0
+    return backfill_rct_interventions(session)
+
+
+def build_practice_lookups(session):
+    """
+    Practice lookups for matching interventions.
+
+    Returns:
+        (current {practice_id: rct_count},
+         {(disease_id, practice name): (practice_id, ...)},
+         {(disease_id, practice_segment): (practice_id, ...)})
+    """
+    practices = session.execute(
+        select(Practice.id, Practice.practice_sanskrit, Practice.practice_english,
+               Practice.practice_segment, Practice.rct_count)
+    ).all()
+    current = {row.id: row.rct_count for row in practices}
+    by_id = {row.id: row for row in practices}
+
+    by_name = defaultdict(set)
+    by_segment = defaultdict(set)
+    for disease_id, practice_id in session.execute(
+        select(disease_practice_association.c.disease_id, disease_practice_association.c.practice_id)
+    ):
+        practice = by_id.get(practice_id)
+        if practice is None:
+            continue
+        for name in (practice.practice_sanskrit, practice.practice_english):
+            if name:
+                by_name[(disease_id, name)].add(practice_id)
+        if practice.practice_segment is not None:
+            by_segment[(disease_id, practice.practice_segment)].add(practice_id)
+
+    return (
+        current,
+        {key: tuple(ids) for key, ids in by_name.items()},
+        {key: tuple(ids) for key, ids in by_segment.items()},
+    )
+
+
+def iter_rct_chunks(session, chunk_size):
+    """
+    Yield chunks of RCTs as lists of (disease_ids, [(practice_name, category), ...]).
+
+    Uses keyset pagination over RCT ids, so memory stays bounded by the chunk size.
+    """
+    last_id = 0
+    while True:
+        rct_ids = session.execute(
+            select(RCT.id).where(RCT.id > last_id).order_by(RCT.id).limit(chunk_size)
+        ).scalars().all()
+        if not rct_ids:
+            return
+        last_id = rct_ids[-1]
+
+        diseases = defaultdict(list)
+        for rct_id, disease_id in session.execute(
+            select(rct_disease_association.c.rct_id, rct_disease_association.c.disease_id)
+            .where(rct_disease_association.c.rct_id.in_(rct_ids))
+        ):
+            diseases[rct_id].append(disease_id)
+
+        interventions = defaultdict(list)
+        for rct_id, name, category in session.execute(
+            select(RCTIntervention.rct_id, RCTIntervention.practice_name, RCTIntervention.category)
+            .where(RCTIntervention.rct_id.in_(rct_ids))
+        ):
+            interventions[rct_id].append((name, category))
+
+        yield [
+            (diseases[rct_id], interventions[rct_id])
+            for rct_id in rct_ids
+            if diseases.get(rct_id) and interventions.get(rct_id)
+        ]
+
+
+def count_chunk(chunk, by_name, by_segment):
+    """Count supporting RCTs per practice for one chunk: Counter({practice_id: n})."""
+    counts = Counter()
+    for disease_ids, interventions in chunk:
+        matched = set()
+        for disease_id in disease_ids:
+            for name, category in interventions:
+                if name:
+                    matched.update(by_name.get((disease_id, name), ()))
+                else:
+                    matched.update(by_segment.get((disease_id, category), ()))
+        counts.update(matched)
+    return counts
+
+
+# Lookups shared with pool workers (set once per worker process by the initializer)
+_worker_lookups = None
+
+
+def _init_worker(by_name, by_segment):
+    global _worker_lookups
+    _worker_lookups = (by_name, by_segment)
+
+
+def _count_chunk_in_worker(chunk):
+    return count_chunk(chunk, *_worker_lookups)
+
+
+def rebuild_rct_counts(db_path=None, chunk_size=1000, workers=0, dry_run=False):
+    """
+    Recompute rct_count for every practice.
+
+    Args:
+        db_path: database URL (default: get_database_url())
+        chunk_size: RCTs per chunk
+        workers: process pool size for counting chunks (0 or 1: count in this process)
+        dry_run: report the drift without writing it
+
+    Returns:
+        dict with practices, rcts, backfilled, changed, and drift {practice_id: (old_count, new_count)}
+    """
+    db_path = db_path or get_database_url()
+    # Databases older than rct_interventions / rcts.intervention_names lack them
+    engine = create_database(db_path)
+    try:
+        add_rct_intervention_names_column(engine)
+    finally:
+        engine.dispose()
+    session = get_session(db_path)
+    try:
+        # Counting reads rct_interventions; an unfilled table would zero every count
+        backfilled = ensure_rct_interventions(session)
+        current, by_name, by_segment = build_practice_lookups(session)
+
+        counts = Counter()
+        rct_total = 0
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(by_name, by_segment)) as pool:
+                futures = []
+                for chunk in iter_rct_chunks(session, chunk_size):
+                    rct_total += len(chunk)
+                    futures.append(pool.submit(_count_chunk_in_worker, chunk))
+                for future in futures:
+                    counts.update(future.result())
+        else:
+            for chunk in iter_rct_chunks(session, chunk_size):
+                rct_total += len(chunk)
+                counts.update(count_chunk(chunk, by_name, by_segment))
+
+        drift = {
+            practice_id: (old_count, counts.get(practice_id, 0))
+            for practice_id, old_count in current.items()
+            if old_count != counts.get(practice_id, 0)
+        }
+
+        if drift and not dry_run:
+            session.execute(
+                update(Practice),
+                [{'id': practice_id, 'rct_count': new_count} for practice_id, (_, new_count) in drift.items()]
+            )
+            session.commit()
+
+        return {
+            'practices': len(current),
+            'rcts': rct_total,
+            'backfilled': backfilled,
+            'changed': len(drift),
+            'drift': drift,
+        }
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recompute every practice\'s rct_count and report drift.')
+    parser.add_argument('--db', help='Database URL (default: DATABASE_URL / DB_* settings)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='RCTs per chunk (default 1000)')
+    parser.add_argument('--workers', type=int, default=0, help='Process pool size for counting (default: none)')
+    parser.add_argument('--dry-run', action='store_true', help='Report drift without writing counts')
+    parser.add_argument('--show', type=int, default=20, help='Largest drifts to list (default 20)')
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("Rebuilding practice RCT counts" + (" (dry run)" if args.dry_run else ""))
+    print("=" * 60)
+
+    report = rebuild_rct_counts(args.db, chunk_size=max(1, args.chunk_size),
+                                workers=args.workers, dry_run=args.dry_run)
+    drift = report['drift']
+    total = sum(abs((new or 0) - (old or 0)) for old, new in drift.values())
+
+    if report['backfilled']:
+        print(f"Backfilled rct_interventions for {report['backfilled']} RCTs")
+    print(f"Practices scanned: {report['practices']}")
+    print(f"RCTs counted:      {report['rcts']}")
+    print(f"Counts {'to correct' if args.dry_run else 'corrected'}: {report['changed']} (total drift {total})")
+    largest = sorted(drift.items(), key=lambda item: -abs((item[1][1] or 0) - (item[1][0] or 0)))
+    for practice_id, (old, new) in largest[:args.show]:
+        print(f"  practice {practice_id}: {old} -> {new}")
+    if len(largest) > args.show:
+        print(f"  ... and {len(largest) - args.show} more")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,22 +16,38 @@ import sys
 import os
 import json
 import csv
+import base64
 import io
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 
 # Add parent directory to path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, session as flask_session
-from sqlalchemy import text, func, inspect, or_
-from sqlalchemy.orm import joinedload, selectinload
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, session as flask_session, Response, stream_with_context
+from sqlalchemy import text, func, inspect, or_, and_
+from sqlalchemy.orm import joinedload, selectinload, load_only
 from collections import defaultdict
+from core.recommendation_engine import YogaTherapyRecommendationEngine
+from core.snapshot_refresh import SnapshotRefresher
+from core.wizard_state import create_wizard_state_store, new_wizard_token
+from core.recommendation_pipeline import RecommendationPipeline, KOSHA_ORDER
+from core.rct_counts import rct_footprint, update_rct_counts, recount_practices
 from database.models import (
     Disease, Practice, Citation, Contraindication, DiseaseCombination, Module,
-    RCT, RCTSymptom,
+    RCT, RCTSymptom, RCTIntervention,
     create_database, get_engine, get_session, get_database_url, disease_contraindication_association,
-    disease_practice_association, rct_disease_association
+    disease_practice_association, rct_disease_association, backfill_rct_interventions,
+    backfill_rct_intervention_names, backfill_practice_sanskrit_keys, create_missing_indexes, uses_shared_connection,
+    add_rct_intervention_names_column
+)
+from database.fulltext import FULLTEXT_DOCUMENTS, ensure_fulltext_index, fulltext_match, search_fulltext
+from database.transliteration import (
+    MATCH_CANDIDATES, TYPO_CANDIDATES, TYPO_PREFIX_LENGTH, sanskrit_key, key_prefix_range, name_prefix_range,
+    key_length_range, rank_sanskrit_matches
 )
 
 app = Flask(__name__)
@@ -447,6 +463,33 @@ def ensure_practice_code_column():
         print(f"Warning: failed to ensure practices.code column: {exc}")
 
 
+def ensure_practice_sanskrit_key_column():
+    """Ensure practices.practice_sanskrit_key exists, is indexed and is filled for older databases."""
+    try:
+        engine = get_engine()
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('practices')]
+        if 'practice_sanskrit_key' not in columns:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE practices ADD COLUMN practice_sanskrit_key VARCHAR(200)"))
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_practice_sanskrit_key ON practices (practice_sanskrit_key)"
+            ))
+    except Exception as exc:
+        print(f"Warning: failed to ensure practices.practice_sanskrit_key column: {exc}")
+        return
+
+    session = get_session(DB_PATH)
+    try:
+        backfill_practice_sanskrit_keys(session)
+    except Exception as exc:
+        session.rollback()
+        print(f"Warning: failed to backfill practice Sanskrit keys: {exc}")
+    finally:
+        session.close()
+
+
 def ensure_disease_code_column():
     """Ensure diseases.code column exists for older databases."""
     try:
@@ -522,13 +565,127 @@ def ensure_contraindication_type_column():
     except Exception as exc:
         print(f"Warning: failed to ensure contraindications.contraindication_type column: {exc}")
 
+
+def ensure_rct_intervention_names_column():
+    """Ensure rcts.intervention_names column exists for older databases (filled by ensure_rct_interventions_backfilled)."""
+    try:
+        add_rct_intervention_names_column(get_engine())
+    except Exception as exc:
+        print(f"Warning: failed to ensure rcts.intervention_names column: {exc}")
+
+
+def ensure_rct_interventions_backfilled():
+    """Fill rct_interventions and rcts.intervention_names for databases created before they existed."""
+    session = get_session(DB_PATH)
+    try:
+        if (session.query(RCTIntervention.id).first() is None
+                and session.query(RCT.id).filter(RCT.intervention_practices.isnot(None),
+                                                 RCT.intervention_practices != '').first() is not None):
+            backfill_rct_interventions(session)
+        backfill_rct_intervention_names(session)
+    except Exception as exc:
+        session.rollback()
+        print(f"Warning: failed to backfill rct_interventions: {exc}")
+    finally:
+        session.close()
+
+
+def ensure_case_insensitive_indexes():
+    """Add the lower(...) lookup indexes to older databases (after the column migrations above)."""
+    try:
+        skipped = create_missing_indexes(get_engine())
+        if skipped:
+            print(f"Warning: skipped indexes on missing columns: {', '.join(skipped)}")
+    except Exception as exc:
+        print(f"Warning: failed to ensure case-insensitive indexes: {exc}")
+
+
+def ensure_fulltext_search():
+    """Create the full-text search indexes (FTS5 / tsvector) missing from older databases."""
+    try:
+        ensure_fulltext_index(get_engine())
+    except Exception as exc:
+        print(f"Warning: full-text search unavailable, searches fall back to LIKE: {exc}")
+
 # Initialize database on startup
 create_database(DB_PATH)
 ensure_practice_code_column()
+ensure_practice_sanskrit_key_column()
 ensure_disease_code_column()
 ensure_module_code_column()
 ensure_disease_icd_dsm_code_column()
 ensure_contraindication_type_column()
+ensure_rct_intervention_names_column()
+ensure_case_insensitive_indexes()
+ensure_rct_interventions_backfilled()
+ensure_fulltext_search()
+
+
+_recommendation_services_lock = threading.Lock()
+
+
+def init_recommendation_services(flask_app):
+    """
+    Create the recommendation engine and snapshot refresher owned by flask_app.
+
+    The engine holds no per-request state (everything is read from the
+    knowledge-graph snapshot), so one instance serves every request. The
+    refresher builds the snapshot now and keeps it fresh after edits (see
+    core/snapshot_refresh.py); it stops listening for changes at process exit.
+    Runs once per process: before app.run() below, or on the first request when
+    a WSGI server imports the app (so each forked worker gets its own refresher).
+    """
+    with _recommendation_services_lock:
+        if 'snapshot_refresher' in flask_app.extensions:
+            return
+        refresher = SnapshotRefresher(DB_PATH)
+        try:
+            refresher.warm_up()
+        except Exception as exc:
+            # Requests still work; the snapshot is built on first use instead
+            print(f"Warning: failed to warm up the recommendation snapshot: {exc}")
+        atexit.register(refresher.close)
+        flask_app.extensions['recommendation_engine'] = YogaTherapyRecommendationEngine(DB_PATH)
+        flask_app.extensions['snapshot_refresher'] = refresher
+
+
+@app.before_request
+def ensure_recommendation_services():
+    """Start the recommendation services on the first request if the server has not."""
+    if 'snapshot_refresher' not in app.extensions:
+        init_recommendation_services(app)
+
+
+def get_recommendation_engine():
+    """The app's shared recommendation engine."""
+    return app.extensions['recommendation_engine']
+
+
+def get_snapshot_refresher():
+    """The app's recommendation snapshot refresher."""
+    return app.extensions['snapshot_refresher']
+
+
+# Server-side state of the recommendation wizard; the cookie only carries its token
+wizard_state_store = create_wizard_state_store(DB_PATH)
+
+
+def get_wizard_state():
+    """State of the current recommendation wizard run, or None if missing/expired."""
+    return wizard_state_store.get(flask_session.get('wizard_state_token'))
+
+
+def start_wizard_state(state):
+    """Store the state of a new wizard run, replacing any previous run of this browser."""
+    wizard_state_store.delete(flask_session.get('wizard_state_token'))
+    token = new_wizard_token()
+    wizard_state_store.put(token, state)
+    flask_session['wizard_state_token'] = token
+
+
+def clear_wizard_state():
+    """Forget the current wizard run."""
+    wizard_state_store.delete(flask_session.pop('wizard_state_token', None))
 
 
 def get_db_session():
@@ -536,6 +693,47 @@ def get_db_session():
     return get_session(DB_PATH)
 
 
+# Bounded thread pool for independent database loads within one request
+DB_LOAD_WORKERS = int(os.getenv('DB_LOAD_WORKERS', '8'))
+_db_load_executor = ThreadPoolExecutor(max_workers=DB_LOAD_WORKERS, thread_name_prefix='db-load')
+atexit.register(_db_load_executor.shutdown, wait=False)
+
+
+def run_db_loads(session, loaders):
+    """
+    Run independent loader(session) callables concurrently, each with its own session.
+
+    Request latency then tracks the slowest query instead of the sum of all
+    queries. Loaders must eager-load everything the caller reads, because
+    their sessions are closed when they finish; the loaded ORM objects (or
+    lists of them) are then merged into the caller's session without new
+    queries, so they behave as if loaded there (identity map, lazy loads).
+    On SQLite all sessions share one connection, so the loaders run one after
+    another on the caller's session and no other session is opened.
+
+    Returns results in loader order.
+    """
+    if len(loaders) <= 1 or uses_shared_connection(DB_PATH):
+        return [loader(session) for loader in loaders]
+
+    def _run(loader):
+        loader_session = get_db_session()
+        try:
+            return loader(loader_session)
+        finally:
+            loader_session.close()
+
+    def _merge(result):
+        if result is None:
+            return None
+        if isinstance(result, list):
+            return [session.merge(obj, load=False) for obj in result]
+        return session.merge(result, load=False)
+
+    futures = [_db_load_executor.submit(_run, loader) for loader in loaders]
+    return [_merge(future.result()) for future in futures]
+
+
 class Pagination:
     """Simple pagination class to mimic Flask-SQLAlchemy's pagination object"""
     def __init__(self, query, page, per_page, total, items):
@@ -2128,10 +2326,17 @@ def list_practices():
             query = query.filter(Practice.practice_segment == segment_filter)
         
         if search_term:
-            query = query.filter(
+            # Names containing the term ('asana' finds Tadasana), or, with the full-text
+            # index, names and codes matching every word as a prefix in any order
+            name_match = (
                 (Practice.practice_english.ilike(f'%{search_term}%')) |
                 (Practice.practice_sanskrit.ilike(f'%{search_term}%'))
             )
+            matching_ids = fulltext_match(session, 'practices', search_term, titles_only=True)
+            if matching_ids is not None:
+                query = query.filter(name_match | Practice.id.in_(matching_ids))
+            else:
+                query = query.filter(name_match)
         
         # Paginate before grouping (more efficient)
         pagination = paginate_query(query, page, per_page)
@@ -2803,8 +3008,7 @@ def edit_practice(practice_id):
                 
                 # Recalculate RCT count if category or diseases changed
                 if old_category != practice.practice_segment or old_disease_ids != new_disease_ids:
-                    for p in related_practices:
-                        recalculate_practice_rct_count(session, p)
+                    recount_practices(session, [p.id for p in related_practices])
             else:
                 # This is a general edit from practices tab - just sync fields, don't touch modules/diseases
                 # Keep all existing practices and their module associations intact
@@ -3954,8 +4158,6 @@ def api_get_recommendations():
         "diseases": ["Depression", "GAD"]
     }
     """
-    from core.recommendation_engine import YogaTherapyRecommendationEngine
-    
     data = request.get_json(silent=True)
     
     if not isinstance(data, dict) or 'diseases' not in data:
@@ -3969,12 +4171,86 @@ def api_get_recommendations():
     if not diseases_clean:
         return jsonify({'error': '"diseases" must contain at least one name'}), 400
     
-    engine = YogaTherapyRecommendationEngine(DB_PATH)
-    try:
-        recommendations = engine.get_recommendations(diseases_clean)
-        return jsonify(recommendations)
-    finally:
-        engine.close()
+    recommendations = get_recommendation_engine().get_recommendations(diseases_clean)
+    return jsonify(recommendations)
+
+
+# Upper bound on disease sets per batch request
+MAX_RECOMMENDATION_BATCH_SIZE = 5000
+
+
+@app.route('/api/recommendations/batch', methods=['POST'])
+def api_get_recommendations_batch():
+    """
+    API endpoint to get recommendations for many disease sets in one call
+
+    Expected JSON body:
+    {
+        "disease_sets": [["Depression", "GAD"], ["Insomnia"]]
+    }
+    Returns:
+    {
+        "results": [{...}, {...}]   # same order as disease_sets
+    }
+    """
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or 'disease_sets' not in data:
+        return jsonify({'error': 'Please provide a list of disease sets'}), 400
+
+    disease_sets = data.get('disease_sets')
+    if not isinstance(disease_sets, list) or not disease_sets:
+        return jsonify({'error': '"disease_sets" must be a non-empty list of disease name lists'}), 400
+
+    if len(disease_sets) > MAX_RECOMMENDATION_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_RECOMMENDATION_BATCH_SIZE} disease sets per request'}), 400
+
+    disease_sets_clean = []
+    for idx, diseases in enumerate(disease_sets):
+        if not isinstance(diseases, list):
+            return jsonify({'error': f'disease_sets[{idx}] must be a list of disease names'}), 400
+        disease_sets_clean.append([str(d).strip() for d in diseases if str(d).strip()])
+
+    results = get_recommendation_engine().get_recommendations_batch(disease_sets_clean)
+    return jsonify({'results': results})
+
+
+@app.route('/api/recommendations/cache', methods=['GET'])
+def api_recommendation_cache_stats():
+    """
+    API endpoint exposing the recommendation result cache counters
+
+    Returns:
+    {
+        "hits": 10, "misses": 2, "hit_rate": 0.83, "size": 2, "max_size": 1024, "ttl_seconds": 600
+    }
+    """
+    from core.recommendation_engine import get_recommendation_cache_stats
+
+    return jsonify(get_recommendation_cache_stats())
+
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """
+    Health check for the recommendation service: snapshot and cache status
+
+    Returns 200 when the knowledge-graph snapshot can be served, 503 otherwise.
+    """
+    health = get_snapshot_refresher().health()
+    return jsonify(health), (200 if health['status'] == 'ok' else 503)
+
+
+@app.route('/api/engine/refresh', methods=['POST'])
+def api_refresh_engine():
+    """
+    Drop and rebuild the recommendation snapshot and result cache
+
+    Edits made through this app refresh automatically; use this after changing
+    the database from outside the app (another process, raw SQL).
+    """
+    get_snapshot_refresher().refresh()
+    return jsonify(get_snapshot_refresher().health())
 
 
 @app.route('/api/summary', methods=['POST'])
@@ -3986,9 +4262,9 @@ def api_get_summary():
     {
         "diseases": ["Depression", "GAD"]
     }
+    With ?stream=1 the summary is streamed as text/plain, one chunk per
+    practice segment, instead of being returned as {"summary": "..."}.
     """
-    from core.recommendation_engine import YogaTherapyRecommendationEngine
-    
     data = request.get_json(silent=True)
     
     if not isinstance(data, dict) or 'diseases' not in data:
@@ -4002,12 +4278,84 @@ def api_get_summary():
     if not diseases_clean:
         return jsonify({'error': '"diseases" must contain at least one name'}), 400
     
-    engine = YogaTherapyRecommendationEngine(DB_PATH)
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def generate():
+            yield from get_recommendation_engine().iter_summary(diseases_clean)
+
+        return Response(stream_with_context(generate()), mimetype='text/plain; charset=utf-8')
+
+    summary = get_recommendation_engine().get_summary(diseases_clean)
+    return jsonify({'summary': summary})
+
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """
+    Full-text search across practices, RCTs, contraindications and modules.
+    Query parameters:
+    - q: search text; every word must match the start of a word
+    - types: comma-separated subset of practices,rcts,contraindications,modules (default: all)
+    - limit: maximum number of hits (default 20, max 50)
+    Returns hits ranked by relevance, with an HTML snippet highlighting matches in <mark> tags.
+    """
+    query = request.args.get('q', '').strip()
+    types = [t.strip() for t in request.args.get('types', '').split(',') if t.strip()]
+    unknown = [t for t in types if t not in FULLTEXT_DOCUMENTS]
+    if unknown:
+        return jsonify({'error': f'Unknown types: {", ".join(unknown)}'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+
+    if not query:
+        return jsonify({'query': query, 'results': []})
+
+    session = get_db_session()
     try:
-        summary = engine.get_summary(diseases_clean)
-        return jsonify({'summary': summary})
+        hits = search_fulltext(session, query, kinds=types or None, limit=limit)
+
+        # Titles and links, one query per document type
+        ids_by_kind = defaultdict(list)
+        for hit in hits:
+            ids_by_kind[hit.kind].append(hit.id)
+        titles = {}
+        if ids_by_kind['practices']:
+            for practice in session.query(Practice).filter(Practice.id.in_(ids_by_kind['practices'])):
+                title = practice.practice_english
+                if practice.practice_sanskrit:
+                    title = f"{practice.practice_sanskrit} ({practice.practice_english})"
+                titles[('practices', practice.id)] = (title, url_for('view_practice', practice_id=practice.id))
+        if ids_by_kind['rcts']:
+            for rct in session.query(RCT).filter(RCT.id.in_(ids_by_kind['rcts'])):
+                title = (rct.parenthetical_citation or '').strip() or (rct.title or '').strip() or 'Untitled'
+                titles[('rcts', rct.id)] = (title, url_for('view_rct', rct_id=rct.id))
+        if ids_by_kind['contraindications']:
+            for item in session.query(Contraindication).filter(Contraindication.id.in_(ids_by_kind['contraindications'])):
+                title = item.practice_english or item.practice_sanskrit or item.practice_segment or item.kosha or 'Contraindication'
+                titles[('contraindications', item.id)] = (
+                    title, url_for('edit_contraindication', contraindication_id=item.id)
+                )
+        if ids_by_kind['modules']:
+            for module in session.query(Module).options(joinedload(Module.disease)).filter(Module.id.in_(ids_by_kind['modules'])):
+                disease_name = module.disease.name if module.disease else 'N/A'
+                titles[('modules', module.id)] = (
+                    f"{disease_name} ({module.developed_by or 'N/A'})", url_for('view_module', module_id=module.id)
+                )
+
+        results = []
+        for hit in hits:
+            title, url = titles.get((hit.kind, hit.id), (None, None))
+            if title is None:
+                continue  # deleted since the index was read
+            results.append({
+                'type': hit.kind,
+                'id': hit.id,
+                'title': title,
+                'url': url,
+                'snippet': hit.snippet,
+                'score': round(hit.score, 6)
+            })
+        return jsonify({'query': query, 'results': results})
     finally:
-        engine.close()
+        session.close()
 
 
 @app.route('/api/disease/search', methods=['GET'])
@@ -4041,16 +4389,94 @@ def api_search_diseases():
         session.close()
 
 
+# Practice fields the JSON APIs can return (?fields=...): name -> (column, value returned for NULL)
+PRACTICE_API_FIELDS = {
+    'id': (Practice.id, None),
+    'practice_sanskrit': (Practice.practice_sanskrit, ''),
+    'practice_english': (Practice.practice_english, None),
+    'code': (Practice.code, ''),
+    'practice_segment': (Practice.practice_segment, None),
+    'kosha': (Practice.kosha, ''),
+    'sub_category': (Practice.sub_category, ''),
+    'rounds': (Practice.rounds, None),
+    'time_minutes': (Practice.time_minutes, None),
+    'strokes_per_min': (Practice.strokes_per_min, None),
+    'strokes_per_cycle': (Practice.strokes_per_cycle, None),
+    'rest_between_cycles_sec': (Practice.rest_between_cycles_sec, None),
+    'description': (Practice.description, ''),
+    'how_to_do': (Practice.how_to_do, ''),
+    'variations': (Practice.variations, ''),
+    'steps': (Practice.steps, ''),
+    'cvr_score': (Practice.cvr_score, None),
+}
+
+# Default projections: practice search (autocomplete that fills the whole form) and practice list
+PRACTICE_SEARCH_FIELDS = tuple(PRACTICE_API_FIELDS)
+PRACTICE_LIST_FIELDS = ('id', 'practice_english', 'practice_sanskrit', 'practice_segment', 'sub_category', 'kosha', 'code')
+
+
+def parse_practice_fields(default_fields):
+    """Practice fields requested with ?fields=a,b (default_fields if absent). Raises ValueError on unknown names."""
+    fields = []
+    for name in request.args.get('fields', '').split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in PRACTICE_API_FIELDS:
+            raise ValueError(f'Unknown field: {name}')
+        if name not in fields:
+            fields.append(name)
+    return fields or list(default_fields)
+
+
+def practice_field_value(name, value):
+    """API value of a practice field ('' instead of NULL for text fields)."""
+    if value is None:
+        return PRACTICE_API_FIELDS[name][1]
+    return value
+
+
+def encode_cursor(*values):
+    """Opaque pagination cursor for the given sort key values."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """Sort key values of a cursor made by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception as exc:
+        raise ValueError('Invalid cursor') from exc
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def range_filter(column, bounds):
+    """SQL filter lower <= column < upper for (lower, upper) bounds; upper None means no upper bound."""
+    lower, upper = bounds
+    if upper is None:
+        return column >= lower
+    return and_(column >= lower, column < upper)
+
+
 @app.route('/api/practice/search', methods=['GET'])
 def api_search_practices():
     """
     API endpoint for autocomplete - search practices by Sanskrit name or code
     Query parameters: q (search query), disease (optional - filter by disease), search_by (optional - 'code' or 'sanskrit', default 'sanskrit')
-    Returns list of matching practices with all details
+    Sanskrit names match across spelling variants (Shavasana/Savasana, Anulom Vilom/Anuloma Viloma)
+    and small typos, via the indexed phonetic key (see database/transliteration.py)
+    Optional fields=id,practice_sanskrit,... returns only those fields (and loads only those columns)
+    Returns list of matching practices with all details by default
     """
     query = request.args.get('q', '')
     disease_filter = request.args.get('disease', '').strip()
     search_by = request.args.get('search_by', 'sanskrit').strip().lower()  # 'code' or 'sanskrit'
+    try:
+        fields = parse_practice_fields(PRACTICE_SEARCH_FIELDS)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
     if not query:
         return jsonify([])
@@ -4058,49 +4484,69 @@ def api_search_practices():
     session = get_db_session()
     
     try:
-        # Search for practices by code or Sanskrit name (case insensitive)
-        if search_by == 'code':
-            practices_query = session.query(Practice).filter(
-                Practice.code.ilike(f'{query}%')
-            )
-        else:
-            practices_query = session.query(Practice).filter(
-                Practice.practice_sanskrit.ilike(f'{query}%')
-            )
+        query_key = sanskrit_key(query) if search_by != 'code' else ''
         
-        # If disease filter is provided, filter practices linked to that disease
+        # If disease filter is provided, only practices linked to that disease match
+        filters = []
         if disease_filter:
             disease = session.query(Disease).filter_by(name=disease_filter).first()
             if disease:
-                disease_id = disease.id
-                # Filter practices that are linked to this disease
-                practices_query = practices_query.join(disease_practice_association).filter(
-                    disease_practice_association.c.disease_id == disease_id
-                )
+                filters.append(Practice.id.in_(
+                    session.query(disease_practice_association.c.practice_id).filter(
+                        disease_practice_association.c.disease_id == disease.id
+                    )
+                ))
         
-        practices = practices_query.limit(10).all()
+        # Load only the requested fields
+        base_query = session.query(Practice).options(load_only(
+            *[PRACTICE_API_FIELDS[name][0] for name in fields]
+        )).filter(*filters)
         
-        results = []
-        for practice in practices:
-            results.append({
-                'id': practice.id,
-                'practice_sanskrit': practice.practice_sanskrit or '',
-                'practice_english': practice.practice_english,
-                'code': practice.code or '',
-                'practice_segment': practice.practice_segment,
-                'kosha': practice.kosha or '',
-                'sub_category': practice.sub_category or '',
-                'rounds': practice.rounds,
-                'time_minutes': practice.time_minutes,
-                'strokes_per_min': practice.strokes_per_min,
-                'strokes_per_cycle': practice.strokes_per_cycle,
-                'rest_between_cycles_sec': practice.rest_between_cycles_sec,
-                'description': practice.description or '',
-                'how_to_do': practice.how_to_do or '',
-                'variations': practice.variations or '',
-                'steps': practice.steps or '',
-                'cvr_score': practice.cvr_score
-            })
+        # Search for practices by code or Sanskrit name (case insensitive)
+        if search_by == 'code':
+            practices = base_query.filter(Practice.code.ilike(f'{query}%')).limit(10).all()
+        elif query_key:
+            # Rank on (id, name, key) rows only, read by index range scans
+            ranking_query = session.query(
+                Practice.id, Practice.practice_sanskrit, Practice.practice_sanskrit_key
+            ).filter(*filters)
+            
+            # Key starts with the query's key
+            candidates = ranking_query.filter(
+                range_filter(Practice.practice_sanskrit_key, key_prefix_range(query_key))
+            ).order_by(Practice.practice_sanskrit_key, Practice.id).limit(MATCH_CANDIDATES).all()
+            
+            # Name starts with the query (spellings whose key differs, e.g. 'e' against 'ee')
+            if query.strip():
+                sanskrit_lower = func.lower(Practice.practice_sanskrit)
+                candidates += ranking_query.filter(
+                    range_filter(sanskrit_lower, name_prefix_range(query.strip()))
+                ).order_by(sanskrit_lower, Practice.id).limit(MATCH_CANDIDATES).all()
+            
+            if len({row.id for row in candidates}) < 10:
+                # Too few prefix matches: look for typos among keys of similar length
+                # that share the query key's first letters
+                shortest, longest = key_length_range(query_key)
+                candidates += ranking_query.filter(
+                    range_filter(Practice.practice_sanskrit_key, key_prefix_range(query_key[:TYPO_PREFIX_LENGTH])),
+                    func.length(Practice.practice_sanskrit_key).between(shortest, longest)
+                ).order_by(Practice.practice_sanskrit_key, Practice.id).limit(TYPO_CANDIDATES).all()
+            
+            # Best 10: name prefix, then key prefix, then trigram similarity
+            ranked = rank_sanskrit_matches(query, {row.id: row for row in candidates}.values(), limit=10)
+            ids = [row.id for row in ranked]
+            by_id = {practice.id: practice for practice in base_query.filter(Practice.id.in_(ids))}
+            # Rows deleted since the ranking query are skipped
+            practices = [by_id[practice_id] for practice_id in ids if practice_id in by_id]
+        else:
+            practices = base_query.filter(
+                Practice.practice_sanskrit.ilike(f'{query}%')
+            ).limit(10).all()
+        
+        results = [
+            {name: practice_field_value(name, getattr(practice, name)) for name in fields}
+            for practice in practices
+        ]
         
         return jsonify(results)
     finally:
@@ -4312,84 +4758,23 @@ def api_search_modules_for_recommendation():
     Returns modules in format "Disease (Module Name)"
     Query parameter: q (search query)
     Prioritizes results starting with the query
+    Served from the snapshot's in-memory autocomplete index (see core/autocomplete.py)
     """
     query = request.args.get('q', '').strip()
     
     if not query:
         return jsonify([])
     
-    session = get_db_session()
-    
-    try:
-        query_lower = query.lower()
-        
-        # Get all modules with their diseases
-        all_modules = session.query(Module).join(Disease).all()
-        
-        results = []
-        for module in all_modules:
-            disease_name = module.disease.name if module.disease else 'N/A'
-            module_name = module.developed_by or 'N/A'
-            display_name = f"{disease_name} ({module_name})"
-            
-            disease_lower = disease_name.lower()
-            module_lower = (module_name or '').lower()
-            display_lower = display_name.lower()
-            
-            # Calculate match score: higher = better match
-            score = 0
-            match_type = None
-            
-            # Priority 1: Disease name starts with query
-            if disease_lower.startswith(query_lower):
-                score = 1000 + len(disease_lower)
-                match_type = 'disease_starts'
-            # Priority 2: Module name starts with query
-            elif module_lower.startswith(query_lower):
-                score = 500 + len(module_lower)
-                match_type = 'module_starts'
-            # Priority 3: Display name starts with query
-            elif display_lower.startswith(query_lower):
-                score = 300 + len(display_lower)
-                match_type = 'display_starts'
-            # Priority 4: Disease name contains query
-            elif query_lower in disease_lower:
-                score = 100 + len(disease_lower)
-                match_type = 'disease_contains'
-            # Priority 5: Module name contains query
-            elif query_lower in module_lower:
-                score = 50 + len(module_lower)
-                match_type = 'module_contains'
-            # Priority 6: Display name contains query
-            elif query_lower in display_lower:
-                score = 10 + len(display_lower)
-                match_type = 'display_contains'
-            else:
-                continue  # No match, skip this module
-            
-            results.append({
-                'id': module.id,
-                'module_id': module.id,
-                'disease_id': module.disease_id,
-                'disease_name': disease_name,
-                'module_name': module_name,
-                'display_name': display_name,
-                'score': score,
-                'match_type': match_type
-            })
-        
-        # Sort by score (descending) and then by display name
-        results.sort(key=lambda x: (-x['score'], x['display_name']))
-        
-        # Remove score and match_type from response (they were just for sorting)
-        for result in results:
-            del result['score']
-            del result['match_type']
-        
-        # Limit to top 20 results
-        return jsonify(results[:20])
-    finally:
-        session.close()
+    from core.knowledge_graph import get_snapshot
+    suggestions = get_snapshot(DB_PATH).module_autocomplete.search(query, limit=20)
+    return jsonify([{
+        'id': suggestion.module_id,
+        'module_id': suggestion.module_id,
+        'disease_id': suggestion.disease_id,
+        'disease_name': suggestion.disease_name,
+        'module_name': suggestion.module_name,
+        'display_name': suggestion.display_name
+    } for suggestion in suggestions])
 
 
 @app.route('/api/disease/severity-enabled', methods=['GET'])
@@ -4654,14 +5039,24 @@ def api_get_practice_counts():
     if not major_module_id:
         return jsonify({'error': 'Major module ID required'}), 400
     
-    session = get_db_session()
+    try:
+        module_ids = [int(major_module_id)] + [int(mid) for mid in comorbid_module_ids]
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Module IDs must be integers'}), 400
     
+    def _module_loader(module_id):
+        def load(session):
+            return session.query(Module).options(
+                joinedload(Module.disease).selectinload(Disease.contraindications),
+                joinedload(Module.practices)
+            ).filter(Module.id == module_id).first()
+        return load
+    
+    session = get_db_session()
     try:
-        # Get major module with practices
-        major_module = session.query(Module).options(
-            joinedload(Module.disease).selectinload(Disease.contraindications),
-            joinedload(Module.practices)
-        ).filter(Module.id == int(major_module_id)).first()
+        # Load the major and all comorbid modules concurrently (independent queries)
+        loaded_modules = run_db_loads(session, [_module_loader(module_id) for module_id in module_ids])
+        major_module = loaded_modules[0]
         
         if not major_module:
             return jsonify({'error': 'Major module not found'}), 404
@@ -4699,12 +5094,7 @@ def api_get_practice_counts():
         
         all_comorbid_disease_ids = set()
         
-        for module_id in comorbid_module_ids:
-            module = session.query(Module).options(
-                joinedload(Module.disease).selectinload(Disease.contraindications),
-                joinedload(Module.practices)
-            ).filter(Module.id == int(module_id)).first()
-            
+        for module in loaded_modules[1:]:
             if module:
                 if module.disease:
                     all_comorbid_disease_ids.add(module.disease.id)
@@ -4742,15 +5132,11 @@ def api_get_practice_counts():
                 })
         
         # Calculate total (note: we need to account for overlapping contraindications)
-        # Get all unique contraindications across all diseases
-        all_disease_ids = {major_module.disease_id} | all_comorbid_disease_ids
+        # Get all unique contraindications across all diseases (already loaded with the modules)
         all_contraindications = set()
-        for disease_id in all_disease_ids:
-            disease = session.query(Disease).options(
-                selectinload(Disease.contraindications)
-            ).get(disease_id)
-            if disease:
-                for contra in disease.contraindications:
+        for module in loaded_modules:
+            if module and module.disease:
+                for contra in module.disease.contraindications:
                     all_contraindications.add((
                         contra.practice_english.lower().strip() if contra.practice_english else '',
                         contra.practice_segment
@@ -4774,6 +5160,60 @@ def api_get_practice_counts():
 # Recommendation System Routes
 # ============================================================================
 
+def load_recommendation_modules(session, major_module_id, comorbid_module_ids):
+    """
+    Load the modules of a recommendation request in a fixed number of queries.
+
+    Fetches the major and comorbid modules with their disease, practices and
+    the practices' diseases, plus every selected disease's contraindications.
+    The two batches are independent and run concurrently (see run_db_loads),
+    and the results are merged into `session`, so the query count does not
+    grow with the number of comorbidities.
+
+    Returns:
+        (major_module or None, comorbid_modules in request order, {disease_id: Disease})
+    """
+    module_ids = []
+    for mid in [major_module_id] + list(comorbid_module_ids or []):
+        try:
+            module_ids.append(int(mid))
+        except (ValueError, TypeError):
+            continue
+
+    def load_modules(db_session):
+        return db_session.query(Module).options(
+            joinedload(Module.disease),
+            selectinload(Module.practices).selectinload(Practice.diseases)
+        ).filter(Module.id.in_(module_ids)).all()
+
+    def load_diseases(db_session):
+        return db_session.query(Disease).join(
+            Module, Module.disease_id == Disease.id
+        ).filter(Module.id.in_(module_ids)).options(
+            selectinload(Disease.contraindications)
+        ).distinct().all()
+
+    if not module_ids:
+        return None, [], {}
+    modules, diseases = run_db_loads(session, [load_modules, load_diseases])
+    modules_by_id = {module.id: module for module in modules}
+    diseases_by_id = {disease.id: disease for disease in diseases}
+
+    try:
+        major_module = modules_by_id.get(int(major_module_id))
+    except (ValueError, TypeError):
+        major_module = None
+    comorbid_modules = []
+    for mid in comorbid_module_ids or []:
+        try:
+            module = modules_by_id.get(int(mid))
+        except (ValueError, TypeError):
+            module = None
+        if module:
+            comorbid_modules.append(module)
+    return major_module, comorbid_modules, diseases_by_id
+
+
 @app.route('/recommendations', methods=['GET', 'POST'])
 def recommendations():
     """Step 1: Select diseases and set weightages"""
@@ -4849,14 +5289,29 @@ def recommendations_categories():
     def _practice_identifier(p: Practice):
         return (p.code or '').strip().lower() or (p.practice_english or '').strip().lower()
 
-    def _rank_key(p: Practice, selected_disease_ids: set):
+    def _rank_key(p: Practice, ranking):
+        # Precomputed arrays from the knowledge-graph snapshot (see core/ranking.py)
+        if p.id in ranking:
+            return ranking.key(p.id)
+        # Practice not in the snapshot (e.g. created by another worker since it was built)
         rct_val = p.rct_count if p.rct_count is not None else 0
-        repeat = len([d for d in p.diseases if d.id in selected_disease_ids]) if getattr(p, 'diseases', None) else 0
+        repeat = _repeat_count(p, ranking)
         cvr_val = p.cvr_score if p.cvr_score is not None else 0
         name_val = p.practice_english or ''
         return (-rct_val, -repeat, -cvr_val, name_val)
 
-    def _group_practices_by_category(module: Module, contraindicated_keys: set, selected_disease_ids: set):
+    def _repeat_count(p: Practice, ranking):
+        if p.id in ranking:
+            return ranking.repeat(p.id)
+        return len([d for d in p.diseases if d.id in ranking.disease_ids]) if getattr(p, 'diseases', None) else 0
+
+    def _rank_order(practices: list, ranking):
+        if all(p.id in ranking for p in practices):
+            by_id = {p.id: p for p in practices}
+            return [by_id[pid] for pid in ranking.order([p.id for p in practices])]
+        return sorted(practices, key=lambda pr: _rank_key(pr, ranking))
+
+    def _group_practices_by_category(module: Module, contraindicated_keys: set, ranking):
         by_category = {}
         for p in module.practices:
             category = p.practice_segment or 'Unknown'
@@ -4872,7 +5327,7 @@ def recommendations_categories():
                 by_category[category] = []
             by_category[category].append(p)
         for category in by_category:
-            by_category[category].sort(key=lambda pr: _rank_key(pr, selected_disease_ids))
+            by_category[category] = _rank_order(by_category[category], ranking)
         return by_category
 
     def _compute_category_max_counts(major_module: Module, comorbid_modules: list, contraindicated_keys: set, selected_disease_ids: set):
@@ -4939,24 +5394,14 @@ def recommendations_categories():
                     flash('Please select at least one practice from any category', 'error')
                     return redirect(url_for('recommendations_categories'))
                 
-                # Fetch modules
-                major_module = session.query(Module).options(
-                    joinedload(Module.disease),
-                    joinedload(Module.practices).joinedload(Practice.diseases)
-                ).filter(Module.id == major_module_id).first()
+                # Fetch modules, practices, diseases and contraindications in one batch
+                major_module, comorbid_modules, diseases_by_id = load_recommendation_modules(
+                    session, major_module_id, comorbid_module_ids
+                )
                 if not major_module:
                     flash('Major disease module not found', 'error')
                     return redirect(url_for('recommendations'))
                 
-                comorbid_modules = []
-                for mid in comorbid_module_ids:
-                    module = session.query(Module).options(
-                        joinedload(Module.disease),
-                        joinedload(Module.practices).joinedload(Practice.diseases)
-                    ).filter(Module.id == mid).first()
-                    if module:
-                        comorbid_modules.append(module)
-                
                 # Get all diseases and contraindications
                 all_modules = [major_module] + comorbid_modules
                 selected_disease_ids = set()
@@ -4964,9 +5409,13 @@ def recommendations_categories():
                     if module.disease_id:
                         selected_disease_ids.add(module.disease_id)
                 
+                # Repeat counts for every practice in one pass over the snapshot's incidence lists
+                from core.knowledge_graph import get_snapshot
+                ranking = get_snapshot(DB_PATH).practice_ranker.for_diseases(selected_disease_ids)
+                
                 contraindications = []
                 for disease_id in selected_disease_ids:
-                    disease = session.get(Disease, disease_id)
+                    disease = diseases_by_id.get(disease_id)
                     if disease:
                         for contraindication in disease.contraindications:
                             contraindications.append(contraindication)
@@ -5001,10 +5450,10 @@ def recommendations_categories():
                 total_requested = sum(category_selections.values())
                 
                 # Get practices by category for each module with ranking
-                major_practices_by_cat = _group_practices_by_category(major_module, contraindicated_keys, selected_disease_ids)
+                major_practices_by_cat = _group_practices_by_category(major_module, contraindicated_keys, ranking)
                 comorbid_practices_by_cat = {}
                 for m in comorbid_modules:
-                    comorbid_practices_by_cat[m.id] = _group_practices_by_category(m, contraindicated_keys, selected_disease_ids)
+                    comorbid_practices_by_cat[m.id] = _group_practices_by_category(m, contraindicated_keys, ranking)
                 
                 # For each category, apply weightages to user's selection
                 order_modules = [major_module] + comorbid_modules  # order reflects severity (major first, then user order)
@@ -5025,8 +5474,8 @@ def recommendations_categories():
                         ident = _practice_identifier(p)
                         if not ident or ident in seen:
                             continue
-                        p.selected_disease_count = len([d for d in p.diseases if d.id in selected_disease_ids]) if getattr(p, 'diseases', None) else 0
-                        rank_key = _rank_key(p, selected_disease_ids)
+                        p.selected_disease_count = _repeat_count(p, ranking)
+                        rank_key = _rank_key(p, ranking)
                         available_practices.append((p, rank_key))
                     
                     if not available_practices:
@@ -5118,8 +5567,8 @@ def recommendations_categories():
                             for p in cat_list:
                                 ident = _practice_identifier(p)
                                 if ident and ident not in seen:
-                                    p.selected_disease_count = len([d for d in p.diseases if d.id in selected_disease_ids]) if getattr(p, 'diseases', None) else 0
-                                    rank_key = _rank_key(p, selected_disease_ids)
+                                    p.selected_disease_count = _repeat_count(p, ranking)
+                                    rank_key = _rank_key(p, ranking)
                                     fallback_candidates.append((m.id, p, rank_key))
                         
                         if fallback_candidates:
@@ -5164,8 +5613,7 @@ def recommendations_categories():
                 
                 # Check if there are ties to resolve
                 if ties_to_resolve:
-                    # Store tie information in session for resolution
-                    import json
+                    # Store tie information server-side for resolution
                     ties_data = []
                     for tie in ties_to_resolve:
                         practice_data = []
@@ -5191,9 +5639,21 @@ def recommendations_categories():
                             'cvr_score': tie['rank_key'][2] * -1
                         })
                     
-                    flask_session['tie_resolution_data'] = json.dumps(ties_data)
-                    flask_session['partial_selected_practices'] = [p.id for p in selected_practices]
-                    flask_session['category_selections'] = category_selections
+                    # Rank keys of every candidate, so resolve_ties can order the result without recomputing them
+                    rank_keys = {
+                        str(p.id): list(_rank_key(p, ranking))
+                        for p in selected_practices + [p for tie in ties_to_resolve for p in tie['tied_practices']]
+                    }
+                    # RCT evidence of every candidate, reused by the result step
+                    pipeline = RecommendationPipeline(DB_PATH)
+                    pipeline.evidence_for(selected_practices + [p for tie in ties_to_resolve for p in tie['tied_practices']])
+                    start_wizard_state({
+                        'ties': ties_data,
+                        'partial_selected_practices': [p.id for p in selected_practices],
+                        'category_selections': category_selections,
+                        'rank_keys': rank_keys,
+                        'rct_citations': pipeline.export_citations(),
+                    })
                     return redirect(url_for('resolve_ties'))
                 
                 if len(selected_practices) == 0:
@@ -5204,93 +5664,13 @@ def recommendations_categories():
                 if len(filtered_practices) < total_requested:
                     flash(f'Only {len(filtered_practices)} of {total_requested} practices available after applying weights, deduplication, and contraindications.', 'warning')
                 
-                # Get RCTs for practices
-                all_practice_disease_ids = set()
-                practice_disease_map = {}
-                for practice in filtered_practices:
-                    practice_disease_ids = [d.id for d in practice.diseases]
-                    practice_disease_map[practice.id] = practice_disease_ids
-                    all_practice_disease_ids.update(practice_disease_ids)
-                
-                matching_rcts = []
-                if all_practice_disease_ids:
-                    matching_rcts = session.query(RCT).join(
-                        rct_disease_association
-                    ).filter(
-                        rct_disease_association.c.disease_id.in_(list(all_practice_disease_ids))
-                    ).options(
-                        selectinload(RCT.diseases)
-                    ).all()
-                
-                practice_rcts = {}
-                for practice in filtered_practices:
-                    practice_rcts[practice.id] = []
-                    practice_disease_ids = practice_disease_map[practice.id]
-                    
-                    for rct in matching_rcts:
-                        rct_disease_ids = [d.id for d in rct.diseases]
-                        if any(did in practice_disease_ids for did in rct_disease_ids):
-                            if rct.intervention_practices:
-                                try:
-                                    intervention_list = json.loads(rct.intervention_practices)
-                                    for intervention in intervention_list:
-                                        practice_name = intervention.get('name', '').strip()
-                                        intervention_category = intervention.get('category', '').strip()
-                                        
-                                        if (practice_name and 
-                                            ((practice.practice_sanskrit and practice.practice_sanskrit.lower() == practice_name.lower()) or
-                                             (practice.practice_english and practice.practice_english.lower() == practice_name.lower()))):
-                                            if rct.parenthetical_citation:
-                                                practice_rcts[practice.id].append(rct.parenthetical_citation)
-                                                break
-                                        elif intervention_category and practice.practice_segment == intervention_category:
-                                            if rct.parenthetical_citation:
-                                                practice_rcts[practice.id].append(rct.parenthetical_citation)
-                                                break
-                                except:
-                                    pass
-                
-                # Organize practices by Kosha, then Category, then Subcategory
-                kosha_order = {
-                    'Annamaya Kosha': 1,
-                    'Pranamaya Kosha': 2,
-                    'Manomaya Kosha': 3,
-                    'Anandamaya Kosha': 4,
-                    'Vijnanamaya Kosha': 5
-                }
-                
-                organized_practices = {}
+                # RCT evidence, kosha organization and ordering (see core/recommendation_pipeline.py)
                 for practice in filtered_practices:
                     if not hasattr(practice, 'selected_disease_count'):
-                        practice.selected_disease_count = len([d for d in practice.diseases if d.id in selected_disease_ids]) if getattr(practice, 'diseases', None) else 0
-                    kosha = practice.kosha or 'Unknown'
-                    category = practice.practice_segment or 'Unknown'
-                    subcategory = practice.sub_category or 'None'
-                    
-                    if kosha not in organized_practices:
-                        organized_practices[kosha] = {}
-                    if category not in organized_practices[kosha]:
-                        organized_practices[kosha][category] = {}
-                    if subcategory not in organized_practices[kosha][category]:
-                        organized_practices[kosha][category][subcategory] = []
-                    
-                    organized_practices[kosha][category][subcategory].append({
-                        'practice': practice,
-                        'rcts': practice_rcts.get(practice.id, [])
-                    })
-                
-                # Sort practices within each subcategory by RCT count
-                for kosha in organized_practices:
-                    for category in organized_practices[kosha]:
-                        for subcategory in organized_practices[kosha][category]:
-                            organized_practices[kosha][category][subcategory].sort(
-                                key=lambda x: (
-                                    -(x['practice'].rct_count if x['practice'].rct_count is not None else 0),
-                                    -(getattr(x['practice'], 'selected_disease_count', 0)),
-                                    -(x['practice'].cvr_score if x['practice'].cvr_score is not None else 0),
-                                    x['practice'].practice_english or ''
-                                )
-                            )
+                        practice.selected_disease_count = _repeat_count(practice, ranking)
+                organized_practices, sorted_koshas = RecommendationPipeline(DB_PATH).build_plan(
+                    filtered_practices, lambda p: _rank_key(p, ranking)
+                )
                 
                 major_disease_name = major_module.disease.name if major_module.disease else 'N/A'
                 major_module_name = major_module.developed_by or 'N/A'
@@ -5304,16 +5684,12 @@ def recommendations_categories():
                     for m in comorbid_modules
                 ]
                 
-                sorted_koshas = sorted(
-                    organized_practices.keys(),
-                    key=lambda x: kosha_order.get(x, 999)
-                )
-                
                 # Clear session data
                 flask_session.pop('recommendation_major_module_id', None)
                 flask_session.pop('recommendation_comorbid_module_ids', None)
                 flask_session.pop('recommendation_weight_major', None)
                 flask_session.pop('recommendation_comorbid_weights', None)
+                clear_wizard_state()
                 
                 return render_template('recommendations_result.html',
                                      major_disease_name=major_disease_name,
@@ -5322,7 +5698,7 @@ def recommendations_categories():
                                      comorbid_module_names=comorbid_module_names,
                                      organized_practices=organized_practices,
                                      contraindications=unique_contraindications,
-                                     kosha_order=kosha_order,
+                                     kosha_order=KOSHA_ORDER,
                                      sorted_koshas=sorted_koshas)
             except Exception as e:
                 flash(f'Error generating recommendations: {str(e)}', 'error')
@@ -5339,31 +5715,21 @@ def recommendations_categories():
             flash('Please start from the recommendations page', 'error')
             return redirect(url_for('recommendations'))
         
-        # Fetch modules
-        major_module = session.query(Module).options(
-            joinedload(Module.disease),
-            joinedload(Module.practices)
-        ).filter(Module.id == major_module_id).first()
+        # Fetch modules, practices, diseases and contraindications in one batch
+        major_module, comorbid_modules, diseases_by_id = load_recommendation_modules(
+            session, major_module_id, comorbid_module_ids
+        )
         if not major_module:
             flash('Major disease module not found', 'error')
             return redirect(url_for('recommendations'))
         
-        comorbid_modules = []
-        for mid in comorbid_module_ids:
-            module = session.query(Module).options(
-                joinedload(Module.disease),
-                joinedload(Module.practices)
-            ).filter(Module.id == mid).first()
-            if module:
-                comorbid_modules.append(module)
-        
         # Get all diseases and contraindications
         all_modules = [major_module] + comorbid_modules
         selected_disease_ids = {m.disease_id for m in all_modules if m.disease_id}
         
         contraindications = []
         for disease_id in selected_disease_ids:
-            disease = session.get(Disease, disease_id)
+            disease = diseases_by_id.get(disease_id)
             if disease:
                 for contraindication in disease.contraindications:
                     contraindications.append(contraindication)
@@ -5417,14 +5783,15 @@ def resolve_ties():
                 flash('Please select at least one practice for each tie', 'error')
                 return redirect(url_for('resolve_ties'))
             
-            # Get tie resolution data from session
-            ties_data_json = flask_session.get('tie_resolution_data')
-            if not ties_data_json:
+            # Get tie resolution data from the wizard state store
+            wizard_state = get_wizard_state()
+            if not wizard_state:
                 flash('Tie resolution data not found. Please start over.', 'error')
                 return redirect(url_for('recommendations'))
             
-            ties_data = json.loads(ties_data_json)
-            partial_practice_ids = flask_session.get('partial_selected_practices', [])
+            ties_data = wizard_state['ties']
+            partial_practice_ids = wizard_state.get('partial_selected_practices', [])
+            rank_keys = wizard_state.get('rank_keys', {})
             
             # Validate selections
             selected_ids_set = set(int(pid) for pid in selected_practice_ids)
@@ -5439,10 +5806,12 @@ def resolve_ties():
             all_selected_practice_ids = partial_practice_ids + [int(pid) for pid in selected_practice_ids]
             
             # Get the full practice objects
-            selected_practices = session.query(Practice).filter(Practice.id.in_(all_selected_practice_ids)).all()
+            selected_practices = session.query(Practice).options(
+                selectinload(Practice.diseases)
+            ).filter(Practice.id.in_(all_selected_practice_ids)).all()
             
-            # Get category selections from session
-            category_selections = flask_session.get('category_selections', {})
+            # Get category selections from the wizard state
+            category_selections = wizard_state.get('category_selections', {})
             
             # Continue with recommendation generation using selected practices
             # Get modules and other data from session
@@ -5455,24 +5824,14 @@ def resolve_ties():
                 flash('Session expired. Please start over.', 'error')
                 return redirect(url_for('recommendations'))
             
-            major_module = session.query(Module).options(
-                joinedload(Module.disease),
-                joinedload(Module.practices)
-            ).filter(Module.id == major_module_id).first()
+            major_module, comorbid_modules, _ = load_recommendation_modules(
+                session, major_module_id, comorbid_module_ids
+            )
             
             if not major_module:
                 flash('Major module not found', 'error')
                 return redirect(url_for('recommendations'))
             
-            comorbid_modules = []
-            for mid in comorbid_module_ids:
-                module = session.query(Module).options(
-                    joinedload(Module.disease),
-                    joinedload(Module.practices)
-                ).filter(Module.id == mid).first()
-                if module:
-                    comorbid_modules.append(module)
-            
             all_modules = [major_module] + comorbid_modules
             selected_disease_ids = set()
             for m in all_modules:
@@ -5510,93 +5869,26 @@ def resolve_ties():
                 if pk not in contraindicated_keys:
                     filtered_practices.append(p)
             
-            # Get RCTs for practices
-            all_practice_disease_ids = set()
-            practice_disease_map = {}
-            for practice in filtered_practices:
-                practice_disease_ids = [d.id for d in practice.diseases]
-                practice_disease_map[practice.id] = practice_disease_ids
-                all_practice_disease_ids.update(practice_disease_ids)
-            
-            matching_rcts = []
-            if all_practice_disease_ids:
-                matching_rcts = session.query(RCT).join(
-                    rct_disease_association
-                ).filter(
-                    rct_disease_association.c.disease_id.in_(list(all_practice_disease_ids))
-                ).options(
-                    selectinload(RCT.diseases)
-                ).all()
-            
-            practice_rcts = {}
-            for practice in filtered_practices:
-                practice_rcts[practice.id] = []
-                practice_disease_ids = practice_disease_map[practice.id]
-                
-                for rct in matching_rcts:
-                    rct_disease_ids = [d.id for d in rct.diseases]
-                    if any(did in practice_disease_ids for did in rct_disease_ids):
-                        if rct.intervention_practices:
-                            try:
-                                intervention_list = json.loads(rct.intervention_practices)
-                                for intervention in intervention_list:
-                                    practice_name = intervention.get('name', '').strip()
-                                    intervention_category = intervention.get('category', '').strip()
-                                    
-                                    if (practice_name and 
-                                        ((practice.practice_sanskrit and practice.practice_sanskrit.lower() == practice_name.lower()) or
-                                         (practice.practice_english and practice.practice_english.lower() == practice_name.lower()))):
-                                        if rct.parenthetical_citation:
-                                            practice_rcts[practice.id].append(rct.parenthetical_citation)
-                                            break
-                                    elif intervention_category and practice.practice_segment == intervention_category:
-                                        if rct.parenthetical_citation:
-                                            practice_rcts[practice.id].append(rct.parenthetical_citation)
-                                            break
-                            except:
-                                pass
-            
-            # Organize practices by Kosha, then Category, then Subcategory
-            kosha_order = {
-                'Annamaya Kosha': 1,
-                'Pranamaya Kosha': 2,
-                'Manomaya Kosha': 3,
-                'Anandamaya Kosha': 4,
-                'Vijnanamaya Kosha': 5
-            }
-            
-            organized_practices = {}
+            # Rank keys stored by recommendations_categories: (-rct, -repeat, -cvr, name)
             for practice in filtered_practices:
-                if not hasattr(practice, 'selected_disease_count'):
+                stored_key = rank_keys.get(str(practice.id))
+                if stored_key:
+                    practice.rank_key = tuple(stored_key)
+                    practice.selected_disease_count = -stored_key[1]
+                else:
                     practice.selected_disease_count = len([d for d in practice.diseases if d.id in selected_disease_ids]) if getattr(practice, 'diseases', None) else 0
-                kosha = practice.kosha or 'Unknown'
-                category = practice.practice_segment or 'Unknown'
-                subcategory = practice.sub_category or 'None'
-                
-                if kosha not in organized_practices:
-                    organized_practices[kosha] = {}
-                if category not in organized_practices[kosha]:
-                    organized_practices[kosha][category] = {}
-                if subcategory not in organized_practices[kosha][category]:
-                    organized_practices[kosha][category][subcategory] = []
-                
-                organized_practices[kosha][category][subcategory].append({
-                    'practice': practice,
-                    'rcts': practice_rcts.get(practice.id, [])
-                })
+                    practice.rank_key = (
+                        -(practice.rct_count if practice.rct_count is not None else 0),
+                        -practice.selected_disease_count,
+                        -(practice.cvr_score if practice.cvr_score is not None else 0),
+                        practice.practice_english or ''
+                    )
             
-            # Sort practices within each subcategory
-            for kosha in organized_practices:
-                for category in organized_practices[kosha]:
-                    for subcategory in organized_practices[kosha][category]:
-                        organized_practices[kosha][category][subcategory].sort(
-                            key=lambda x: (
-                                -(x['practice'].rct_count if x['practice'].rct_count is not None else 0),
-                                -(getattr(x['practice'], 'selected_disease_count', 0)),
-                                -(x['practice'].cvr_score if x['practice'].cvr_score is not None else 0),
-                                x['practice'].practice_english or ''
-                            )
-                        )
+            # RCT evidence, kosha organization and ordering; reuses the citations computed at the tie step
+            pipeline = RecommendationPipeline(DB_PATH, citations=wizard_state.get('rct_citations'))
+            organized_practices, sorted_koshas = pipeline.build_plan(
+                filtered_practices, lambda p: p.rank_key
+            )
             
             major_disease_name = major_module.disease.name if major_module.disease else 'N/A'
             major_module_name = major_module.developed_by or 'N/A'
@@ -5610,19 +5902,12 @@ def resolve_ties():
                 for m in comorbid_modules
             ]
             
-            sorted_koshas = sorted(
-                organized_practices.keys(),
-                key=lambda x: kosha_order.get(x, 999)
-            )
-            
             # Clear session data
             flask_session.pop('recommendation_major_module_id', None)
             flask_session.pop('recommendation_comorbid_module_ids', None)
             flask_session.pop('recommendation_weight_major', None)
             flask_session.pop('recommendation_comorbid_weights', None)
-            flask_session.pop('tie_resolution_data', None)
-            flask_session.pop('partial_selected_practices', None)
-            flask_session.pop('category_selections', None)
+            clear_wizard_state()
             
             return render_template('recommendations_result.html',
                                  major_disease_name=major_disease_name,
@@ -5631,18 +5916,16 @@ def resolve_ties():
                                  comorbid_module_names=comorbid_module_names,
                                  organized_practices=organized_practices,
                                  contraindications=unique_contraindications,
-                                 kosha_order=kosha_order,
+                                 kosha_order=KOSHA_ORDER,
                                  sorted_koshas=sorted_koshas)
         
         # GET request - show tie resolution form
-        ties_data_json = flask_session.get('tie_resolution_data')
-        if not ties_data_json:
+        wizard_state = get_wizard_state()
+        if not wizard_state:
             flash('No ties to resolve. Redirecting to recommendations.', 'info')
             return redirect(url_for('recommendations'))
         
-        ties_data = json.loads(ties_data_json)
-        
-        return render_template('resolve_ties.html', ties_data=ties_data)
+        return render_template('resolve_ties.html', ties_data=wizard_state['ties'])
     except Exception as e:
         flash(f'Error resolving ties: {str(e)}', 'error')
         import traceback
@@ -5684,107 +5967,6 @@ def calculate_p_value_significance(operator, p_value):
     return 0
 
 
-def recalculate_practice_rct_count(session, practice):
-    """
-    Recalculate RCT count for a practice based on all RCT entries.
-    This is called when a practice's category or disease associations change.
-    """
-    # Reset count
-    practice.rct_count = 0
-    
-    # Get all RCTs
-    rcts = session.query(RCT).all()
-    
-    for rct in rcts:
-        if not rct.intervention_practices:
-            continue
-        
-        import json
-        try:
-            practice_list = json.loads(rct.intervention_practices)
-        except:
-            continue
-        
-        # Get disease IDs for this RCT
-        rct_disease_ids = [d.id for d in rct.diseases]
-        
-        # Get practice disease IDs
-        practice_disease_ids = [d.id for d in practice.diseases]
-        
-        # Check if practice is linked to any of the RCT's diseases
-        if not any(did in practice_disease_ids for did in rct_disease_ids):
-            continue
-        
-        # Count RCTs that mention this practice (either specifically or by category)
-        for practice_data in practice_list:
-            practice_name = practice_data.get('name', '').strip()
-            intervention_category = practice_data.get('category', '').strip()
-            
-            # If specific practice is mentioned
-            if practice_name:
-                # Check if this is the same practice
-                if ((practice.practice_sanskrit == practice_name) or 
-                    (practice.practice_english == practice_name)):
-                    practice.rct_count += 1
-                    break
-            else:
-                # If only category is mentioned, check if practice is in that category
-                if practice.practice_segment == intervention_category:
-                    practice.rct_count += 1
-                    break
-
-
-def increment_rct_counts(session, practice_data, disease_ids):
-    """
-    Increment RCT count for practices based on whether specific practice or category is specified.
-    
-    Args:
-        practice_data: dict with 'name' and 'category' keys
-            - If 'name' is provided: increment only that specific practice
-            - If 'name' is empty: increment all practices in that category
-        disease_ids: list of disease IDs this RCT is linked to
-    """
-    if not practice_data.get('category') or not disease_ids:
-        return
-    
-    practice_name = practice_data.get('name', '').strip()
-    intervention_category = practice_data.get('category', '').strip()
-    
-    # If specific practice is mentioned
-    if practice_name:
-        # Try to find the exact practice by name (check both Sanskrit and English)
-        practice = session.query(Practice).filter(
-            (Practice.practice_sanskrit == practice_name) |
-            (Practice.practice_english == practice_name)
-        ).first()
-        
-        if practice:
-            # Check if this practice is linked to any of the diseases
-            practice_disease_ids = [d.id for d in practice.diseases]
-            if any(did in practice_disease_ids for did in disease_ids):
-                if practice.rct_count is None:
-                    practice.rct_count = 1
-                else:
-                    practice.rct_count += 1
-    else:
-        # No specific practice - increment all practices in this category
-        practices = session.query(Practice).filter_by(
-            practice_segment=intervention_category
-        ).all()
-        
-        for practice in practices:
-            # Check if practice is linked to any of the diseases
-            practice_disease_ids = [d.id for d in practice.diseases]
-            if any(did in practice_disease_ids for did in disease_ids):
-                # Increment RCT count
-                if practice.rct_count is None:
-                    practice.rct_count = 1
-                else:
-                    practice.rct_count += 1
-    
-    session.commit()
-
-
 @app.route('/rcts')
 def list_rcts():
     """List all RCT entries with pagination and eager loading"""
@@ -5809,19 +5991,31 @@ def list_rcts():
         if disease_filter:
             query = query.join(RCT.diseases).filter(func.lower(Disease.name) == disease_filter.lower())
 
-        # Filter by practice name (search intervention_practices text fields and metadata)
+        # Filter by practice name: intervention names and categories (substring
+        # match), plus the text metadata via the full-text index when available,
+        # LIKE scans otherwise
         if practice_filter:
             like_term = f"%{practice_filter}%"
-            query = query.filter(
-                or_(
-                    RCT.intervention_practices.ilike(like_term),
-                    RCT.title.ilike(like_term),
-                    RCT.parenthetical_citation.ilike(like_term),
-                    RCT.keywords.ilike(like_term),
-                    RCT.results.ilike(like_term),
-                    RCT.conclusion.ilike(like_term)
-                )
+            intervention_match = RCT.id.in_(
+                session.query(RCTIntervention.rct_id).filter(or_(
+                    RCTIntervention.practice_name.ilike(like_term),
+                    RCTIntervention.category.ilike(like_term)
+                ))
             )
+            matching_ids = fulltext_match(session, 'rcts', practice_filter)
+            if matching_ids is not None:
+                query = query.filter(or_(intervention_match, RCT.id.in_(matching_ids)))
+            else:
+                query = query.filter(
+                    or_(
+                        intervention_match,
+                        RCT.title.ilike(like_term),
+                        RCT.parenthetical_citation.ilike(like_term),
+                        RCT.keywords.ilike(like_term),
+                        RCT.results.ilike(like_term),
+                        RCT.conclusion.ilike(like_term)
+                    )
+                )
         
         filtered_query = query  # keep reference for grouping without pagination
 
@@ -5881,22 +6075,61 @@ def list_rcts():
 
 @app.route('/api/practices')
 def api_practices():
-    """API endpoint to get all practices for RCT form"""
+    """
+    API endpoint to get all practices for RCT form, ordered by English name
+    Query parameters (all optional):
+    - fields: comma-separated practice fields to return (default: id, names, category, sub-category, kosha, code)
+    - limit / cursor: page size (max 1000) and the next_cursor of the previous page
+    - format=compact: each practice as an array of values in 'fields' order
+    Without limit, cursor or format, returns the full list of practice objects.
+    Otherwise returns {'fields': [...], 'items': [...], 'next_cursor': token or null}.
+    """
+    try:
+        fields = parse_practice_fields(PRACTICE_LIST_FIELDS)
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if cursor is not None and not (len(cursor) == 2 and isinstance(cursor[0], str) and isinstance(cursor[1], int)):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    compact = request.args.get('format', '').strip().lower() == 'compact'
+    limit = request.args.get('limit', type=int)
+    paginated = limit is not None or cursor is not None
+    if paginated:
+        limit = max(1, min(limit or 100, 1000))
+
     session = get_db_session()
     try:
-        practices = session.query(Practice).order_by(Practice.practice_english).all()
-        results = []
-        for practice in practices:
-            results.append({
-                'id': practice.id,
-                'practice_english': practice.practice_english,
-                'practice_sanskrit': practice.practice_sanskrit or '',
-                'practice_segment': practice.practice_segment,
-                'sub_category': practice.sub_category or '',
-                'kosha': practice.kosha or '',
-                'code': practice.code or ''
-            })
-        return jsonify(results)
+        # Only the requested columns, plus the (English name, id) keyset used for ordering and cursors
+        query = session.query(
+            Practice.practice_english, Practice.id, *[PRACTICE_API_FIELDS[name][0] for name in fields]
+        ).order_by(Practice.practice_english, Practice.id)
+        if cursor is not None:
+            last_name, last_id = cursor
+            query = query.filter(or_(
+                Practice.practice_english > last_name,
+                and_(Practice.practice_english == last_name, Practice.id > last_id)
+            ))
+        rows = query.limit(limit + 1).all() if paginated else query.all()
+
+        next_cursor = None
+        if paginated and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+
+        if compact:
+            items = [
+                [practice_field_value(name, value) for name, value in zip(fields, row[2:])]
+                for row in rows
+            ]
+        else:
+            items = [
+                {name: practice_field_value(name, value) for name, value in zip(fields, row[2:])}
+                for row in rows
+            ]
+
+        if not paginated and not compact:
+            return jsonify(items)
+        return jsonify({'fields': fields, 'items': items, 'next_cursor': next_cursor})
     finally:
         session.close()
 
@@ -6042,11 +6275,8 @@ def add_rct():
                         session.flush()
                     rct.diseases.append(disease)
             
-            # Increment RCT counts for each practice/category and disease combo
-            if practice_list:
-                disease_ids = [d.id for d in rct.diseases]
-                for practice_data in practice_list:
-                    increment_rct_counts(session, practice_data, disease_ids)
+            # Update RCT counts of the practices this RCT supports
+            update_rct_counts(session, rct_footprint(rct))
             
             session.commit()
             flash('RCT entry added successfully!', 'success')
@@ -6146,6 +6376,9 @@ def edit_rct(rct_id):
             return redirect(url_for('list_rcts'))
         
         if request.method == 'POST':
+            # What the RCT contributed to practice RCT counts before the edit
+            old_footprint = rct_footprint(rct)
+            
             # Update RCT fields
             rct.data_enrolled_date = request.form.get('data_enrolled_date', '')
             rct.database_journal = request.form.get('database_journal', '')
@@ -6239,6 +6472,9 @@ def edit_rct(rct_id):
                         session.flush()
                     rct.diseases.append(disease)
             
+            # Update RCT counts of the practices supported before or after the edit
+            update_rct_counts(session, old_footprint, rct_footprint(rct))
+            
             session.commit()
             flash('RCT entry updated successfully!', 'success')
             return redirect(url_for('list_rcts'))
@@ -6286,48 +6522,6 @@ def edit_rct(rct_id):
         session.close()
 
 
-def decrement_rct_counts(session, practice_data, disease_ids):
-    """
-    Decrement RCT count for practices based on whether specific practice or category is specified.
-    This is the reverse of increment_rct_counts.
-    """
-    if not practice_data.get('category') or not disease_ids:
-        return
-    
-    practice_name = practice_data.get('name', '').strip()
-    intervention_category = practice_data.get('category', '').strip()
-    
-    # If specific practice is mentioned
-    if practice_name:
-        # Try to find the exact practice by name (check both Sanskrit and English)
-        practice = session.query(Practice).filter(
-            (Practice.practice_sanskrit == practice_name) |
-            (Practice.practice_english == practice_name)
-        ).first()
-        
-        if practice:
-            # Check if this practice is linked to any of the diseases
-            practice_disease_ids = [d.id for d in practice.diseases]
-            if any(did in practice_disease_ids for did in disease_ids):
-                if practice.rct_count and practice.rct_count > 0:
-                    practice.rct_count -= 1
-    else:
-        # No specific practice - decrement all practices in this category
-        practices = session.query(Practice).filter_by(
-            practice_segment=intervention_category
-        ).all()
-        
-        for practice in practices:
-            # Check if practice is linked to any of the diseases
-            practice_disease_ids = [d.id for d in practice.diseases]
-            if any(did in practice_disease_ids for did in disease_ids):
-                # Decrement RCT count
-                if practice.rct_count and practice.rct_count > 0:
-                    practice.rct_count -= 1
-    
-    session.commit()
-
-
 @app.route('/rct/<int:rct_id>/delete', methods=['POST'])
 def delete_rct(rct_id):
     """Delete an RCT entry"""
@@ -6338,23 +6532,12 @@ def delete_rct(rct_id):
             flash('RCT entry not found', 'error')
             return redirect(url_for('list_rcts'))
         
-        # Get the intervention practices and diseases before deleting
-        disease_ids = [d.id for d in rct.diseases]
-        if rct.intervention_practices:
-            import json
-            try:
-                practice_list = json.loads(rct.intervention_practices)
-                # Decrement RCT counts for each practice/category
-                if isinstance(practice_list, list):
-                    for practice_data in practice_list:
-                        if isinstance(practice_data, dict):
-                            decrement_rct_counts(session, practice_data, disease_ids)
-            except Exception:
-                # If intervention_practices is not valid JSON (legacy text),
-                # skip decrementing counts instead of failing the delete.
-                pass
+        # What the RCT contributed to practice RCT counts
+        footprint = rct_footprint(rct)
         
         session.delete(rct)
+        session.flush()
+        update_rct_counts(session, footprint)
         session.commit()
         flash('RCT entry deleted successfully', 'success')
         return redirect(url_for('list_rcts'))
@@ -6559,7 +6742,11 @@ def export_rcts_csv():
     """Export all RCTs to CSV"""
     session = get_db_session()
     try:
-        rcts = session.query(RCT).all()
+        rcts = session.query(RCT).options(
+            selectinload(RCT.diseases),
+            selectinload(RCT.symptoms),
+            selectinload(RCT.interventions)
+        ).all()
         
         output = io.StringIO()
         writer = csv.writer(output)
@@ -6588,9 +6775,14 @@ def export_rcts_csv():
                 symptom_details.append(symptom_str)
             symptoms_str = ' | '.join(symptom_details)
             
-            # Parse intervention practices
+            # Intervention practices (normalized rows; raw value for legacy plain text)
             intervention_str = ''
-            if rct.intervention_practices:
+            if rct.interventions:
+                intervention_str = ' | '.join(
+                    f"{i.practice_name} ({i.category})" if i.practice_name else f"Category: {i.category}"
+                    for i in rct.interventions
+                )
+            elif rct.intervention_practices:
                 # Support both plain text and JSON list formats
                 try:
                     practices = json.loads(rct.intervention_practices)
@@ -7445,4 +7637,5 @@ if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
     host = os.getenv('FLASK_HOST', '127.0.0.1')
     port = int(os.getenv('FLASK_PORT', '5000'))
+    init_recommendation_services(app)
     app.run(debug=debug_mode, host=host, port=port)
\ No newline at end of file